@@ -1,12 +1,104 @@
-from django.contrib import admin
-from api.models import FitnessClass, FitnessClassBooking
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from api.constants import ADMIN_ESTIMATED_COUNT_THRESHOLD
+from api.models import FitnessClass, FitnessClassBooking, WaitlistEntry
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator of the changelists of large tables. Unfiltered changelists on PostgreSQL take the
+    number of rows from the planner's estimate once it passes ADMIN_ESTIMATED_COUNT_THRESHOLD,
+    instead of scanning the whole table for a COUNT(*).
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if not queryset.query.where and connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                estimate = int(cursor.fetchone()[0])
+            if estimate > ADMIN_ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+
+        return queryset.count()
+
+
+class CapacityActionForm(ActionForm):
+    max_slots = forms.IntegerField(
+        required=False, min_value=0, help_text="Used by the max slots action."
+    )
 
 
 @admin.register(FitnessClass)
 class FitnessClassAdmin(admin.ModelAdmin):
-    list_display = ("id", "name", "class_type", "class_time", "instructor_name")
+    list_display = (
+        "id",
+        "name",
+        "class_type",
+        "class_time",
+        "instructor_name",
+        "max_slots",
+        "booked",
+        "available_slots",
+    )
+    actions = ("cancel_classes", "set_max_slots")
+    action_form = CapacityActionForm
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_booking_count()
+
+    @admin.display(description="Booked", ordering="booking_count")
+    def booked(self, obj):
+        return obj.booking_count
+
+    @admin.action(description="Cancel selected classes and their bookings", permissions=["delete"])
+    def cancel_classes(self, request, queryset):
+        classes, bookings = queryset.cancel()
+        self.message_user(request, f"Cancelled {classes} classes and {bookings} bookings.")
+
+    @admin.action(description="Set the max slots of selected classes", permissions=["change"])
+    def set_max_slots(self, request, queryset):
+        form = CapacityActionForm(request.POST)
+        form.fields["action"].choices = self.get_action_choices(request)
+        if not form.is_valid() or form.cleaned_data["max_slots"] is None:
+            self.message_user(
+                request, "Enter the new max slots next to the action.", messages.ERROR
+            )
+            return
+
+        max_slots = form.cleaned_data["max_slots"]
+        changed = queryset.set_max_slots(max_slots)
+        self.message_user(request, f"Set the max slots of {changed} classes to {max_slots}.")
+        if skipped := queryset.count() - changed:
+            self.message_user(
+                request,
+                f"Left {skipped} classes with more than {max_slots} booked seats unchanged.",
+                messages.WARNING,
+            )
 
 
 @admin.register(FitnessClassBooking)
 class FitnessClassBookingAdmin(admin.ModelAdmin):
     list_display = ("id", "fitness_class", "client_name", "client_email", "created_at")
+    list_select_related = ("fitness_class",)
+    raw_id_fields = ("fitness_class",)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(admin.ModelAdmin):
+    list_display = ("id", "fitness_class", "client_name", "client_email", "created_at")
+    list_select_related = ("fitness_class",)
+    raw_id_fields = ("fitness_class",)
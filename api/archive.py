@@ -0,0 +1,53 @@
+"""
+Archival of past fitness classes and their bookings, used by the `archive_past_classes` command.
+
+Classes are moved a batch at a time, each batch copied into the archive tables and deleted from
+the hot tables in one transaction. A run that stops halfway leaves every class either hot or
+archived, and the next run carries on with the classes still left.
+"""
+from django.db import transaction
+
+from api.models import (
+    ArchivedFitnessClass,
+    ArchivedFitnessClassBooking,
+    ClientBookingSummary,
+    FitnessClass,
+    FitnessClassBooking,
+)
+
+
+def get_copied_fields(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def archive_classes(before, batch_size):
+    """
+    Moves up to `batch_size` classes that started before `before`, oldest first, with their
+    bookings into the archive tables. Their waitlists are dropped, and the booking summaries of
+    their clients rebuilt once. Returns the number of classes and bookings moved, no classes once
+    there is nothing left to archive.
+    """
+    with transaction.atomic(), ClientBookingSummary.objects.rebuild_after_deletes():
+        classes = list(
+            FitnessClass.objects.filter(class_time__lt=before)
+            .order_by("class_time", "id")
+            .values(*get_copied_fields(FitnessClass))[:batch_size]
+        )
+        if not classes:
+            return 0, 0
+
+        class_ids = [row["id"] for row in classes]
+        bookings = FitnessClassBooking.objects.filter(fitness_class_id__in=class_ids)
+        archived_bookings = [
+            ArchivedFitnessClassBooking(**row)
+            for row in bookings.values(*get_copied_fields(FitnessClassBooking))
+        ]
+
+        ArchivedFitnessClass.objects.bulk_create(
+            [ArchivedFitnessClass(**row) for row in classes]
+        )
+        ArchivedFitnessClassBooking.objects.bulk_create(archived_bookings)
+        bookings.delete()
+        FitnessClass.objects.filter(id__in=class_ids).delete()
+
+    return len(classes), len(archived_bookings)
@@ -0,0 +1,100 @@
+"""
+Process local snapshot of seat availability of upcoming classes.
+
+The snapshot maps class ids to their available slots and is served from memory. It is refreshed
+at most every `CLASS_AVAILABILITY_MAX_STALENESS` seconds, or on the next read after a class or
+booking write in this process, by reading only the classes updated since the last refresh.
+A full reload every `CLASS_AVAILABILITY_FULL_RELOAD` seconds drops classes deleted elsewhere.
+
+Reads iterate the map without the lock, so writers build a new map and swap it in, never
+changing the one being read.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+# Classes updated this long before the last seen `updated_at` are read again on refresh, so rows
+# of transactions that committed out of order are not missed.
+WATERMARK_OVERLAP = timedelta(seconds=10)
+
+
+class AvailabilitySnapshot:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._classes = {}
+        self._watermark = None
+        self._refreshed_at = None
+        self._reloaded_at = None
+
+    def mark_stale(self):
+        self._refreshed_at = None
+
+    def discard(self, class_id):
+        with self._lock:
+            classes = dict(self._classes)
+            classes.pop(class_id, None)
+            self._classes = classes
+
+    def get(self):
+        """
+        Returns `{class id: available slots}` of upcoming classes.
+        """
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    self._refresh()
+
+        now = timezone.now()
+        return {
+            class_id: available_slots
+            for class_id, (available_slots, class_time) in self._classes.items()
+            if class_time >= now
+        }
+
+    def _is_stale(self):
+        return (
+            self._refreshed_at is None
+            or time.monotonic() - self._refreshed_at > settings.CLASS_AVAILABILITY_MAX_STALENESS
+        )
+
+    def _refresh(self):
+        from api.models import FitnessClass
+
+        now = time.monotonic()
+        full_reload = (
+            self._reloaded_at is None
+            or now - self._reloaded_at > settings.CLASS_AVAILABILITY_FULL_RELOAD
+        )
+        if full_reload:
+            queryset = FitnessClass.objects.filter(class_time__gte=timezone.now())
+            classes = {}
+        else:
+            queryset = FitnessClass.objects.filter(
+                updated_at__gte=self._watermark - WATERMARK_OVERLAP
+            )
+            classes = dict(self._classes)
+
+        watermark = self._watermark
+        for class_id, available_slots, class_time, updated_at in queryset.values_list(
+            "id", "available_slots", "class_time", "updated_at"
+        ):
+            classes[class_id] = (available_slots, class_time)
+            watermark = updated_at if watermark is None else max(watermark, updated_at)
+
+        cutoff = timezone.now()
+        self._classes = {
+            class_id: row for class_id, row in classes.items() if row[1] >= cutoff
+        }
+        self._watermark = watermark or timezone.now()
+        self._refreshed_at = now
+        if full_reload:
+            self._reloaded_at = now
+
+
+availability_snapshot = AvailabilitySnapshot()
@@ -0,0 +1,80 @@
+"""
+Versioned response cache of the class list API.
+
+Every cached response key embeds a version counter. Writes that change what the class list shows
+bump the counter instead of deleting keys, so all cached pages, time zones and query parameters
+are invalidated at once and stale entries simply expire.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from api.availability import availability_snapshot
+
+CLASS_LIST_VERSION_KEY = "class-list:version"
+CLASS_LIST_HITS_KEY = "class-list:hits"
+CLASS_LIST_MISSES_KEY = "class-list:misses"
+
+
+def get_class_list_version():
+    # A missing or evicted counter restarts from the current time, never reusing old versions.
+    return cache.get_or_set(CLASS_LIST_VERSION_KEY, time.time_ns, timeout=None)
+
+
+def bump_class_list_version():
+    try:
+        cache.incr(CLASS_LIST_VERSION_KEY)
+    except ValueError:
+        cache.set(CLASS_LIST_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def _invalidate():
+    bump_class_list_version()
+    availability_snapshot.mark_stale()
+
+
+def invalidate_class_list():
+    """
+    Invalidates cached class list responses and the availability snapshot after a write.
+
+    Both are invalidated right away, and again once the transaction commits, so a response read
+    and cached before the commit cannot outlive the write.
+    """
+    _invalidate()
+    transaction.on_commit(_invalidate)
+
+
+def get_canonical_query_string(query_params):
+    """
+    Returns the query parameters in a stable order, so equal queries share cache keys and ETags.
+    """
+    return "&".join(
+        f"{key}={value}" for key, values in sorted(query_params.lists()) for value in values
+    )
+
+
+def get_class_list_cache_key(timezone_name, query_params):
+    params = get_canonical_query_string(query_params)
+    digest = hashlib.md5(f"{timezone_name}|{params}".encode()).hexdigest()
+
+    return f"class-list:{get_class_list_version()}:{digest}"
+
+
+def record_class_list_lookup(hit):
+    key = CLASS_LIST_HITS_KEY if hit else CLASS_LIST_MISSES_KEY
+    if not cache.add(key, 1, timeout=None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, timeout=None)
+
+
+def get_class_list_cache_stats():
+    stats = cache.get_many([CLASS_LIST_HITS_KEY, CLASS_LIST_MISSES_KEY])
+
+    return {
+        "hits": stats.get(CLASS_LIST_HITS_KEY, 0),
+        "misses": stats.get(CLASS_LIST_MISSES_KEY, 0),
+    }
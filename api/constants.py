@@ -1,7 +1,56 @@
-from django.db.models import TextChoices
+from django.db.models import IntegerChoices, TextChoices
 
 
 class ClassTypeChoices(TextChoices):
     YOGA = "yoga", "Yoga"
     ZUMBA = "zumba", "Zumba"
     HIIT = "hiit", "HIIT"
+
+
+class BatchModeChoices(TextChoices):
+    PARTIAL = "partial", "Partial"
+    ATOMIC = "atomic", "All or nothing"
+
+
+# Maximum number of bookings accepted in a single batch booking request.
+MAX_BATCH_BOOKINGS = 100
+
+
+class ExportFormatChoices(TextChoices):
+    NDJSON = "ndjson", "Newline delimited JSON"
+    CSV = "csv", "CSV"
+
+
+# Number of rows fetched from the database at a time by streaming exports.
+EXPORT_CHUNK_SIZE = 2000
+
+
+class WeekdayChoices(IntegerChoices):
+    MONDAY = 0, "Monday"
+    TUESDAY = 1, "Tuesday"
+    WEDNESDAY = 2, "Wednesday"
+    THURSDAY = 3, "Thursday"
+    FRIDAY = 4, "Friday"
+    SATURDAY = 5, "Saturday"
+    SUNDAY = 6, "Sunday"
+
+
+# Number of classes inserted per query and transaction by the schedule import.
+IMPORT_BATCH_SIZE = 500
+
+# Number of classes moved to the archive tables per transaction by `archive_past_classes`.
+ARCHIVE_BATCH_SIZE = 200
+
+# Unfiltered admin changelists of tables estimated to hold more rows show the estimate instead
+# of counting them.
+ADMIN_ESTIMATED_COUNT_THRESHOLD = 100000
+
+
+class BookingOutcomeChoices(TextChoices):
+    BOOKED = "booked", "Booked"
+    WAITLISTED = "waitlisted", "Class full, waitlisted"
+    CLASS_STARTED = "class_started", "Class already started"
+    DUPLICATE = "duplicate", "Already booked or waitlisted"
+    INVALID = "invalid", "Invalid request"
+    THROTTLED = "throttled", "Throttled"
+    REPLAYED = "replayed", "Replayed for an Idempotency-Key"
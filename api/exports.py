@@ -0,0 +1,127 @@
+"""
+Streaming export of bookings, shared by the export API and the `export_bookings` command.
+
+Rows are read with `.iterator(chunk_size=...)` and written out one at a time, so memory stays
+constant whatever the number of bookings exported.
+"""
+import csv
+
+from rest_framework import renderers, serializers
+
+from api.constants import EXPORT_CHUNK_SIZE, ExportFormatChoices
+from api.models import FitnessClassBooking
+from api.serializers import BookingValuesSerializer
+
+CSV_COLUMNS = (
+    "id",
+    "client_name",
+    "client_email",
+    "booked_at",
+    "fitness_class",
+    "class_name",
+    "class_type",
+    "class_time",
+    "instructor_name",
+    "instructor_email",
+)
+
+
+class BookingExportFilterSerializer(serializers.Serializer):
+    """
+    Serializer to validate the filters of a bookings export.
+    Bookings can be filtered by client email, fitness class and booking date range.
+    """
+    email = serializers.EmailField(required=False)
+    fitness_class = serializers.IntegerField(required=False)
+    start = serializers.DateTimeField(required=False, help_text="Booked at or after.")
+    end = serializers.DateTimeField(required=False, help_text="Booked before.")
+
+    def validate(self, data):
+        if "start" in data and "end" in data and data["start"] >= data["end"]:
+            raise serializers.ValidationError("start must be before end.")
+
+        return data
+
+    def get_queryset(self):
+        queryset = FitnessClassBooking.objects.order_by("id")
+        if "email" in self.validated_data:
+            queryset = queryset.filter(client_email=self.validated_data["email"])
+        if "fitness_class" in self.validated_data:
+            queryset = queryset.filter(fitness_class_id=self.validated_data["fitness_class"])
+        if "start" in self.validated_data:
+            queryset = queryset.filter(created_at__gte=self.validated_data["start"])
+        if "end" in self.validated_data:
+            queryset = queryset.filter(created_at__lt=self.validated_data["end"])
+
+        return queryset
+
+
+class NDJSONRenderer(renderers.JSONRenderer):
+    media_type = "application/x-ndjson"
+    format = ExportFormatChoices.NDJSON.value
+
+
+class CSVRenderer(renderers.BaseRenderer):
+    """
+    Exports are streamed by the view, this renderer only renders error responses.
+    """
+    media_type = "text/csv"
+    format = ExportFormatChoices.CSV.value
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return renderers.JSONRenderer().render(data)
+
+
+class Echo:
+    """
+    File like object handing back what csv.writer writes to it, to stream CSV lines.
+    """
+    def write(self, value):
+        return value
+
+
+def iter_bookings(queryset, serializer, chunk_size):
+    for row in queryset.values(*serializer.values).iterator(chunk_size=chunk_size):
+        yield serializer.to_representation(row)
+
+
+def iter_ndjson(bookings):
+    renderer = renderers.JSONRenderer()
+    for booking in bookings:
+        yield renderer.render(booking).decode() + "\n"
+
+
+def iter_csv(bookings):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for booking in bookings:
+        fitness_class = booking["fitness_class_details"]
+        yield writer.writerow((
+            booking["id"],
+            booking["client_name"],
+            booking["client_email"],
+            booking["booked_at"],
+            booking["fitness_class"],
+            fitness_class["name"],
+            fitness_class["class_type"],
+            fitness_class["class_time"],
+            fitness_class["instructor_name"],
+            fitness_class["instructor_email"],
+        ))
+
+
+EXPORT_WRITERS = {
+    ExportFormatChoices.NDJSON: iter_ndjson,
+    ExportFormatChoices.CSV: iter_csv,
+}
+
+
+def export_bookings(queryset, context, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Returns a generator of the bookings of `queryset` in `export_format`, a line at a time.
+    The serializer is built right away, so a bad time zone fails before anything is streamed.
+    """
+    serializer = BookingValuesSerializer(context)
+
+    return EXPORT_WRITERS[export_format](iter_bookings(queryset, serializer, chunk_size))
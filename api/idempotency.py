@@ -0,0 +1,93 @@
+"""
+Idempotency keys for POST APIs, so clients can safely retry a request whose response they lost.
+
+The first successful response of a key is stored in the `idempotency` cache for
+IDEMPOTENCY_KEY_TIMEOUT seconds, bounded by the MAX_ENTRIES of that cache, and replayed for every
+retry with the same key from the cache alone. A key is claimed with an atomic `cache.add` before
+the request runs, so concurrent retries wait for the first one instead of running again.
+Failed requests release their key, so they can be retried for real.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+# Seconds a claimed key stays claimed if its request dies before storing a response, and seconds
+# between two looks at a key claimed by a concurrent request.
+CLAIM_TIMEOUT = 60
+POLL_INTERVAL = 0.05
+
+
+class IdempotencyKeyInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "A request with this Idempotency-Key is still in progress, retry later."
+    default_code = "idempotency_key_in_progress"
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = "This Idempotency-Key was already used with a different request."
+    default_code = "idempotency_key_reused"
+
+
+def get_request_fingerprint(request):
+    return hashlib.md5(
+        json.dumps(request.data, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def idempotent_response(request, key, get_response):
+    """
+    Returns the stored response of `key` if there is one, else the response of `get_response()`,
+    stored when successful. Replayed responses carry the `Idempotent-Replayed` header.
+    """
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValidationError(
+            f"{IDEMPOTENCY_KEY_HEADER} must be between 1 and {MAX_KEY_LENGTH} characters."
+        )
+
+    cache = caches["idempotency"]
+    cache_key = f"idempotency:{request.path}:{hashlib.md5(key.encode()).hexdigest()}"
+    fingerprint = get_request_fingerprint(request)
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+
+    while not cache.add(cache_key, {"fingerprint": fingerprint}, CLAIM_TIMEOUT):
+        stored = cache.get(cache_key)
+        if stored is None:
+            # Released by a failed request or expired, claim it again.
+            continue
+        if stored["fingerprint"] != fingerprint:
+            raise IdempotencyKeyReused()
+        if "status" in stored:
+            response = Response(stored["data"], status=stored["status"])
+            response[IDEMPOTENCY_REPLAYED_HEADER] = "true"
+            return response
+        if time.monotonic() > deadline:
+            raise IdempotencyKeyInProgress()
+        time.sleep(POLL_INTERVAL)
+
+    try:
+        response = get_response()
+    except Exception:
+        cache.delete(cache_key)
+        raise
+
+    if status.is_success(response.status_code):
+        cache.set(
+            cache_key,
+            {"fingerprint": fingerprint, "status": response.status_code, "data": response.data},
+            settings.IDEMPOTENCY_KEY_TIMEOUT,
+        )
+    else:
+        cache.delete(cache_key)
+
+    return response
@@ -0,0 +1,61 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.archive import archive_classes
+from api.constants import ARCHIVE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves fitness classes that started more than --days days ago, with their bookings, into "
+        "the archive tables a batch per transaction. Batches are spaced by --sleep seconds so it "
+        "can run next to live bookings, and an interrupted run resumes when run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=settings.CLASS_ARCHIVE_AFTER_DAYS,
+            help="Keep classes of the last DAYS days in the hot tables.",
+        )
+        parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument(
+            "--sleep", type=float, default=0.5, help="Seconds to pause between batches."
+        )
+        parser.add_argument(
+            "--max-batches", type=int, default=None, help="Stop after this many batches."
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] < 0 or options["batch_size"] < 1:
+            raise CommandError("--days must not be negative and --batch-size must be positive.")
+
+        before = timezone.now() - timedelta(days=options["days"])
+        classes = bookings = batches = 0
+        while options["max_batches"] is None or batches < options["max_batches"]:
+            if batches and options["sleep"]:
+                time.sleep(options["sleep"])
+
+            archived_classes, archived_bookings = archive_classes(before, options["batch_size"])
+            if not archived_classes:
+                break
+
+            batches += 1
+            classes += archived_classes
+            bookings += archived_bookings
+            self.stdout.write(
+                f"Batch {batches}: archived {archived_classes} classes and "
+                f"{archived_bookings} bookings."
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Archived {classes} classes and {bookings} bookings of classes before "
+                f"{before:%Y-%m-%d %H:%M}."
+            )
+        )
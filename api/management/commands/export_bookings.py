@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.serializers import ValidationError
+
+from api.constants import EXPORT_CHUNK_SIZE, ExportFormatChoices
+from api.exports import BookingExportFilterSerializer, export_bookings
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports bookings as NDJSON or CSV, streaming them a row at a time. "
+        "Same output and filters as the /api/bookings/export/ API."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", choices=ExportFormatChoices.values, default=ExportFormatChoices.NDJSON
+        )
+        parser.add_argument("--email", help="Only bookings of this client email.")
+        parser.add_argument("--fitness-class", help="Only bookings of this fitness class id.")
+        parser.add_argument("--start", help="Only bookings made at or after this ISO datetime.")
+        parser.add_argument("--end", help="Only bookings made before this ISO datetime.")
+        parser.add_argument("--timezone", default=settings.TIME_ZONE)
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+        parser.add_argument("--output", help="File to write to, instead of standard output.")
+
+    def handle(self, *args, **options):
+        filters = BookingExportFilterSerializer(
+            data={
+                name: options[name]
+                for name in ("email", "fitness_class", "start", "end")
+                if options[name] is not None
+            }
+        )
+        if not filters.is_valid():
+            raise CommandError(filters.errors)
+
+        try:
+            lines = export_bookings(
+                filters.get_queryset(),
+                {"timezone": options["timezone"]},
+                options["format"],
+                chunk_size=options["chunk_size"],
+            )
+        except ValidationError as exc:
+            raise CommandError(exc.detail)
+
+        if not options["output"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        with open(options["output"], "w", encoding="utf-8", newline="") as output:
+            output.writelines(lines)
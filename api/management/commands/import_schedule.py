@@ -0,0 +1,102 @@
+import time
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+from rest_framework.serializers import ValidationError
+
+from api.cache import invalidate_class_list
+from api.constants import IMPORT_BATCH_SIZE
+from api.models import FitnessClass
+from api.schedules import ScheduleSerializer, expand_schedule, read_schedules
+from api.serializers import get_timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports recurring class schedules from a CSV or JSON file, creating a fitness class for "
+        "every occurrence between --start and --end. Classes that already exist, with the same "
+        "instructor and time, are skipped so the import can be re-run safely."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row, or JSON file of a list.")
+        parser.add_argument("--start", required=True, help="First day to schedule, YYYY-MM-DD.")
+        parser.add_argument("--end", required=True, help="Last day to schedule, YYYY-MM-DD.")
+        parser.add_argument(
+            "--timezone",
+            default=settings.TIME_ZONE,
+            help="Time zone of the schedule times.",
+        )
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        start_date, end_date = parse_date(options["start"]), parse_date(options["end"])
+        if not start_date or not end_date or start_date > end_date:
+            raise CommandError("--start and --end must be dates, with --start before --end.")
+
+        try:
+            tz = get_timezone(options["timezone"])
+            rows = read_schedules(options["path"])
+        except ValidationError as exc:
+            raise CommandError(exc.detail)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read {options['path']}: {exc}")
+
+        serializer = ScheduleSerializer(data=rows, many=True)
+        if not serializer.is_valid():
+            errors = serializer.errors
+            # Depending on the DRF version, errors of a list are a list or a dict by index.
+            errors = errors.items() if isinstance(errors, dict) else enumerate(errors)
+            raise CommandError(
+                "Invalid schedules:\n" + "\n".join(
+                    f"  row {index + 1}: " + "; ".join(
+                        f"{field}: {' '.join(messages)}" for field, messages in row_errors.items()
+                    )
+                    for index, row_errors in errors
+                    if row_errors
+                )
+            )
+
+        started = time.perf_counter()
+        # Occurrences already in the database, keyed by time and instructor.
+        existing = set(
+            FitnessClass.objects.filter(
+                class_time__gte=datetime.combine(start_date, datetime.min.time(), tzinfo=tz),
+                class_time__lt=datetime.combine(
+                    end_date + timedelta(days=1), datetime.min.time(), tzinfo=tz
+                ),
+            ).values_list("class_time", "instructor_email")
+        )
+        expanded = 0
+        new_classes = []
+        for schedule in serializer.validated_data:
+            for fitness_class in expand_schedule(schedule, start_date, end_date, tz):
+                expanded += 1
+                key = (fitness_class.class_time, fitness_class.instructor_email)
+                if key not in existing:
+                    existing.add(key)
+                    new_classes.append(fitness_class)
+
+        created = 0
+        batches = iter(new_classes)
+        while batch := list(islice(batches, options["batch_size"])):
+            with transaction.atomic():
+                FitnessClass.objects.bulk_create(batch)
+            created += len(batch)
+
+        if created:
+            # bulk_create sends no save signals, so invalidate cached class lists here.
+            invalidate_class_list()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {created} classes from {len(rows)} schedules, skipped "
+                f"{expanded - created} existing, in {elapsed:.2f}s "
+                f"({expanded / elapsed if elapsed else 0:.0f} rows/s)."
+            )
+        )
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api.models import ClientBookingSummary
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the booking summary of every client from the bookings with one grouped "
+        "query, and deletes the summaries of clients without bookings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = ClientBookingSummary.objects.rebuild(batch_size=options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} client booking summaries."))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from api.cache import invalidate_class_list
+from api.models import FitnessClass, Seat
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes available slots of every fitness class as max slots minus its bookings, "
+        "and fixes the classes whose counter or seats drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Report drifted classes without fixing them."
+        )
+
+    def handle(self, *args, **options):
+        drifted = 0
+        taken = (
+            Seat.objects.filter(fitness_class=OuterRef("pk"), is_taken=True)
+            .order_by()
+            .values("fitness_class")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+        # One grouped aggregate over all classes, instead of a count query per class.
+        for class_id, max_slots, available_slots, booked, seat_inventory, taken_seats in (
+            FitnessClass.objects.annotate(
+                booked=Count("bookings"), taken_seats=Coalesce(Subquery(taken), 0)
+            )
+            .order_by("id")
+            .values_list(
+                "id", "max_slots", "available_slots", "booked", "seat_inventory", "taken_seats"
+            )
+        ):
+            expected = max(max_slots - booked, 0)
+            if available_slots != expected:
+                drifted += 1
+                self.stdout.write(
+                    f"Class {class_id}: {available_slots} available slots, expected {expected} "
+                    f"({booked} bookings of {max_slots} slots)."
+                )
+            elif seat_inventory and taken_seats != booked:
+                drifted += 1
+                self.stdout.write(
+                    f"Class {class_id}: {taken_seats} taken seats, expected {booked}."
+                )
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"Found {drifted} drifted classes."))
+            return
+
+        # The report above may be outdated by now, and cannot see bookings holding other seats
+        # than the taken ones, so the fix always runs and recounts the bookings itself.
+        fixed = FitnessClass.objects.reconcile_available_slots()
+        if fixed:
+            invalidate_class_list()
+
+        self.stdout.write(self.style.SUCCESS(f"Fixed {fixed} drifted classes."))
@@ -0,0 +1,219 @@
+"""
+Process local request metrics, exposed in the Prometheus text format.
+
+Metrics are plain counters and histograms guarded by one lock, so recording a request costs a few
+dictionary updates. Every server process keeps its own metrics, so with several workers each
+scrape reads the worker that answered it.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from api.cache import get_class_list_cache_stats
+from api.constants import BookingOutcomeChoices
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+RESPONSE_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values):
+    labels = ",".join(
+        f'{name}="{escape_label_value(value)}"' for name, value in zip(names, values)
+    )
+
+    return f"{{{labels}}}" if labels else ""
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter, one sample per combination of label values.
+    """
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.samples = {}
+
+    def inc(self, labels=(), amount=1):
+        self.samples[labels] = self.samples.get(labels, 0) + amount
+
+    def render(self):
+        for labels, value in self.samples.items():
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}"
+
+
+class Histogram(Counter):
+    """
+    Histogram of observed values, with cumulative buckets rendered at scrape time.
+    """
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self, labels, value):
+        sample = self.samples.get(labels)
+        if sample is None:
+            # Per bucket counts, the last one for values above every bound, then the sum.
+            sample = self.samples[labels] = [0] * (len(self.buckets) + 2)
+        sample[bisect_left(self.buckets, value)] += 1
+        sample[-1] += value
+
+    def render(self):
+        bucket_names = self.labelnames + ("le",)
+        for labels, sample in self.samples.items():
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), sample):
+                total += count
+                yield (
+                    f"{self.name}_bucket{format_labels(bucket_names, labels + (bound,))} {total}"
+                )
+            labels = format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{labels} {format_value(sample[-1])}"
+            yield f"{self.name}_count{labels} {total}"
+
+
+class MetricsRegistry:
+    """
+    The metrics recorded by the API, see MetricsMiddleware.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = Counter(
+                "http_requests_total",
+                "Requests served, by route, method and status code.",
+                ("route", "method", "status"),
+            )
+            self.duration = Histogram(
+                "http_request_duration_seconds",
+                "Request latency in seconds, by route and method.",
+                ("route", "method"),
+            )
+            self.queries = Histogram(
+                "http_request_db_queries",
+                "SQL queries run per request, by route and method.",
+                ("route", "method"),
+                buckets=QUERY_COUNT_BUCKETS,
+            )
+            self.query_seconds = Counter(
+                "http_request_db_query_seconds_total",
+                "Seconds spent running SQL queries, by route and method.",
+                ("route", "method"),
+            )
+            self.response_size = Histogram(
+                "http_response_size_bytes",
+                "Response body size in bytes, by route and method, streams excluded.",
+                ("route", "method"),
+                buckets=RESPONSE_SIZE_BUCKETS,
+            )
+            self.booking_outcomes = Counter(
+                "booking_outcomes_total",
+                "Outcomes of booking requests.",
+                ("outcome",),
+            )
+
+    @property
+    def metrics(self):
+        return (
+            self.requests,
+            self.duration,
+            self.queries,
+            self.query_seconds,
+            self.response_size,
+            self.booking_outcomes,
+        )
+
+    def observe_request(self, route, method, status, duration, queries, query_seconds, size):
+        labels = (route, method)
+        with self.lock:
+            self.requests.inc((route, method, status))
+            self.duration.observe(labels, duration)
+            self.queries.observe(labels, queries)
+            self.query_seconds.inc(labels, query_seconds)
+            if size is not None:
+                self.response_size.observe(labels, size)
+
+    def record_booking_outcome(self, outcome):
+        with self.lock:
+            self.booking_outcomes.inc((BookingOutcomeChoices(outcome).value,))
+
+    def get_cache_metrics(self):
+        """
+        Returns the class list cache lookups, read at scrape time from the cache, which shares
+        them between the processes using it.
+        """
+        lookups = Counter(
+            "class_list_cache_lookups_total",
+            "Class list cache lookups, by result.",
+            ("result",),
+        )
+        stats = get_class_list_cache_stats()
+        lookups.inc(("hit",), stats["hits"])
+        lookups.inc(("miss",), stats["misses"])
+
+        return (lookups,)
+
+    def render(self):
+        cache_metrics = self.get_cache_metrics()
+        with self.lock:
+            lines = []
+            for metric in self.metrics + cache_metrics:
+                lines.append(f"# HELP {metric.name} {metric.documentation}")
+                lines.append(f"# TYPE {metric.name} {metric.type}")
+                lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+
+# Counter of the request being measured, see MetricsMiddleware. Context variables reach the
+# threads async requests run their queries in, which hold their own database connections.
+request_query_counter = ContextVar("request_query_counter", default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper of every connection, counting the query against the counter of the
+    request being measured, if any.
+    """
+    counter = request_query_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+
+    return counter(execute, sql, params, many, context)
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting the queries of a request and the time they take.
+    """
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,62 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from api.metrics import QueryCounter, metrics, request_query_counter
+
+
+class MetricsMiddleware:
+    """
+    Middleware to record the latency, SQL queries and response size of every request, by route.
+
+    Routes are labelled with their URL name, like `api:class-list`, so the number of series stays
+    bounded whatever the URLs requested. Queries run while a streamed response is iterated, after
+    the view returned, are not counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        counter = QueryCounter()
+        started = time.perf_counter()
+        token = request_query_counter.set(counter)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_query_counter.reset(token)
+
+        return self.observe(request, response, counter, started)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        token = request_query_counter.set(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_query_counter.reset(token)
+
+        return self.observe(request, response, counter, started)
+
+    def observe(self, request, response, counter, started):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        metrics.observe_request(
+            route=match.view_name if match else "unmatched",
+            method=request.method,
+            status=response.status_code,
+            duration=duration,
+            queries=counter.count,
+            query_seconds=counter.seconds,
+            size=None if response.streaming else len(response.content),
+        )
+
+        return response
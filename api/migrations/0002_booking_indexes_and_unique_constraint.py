@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:47
+
+from django.db import migrations, models
+from django.db.models import Count, F, Min
+from django.db.models.functions import Least, Now
+
+
+def delete_duplicate_bookings(apps, schema_editor):
+    """
+    Deletes bookings duplicating an older booking of the same client and class, left by racing
+    requests before the unique constraint, keeping the oldest, and gives their seats back.
+    """
+    FitnessClass = apps.get_model("api", "FitnessClass")
+    FitnessClassBooking = apps.get_model("api", "FitnessClassBooking")
+    db_alias = schema_editor.connection.alias
+    bookings = FitnessClassBooking.objects.using(db_alias)
+
+    duplicates = list(
+        bookings.order_by()
+        .values("fitness_class_id", "client_email")
+        .annotate(first_id=Min("id"), count=Count("id"))
+        .filter(count__gt=1)
+    )
+    for row in duplicates:
+        deleted, _ = (
+            bookings.filter(
+                fitness_class_id=row["fitness_class_id"], client_email=row["client_email"]
+            )
+            .exclude(id=row["first_id"])
+            .delete()
+        )
+        FitnessClass.objects.using(db_alias).filter(pk=row["fitness_class_id"]).update(
+            available_slots=Least(F("available_slots") + deleted, F("max_slots")),
+            updated_at=Now(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fitnessclass',
+            index=models.Index(fields=['class_time'], name='fitness_class_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fitnessclassbooking',
+            index=models.Index(fields=['client_email', 'created_at'], name='booking_email_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fitnessclassbooking',
+            index=models.Index(fields=['created_at'], name='booking_created_idx'),
+        ),
+        migrations.RunPython(delete_duplicate_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='fitnessclassbooking',
+            constraint=models.UniqueConstraint(fields=('fitness_class', 'client_email'), name='unique_client_booking'),
+        ),
+    ]
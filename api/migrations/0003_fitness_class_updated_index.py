@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_booking_indexes_and_unique_constraint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fitnessclass',
+            index=models.Index(fields=['updated_at'], name='fitness_class_updated_idx'),
+        ),
+    ]
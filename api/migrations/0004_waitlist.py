@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_fitness_class_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client_name', models.CharField(max_length=100)),
+                ('client_email', models.EmailField(max_length=200)),
+                ('fitness_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='api.fitnessclass')),
+            ],
+            options={
+                'abstract': False,
+                'indexes': [models.Index(fields=['fitness_class', 'id'], name='waitlist_class_fifo_idx'), models.Index(fields=['client_email'], name='waitlist_email_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fitness_class', 'client_email'), name='unique_client_waitlist_entry')],
+            },
+        ),
+    ]
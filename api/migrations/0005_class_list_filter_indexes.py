@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fitnessclass',
+            index=models.Index(fields=['class_type', 'class_time'], name='fitness_class_type_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fitnessclass',
+            index=models.Index(fields=['instructor_email', 'class_time'], name='fitness_class_instructor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fitnessclass',
+            index=models.Index(condition=models.Q(('available_slots__gt', 0)), fields=['class_time'], name='fitness_class_available_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_class_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedFitnessClass',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(blank=True, max_length=100, null=True)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('class_type', models.CharField(choices=[('yoga', 'Yoga'), ('zumba', 'Zumba'), ('hiit', 'HIIT')], max_length=10)),
+                ('class_time', models.DateTimeField()),
+                ('instructor_name', models.CharField(max_length=100)),
+                ('instructor_email', models.EmailField(max_length=200)),
+                ('max_slots', models.PositiveIntegerField()),
+                ('available_slots', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['class_time'], name='archived_class_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedFitnessClassBooking',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('client_name', models.CharField(max_length=100)),
+                ('client_email', models.EmailField(max_length=200)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('fitness_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='api.archivedfitnessclass')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['client_email', 'created_at'], name='archived_booking_email_idx'), models.Index(fields=['created_at'], name='archived_booking_created_idx')],
+            },
+        ),
+    ]
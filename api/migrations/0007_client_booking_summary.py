@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientBookingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_email', models.EmailField(max_length=200, unique=True)),
+                ('client_name', models.CharField(max_length=100)),
+                ('booking_count', models.PositiveIntegerField(default=0)),
+                ('upcoming_count', models.PositiveIntegerField(default=0)),
+                ('next_class_time', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('next_class', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.fitnessclass')),
+            ],
+        ),
+    ]
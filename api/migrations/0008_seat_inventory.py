@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_client_booking_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Seat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('is_taken', models.BooleanField(default=False)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='archivedfitnessclass',
+            name='seat_inventory',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='archivedfitnessclassbooking',
+            name='seat_number',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='fitnessclass',
+            name='seat_inventory',
+            field=models.BooleanField(default=False, help_text='Bookings claim one of the numbered seat rows of the class instead of all updating its available slots, for classes booked by many clients at once.'),
+        ),
+        migrations.AddField(
+            model_name='fitnessclassbooking',
+            name='seat_number',
+            field=models.PositiveIntegerField(blank=True, help_text='Seat of the booking, in classes with seat inventory.', null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='fitnessclassbooking',
+            constraint=models.UniqueConstraint(fields=('fitness_class', 'seat_number'), name='unique_class_seat_booking'),
+        ),
+        migrations.AddField(
+            model_name='seat',
+            name='fitness_class',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seats', to='api.fitnessclass'),
+        ),
+        migrations.AddIndex(
+            model_name='seat',
+            index=models.Index(condition=models.Q(('is_taken', False)), fields=['fitness_class', 'number'], name='seat_free_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='seat',
+            constraint=models.UniqueConstraint(fields=('fitness_class', 'number'), name='unique_class_seat'),
+        ),
+    ]
@@ -1,10 +1,35 @@
-from django.db import models
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Count, Exists, F, Max, Min, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
 from rest_framework.serializers import ValidationError
 from django.utils import timezone
 
+from api.cache import invalidate_class_list
 from api.constants import ClassTypeChoices
 
 
+class ClassFullError(ValidationError):
+    """
+    Raised when a class has no available slots left, so the client can be waitlisted instead.
+    """
+
+
+class ClassStartedError(ValidationError):
+    """
+    Raised when a class has already started, so its bookings can no longer change.
+    """
+
+
+class DuplicateBookingError(ValidationError):
+    """
+    Raised when a client has already booked, or is already waiting for, a class.
+    """
+
+
 class TimeStampedModel(models.Model):
     """
     An abstract model, that can be used as base model to track record's created and updated
@@ -18,6 +43,154 @@ class TimeStampedModel(models.Model):
         abstract = True
 
 
+class FitnessClassQuerySet(models.QuerySet):
+    @staticmethod
+    def get_booking_count():
+        """
+        Returns a correlated count of the bookings of a class, counted per row only.
+        """
+        bookings = (
+            FitnessClassBooking.objects.filter(fitness_class=OuterRef("pk"))
+            .order_by()
+            .values("fitness_class")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+
+        return Coalesce(Subquery(bookings), 0)
+
+    @staticmethod
+    def get_free_seat_count():
+        """
+        Returns a correlated count of the free seat rows of a class.
+        """
+        free = (
+            Seat.objects.filter(fitness_class=OuterRef("pk"), is_taken=False)
+            .order_by()
+            .values("fitness_class")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+
+        return Coalesce(Subquery(free), 0)
+
+    def with_booking_count(self):
+        """
+        Annotates the number of bookings of every class, counted on the bookings of the returned
+        rows only.
+        """
+        return self.annotate(booking_count=self.get_booking_count())
+
+    def reconcile_available_slots(self):
+        """
+        Sets `available_slots` of these classes to max slots minus their bookings with a single
+        UPDATE of the classes that drifted. Bookings are counted by the UPDATE itself, so bookings
+        and cancellations committed meanwhile are never overwritten. Classes with seat inventory
+        first free the seats no booking holds, and take the seats a booking holds, then count
+        their free seats instead. Returns the number of classes fixed.
+        """
+        now = timezone.now()
+        expected = Greatest(F("max_slots") - self.get_booking_count(), 0)
+        free = self.get_free_seat_count()
+        held = FitnessClassBooking.objects.filter(
+            fitness_class=OuterRef("fitness_class"), seat_number=OuterRef("number")
+        )
+        seats = Seat.objects.filter(fitness_class__in=self.filter(seat_inventory=True))
+
+        with transaction.atomic():
+            seats.filter(is_taken=True).exclude(Exists(held)).update(is_taken=False)
+            seats.filter(is_taken=False).filter(Exists(held)).update(is_taken=True)
+            fixed = (
+                self.filter(seat_inventory=False)
+                .exclude(available_slots=expected)
+                .update(available_slots=expected, updated_at=now)
+            )
+            fixed += (
+                self.filter(seat_inventory=True)
+                .exclude(available_slots=free)
+                .update(available_slots=free, updated_at=now)
+            )
+
+        return fixed
+
+    def sync_available_slots(self):
+        """
+        Copies the number of free seat rows of these classes into `available_slots` with a single
+        UPDATE.
+        """
+        return self.update(
+            available_slots=self.get_free_seat_count(), updated_at=timezone.now()
+        )
+
+    def set_max_slots(self, max_slots):
+        """
+        Changes the capacity of these classes to `max_slots` with set-based updates, leaving out
+        classes with more bookings, or taken seats above `max_slots`, and books the waitlists of
+        classes left with free seats. Returns the number of classes changed.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            # Slots are counted from the stored values, so bookings made meanwhile are kept.
+            changed = self.filter(
+                seat_inventory=False, available_slots__gte=F("max_slots") - max_slots
+            ).update(
+                available_slots=F("available_slots") + max_slots - F("max_slots"),
+                max_slots=max_slots,
+                updated_at=now,
+            )
+
+            taken_above = Seat.objects.filter(
+                fitness_class=OuterRef("pk"), number__gt=max_slots, is_taken=True
+            )
+            class_ids = list(
+                self.filter(seat_inventory=True)
+                .exclude(Exists(taken_above))
+                .values_list("pk", flat=True)
+            )
+            if class_ids:
+                Seat.objects.filter(
+                    fitness_class_id__in=class_ids, number__gt=max_slots, is_taken=False
+                ).delete()
+                Seat.objects.bulk_create(
+                    [
+                        Seat(fitness_class_id=class_id, number=number)
+                        for class_id in class_ids
+                        for number in range(1, max_slots + 1)
+                    ],
+                    ignore_conflicts=True,
+                    batch_size=1000,
+                )
+                FitnessClass.objects.filter(pk__in=class_ids).update(max_slots=max_slots)
+                changed += FitnessClass.objects.filter(pk__in=class_ids).sync_available_slots()
+
+            # Only a raised capacity frees seats, as full classes are the ones with a waitlist.
+            waiting = WaitlistEntry.objects.filter(fitness_class=OuterRef("pk"))
+            for fitness_class in self.filter(
+                Exists(waiting), max_slots=max_slots, available_slots__gt=0
+            ):
+                for _ in range(fitness_class.available_slots):
+                    if fitness_class.promote_waitlist(claim_slot=True) is None:
+                        break
+
+        invalidate_class_list()
+        return changed
+
+    def cancel(self):
+        """
+        Deletes these classes with their bookings, seats and waitlists in one transaction, and
+        rebuilds the booking summaries of their clients once. Returns the number of classes and
+        bookings deleted.
+        """
+        with transaction.atomic(), ClientBookingSummary.objects.rebuild_after_deletes():
+            class_ids = list(self.values_list("pk", flat=True))
+            _, deleted = FitnessClass.objects.filter(pk__in=class_ids).delete()
+
+        return (
+            deleted.get(FitnessClass._meta.label, 0),
+            deleted.get(FitnessClassBooking._meta.label, 0),
+        )
+
+
 class FitnessClass(TimeStampedModel):
     """
     Stores details regarding different types of fitness classes available.
@@ -38,27 +211,232 @@ class FitnessClass(TimeStampedModel):
     available_slots = models.PositiveIntegerField(
         help_text="Total number of available/unbooked seats."
     )
+    seat_inventory = models.BooleanField(
+        default=False,
+        help_text=(
+            "Bookings claim one of the numbered seat rows of the class instead of all updating "
+            "its available slots, for classes booked by many clients at once."
+        ),
+    )
+
+    objects = FitnessClassQuerySet.as_manager()
+
+    class Meta(TimeStampedModel.Meta):
+        indexes = [
+            models.Index(fields=["class_time"], name="fitness_class_time_idx"),
+            # Serve the class list filters, in class time order like the list itself.
+            models.Index(fields=["class_type", "class_time"], name="fitness_class_type_time_idx"),
+            models.Index(
+                fields=["instructor_email", "class_time"], name="fitness_class_instructor_idx"
+            ),
+            models.Index(
+                fields=["class_time"],
+                condition=models.Q(available_slots__gt=0),
+                name="fitness_class_available_idx",
+            ),
+            # Serves the incremental refreshes of the availability snapshot.
+            models.Index(fields=["updated_at"], name="fitness_class_updated_idx"),
+        ]
 
     def save(self, *args, **kwargs):
-        if self.pk is None and not hasattr(self, "available_slots"):
+        if self.pk is None and self.available_slots is None:
             self.available_slots = self.max_slots
         super().save(*args, **kwargs)
+        if self.seat_inventory:
+            self.create_seats()
 
     @property
     def is_available(self):
         return self.available_slots > 0
 
-    def book_slot(self):
-        if not self.is_available:
+    def create_seats(self):
+        """
+        Creates the missing seat rows up to `max_slots`, seating bookings made before the class
+        had seat inventory, and drops free seats above `max_slots`.
+        """
+        numbers = set(self.seats.values_list("number", flat=True))
+        missing = [number for number in range(1, self.max_slots + 1) if number not in numbers]
+        unseated = list(self.bookings.filter(seat_number__isnull=True).order_by("id")[: len(missing)])
+        for booking, number in zip(unseated, missing):
+            booking.seat_number = number
+
+        Seat.objects.bulk_create(
+            [
+                Seat(fitness_class=self, number=number, is_taken=index < len(unseated))
+                for index, number in enumerate(missing)
+            ]
+        )
+        FitnessClassBooking.objects.bulk_update(unseated, ["seat_number"])
+        self.seats.filter(number__gt=self.max_slots, is_taken=False).delete()
+
+    def book_slot(self, seats=1, seat_number=None):
+        """
+        Claims `seats` seats of this class with a single guarded UPDATE, so concurrent bookings
+        can never oversell the class. The number of updated rows decides the outcome.
+        Classes with seat inventory claim seat rows instead, see `claim_seats`.
+        """
+        if self.seat_inventory:
+            return self.claim_seats(seats, seat_number)
+        if seat_number is not None:
+            raise ValidationError("Seats can only be picked in classes with seat inventory.")
+
+        now = timezone.now()
+        claimed = FitnessClass.objects.filter(
+            pk=self.pk, available_slots__gte=seats, class_time__gt=now
+        ).update(available_slots=F("available_slots") - seats, updated_at=now)
+
+        if not claimed:
+            self.refresh_from_db(fields=["available_slots", "class_time"])
+            # Started classes are never waitlisted, even when they are full as well.
+            if self.class_time <= now:
+                raise ClassStartedError("Class already started, cannot book slot.")
+
+            if not self.is_available:
+                raise ClassFullError(
+                    f"No available slots for this {self.class_type} class"
+                )
+
             raise ValidationError(
-                f"No available slots for this {self.class_type} class"
+                f"Only {self.available_slots} slots left for this {self.class_type} class"
+            )
+
+        self.available_slots -= seats
+        self.updated_at = now
+        invalidate_class_list()
+
+    def claim_seats(self, seats=1, seat_number=None):
+        """
+        Claims `seats` free seat rows of this class, or the seat `seat_number`, and returns their
+        numbers.
+
+        On databases with SKIP LOCKED, like PostgreSQL, rows locked by concurrent bookings are
+        skipped instead of waited for, so concurrent bookings claim different seats in parallel
+        and the class row is never locked. Elsewhere the guarded UPDATE claims them under the
+        database write lock, which SQLite holds for the whole transaction.
+        """
+        now = timezone.now()
+        if self.class_time <= now:
+            raise ClassStartedError("Class already started, cannot book slot.")
+
+        free = self.seats.filter(is_taken=False).order_by("number")
+        if seat_number is not None:
+            free = free.filter(number=seat_number)
+
+        with transaction.atomic():
+            numbers = dict(
+                free.select_for_update(skip_locked=True).values_list("pk", "number")[:seats]
             )
+            claimed = Seat.objects.filter(pk__in=numbers, is_taken=False).update(is_taken=True)
+            if claimed == seats:
+                self.available_slots = max(self.available_slots - seats, 0)
+                self.sync_available_slots()
+                return sorted(numbers.values())
+
+            transaction.set_rollback(True)
+
+        if seat_number is not None and self.seats.filter(number=seat_number).exists():
+            raise ValidationError(f"Seat {seat_number} is already taken.")
+        if seat_number is not None:
+            raise ValidationError(f"This class has no seat {seat_number}.")
+
+        self.available_slots = len(numbers)
+        if not numbers:
+            raise ClassFullError(f"No available slots for this {self.class_type} class")
+
+        raise ValidationError(
+            f"Only {self.available_slots} slots left for this {self.class_type} class"
+        )
+
+    def sync_available_slots(self):
+        """
+        Copies the number of free seat rows into `available_slots` once the transaction commits,
+        in its own UPDATE, so seat bookings never wait on the lock of the class row.
+        """
+        def sync():
+            FitnessClass.objects.filter(pk=self.pk).sync_available_slots()
+            invalidate_class_list()
+
+        transaction.on_commit(sync)
 
-        if self.class_time < timezone.now():
-            raise ValidationError(f"Class already started, cannot book slot.")
+    def release_slot(self, seats=1, seat_numbers=()):
+        """
+        Gives back `seats` seats of this class with a single UPDATE, never above `max_slots`.
+        Classes with seat inventory free the seats `seat_numbers` instead.
+        """
+        if self.seat_inventory:
+            seat_numbers = [number for number in seat_numbers if number is not None]
+            self.seats.filter(number__in=seat_numbers).update(is_taken=False)
+            self.sync_available_slots()
+            return
 
-        self.available_slots -= 1
-        self.save()
+        now = timezone.now()
+        FitnessClass.objects.filter(
+            pk=self.pk, available_slots__lte=F("max_slots") - seats
+        ).update(available_slots=F("available_slots") + seats, updated_at=now)
+        invalidate_class_list()
+
+    def promote_waitlist(self, claim_slot=False, seat_number=None):
+        """
+        Books the head of the waitlist and returns the booking, or None if nobody is waiting.
+
+        The head is found with one lookup on the `(fitness_class, id)` index. By default it takes
+        the seat of a booking cancelled in the same transaction, numbered `seat_number` in
+        classes with seat inventory. With `claim_slot` a free seat is claimed for it instead.
+        """
+        with transaction.atomic():
+            # The seat is claimed before the waitlist is read, so SQLite takes its write lock
+            # first instead of failing to upgrade a read lock under concurrent bookings.
+            if claim_slot:
+                try:
+                    seat_number = (self.book_slot() or [None])[0]
+                except ValidationError:
+                    return None
+
+            entries = self.waitlist.select_for_update(skip_locked=True).order_by("id")
+            head = entries.first()
+            if head is None:
+                if claim_slot:
+                    self.release_slot(seat_numbers=[seat_number])
+                return None
+
+            if not claim_slot:
+                # Seat count is unchanged, but the waitlist positions of this class are not.
+                FitnessClass.objects.filter(pk=self.pk).update(updated_at=timezone.now())
+
+            while head is not None:
+                booking = head.promote(seat_number)
+                if booking is not None:
+                    return booking
+                head = entries.first()
+
+            if claim_slot:
+                self.release_slot(seat_numbers=[seat_number])
+            return None
+
+
+class Seat(models.Model):
+    """
+    Stores the numbered seats of a fitness class with seat inventory, one row per seat, so
+    concurrent bookings lock and claim different rows instead of all updating the class row.
+    """
+    fitness_class = models.ForeignKey(
+        FitnessClass, on_delete=models.CASCADE, related_name="seats"
+    )
+    number = models.PositiveIntegerField()
+    is_taken = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Free seats of a class in seat order, the rows bookings pick from.
+            models.Index(
+                fields=["fitness_class", "number"],
+                condition=models.Q(is_taken=False),
+                name="seat_free_idx",
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["fitness_class", "number"], name="unique_class_seat"),
+        ]
 
 
 class FitnessClassBooking(TimeStampedModel):
@@ -70,8 +448,353 @@ class FitnessClassBooking(TimeStampedModel):
     )
     client_name = models.CharField(max_length=100)
     client_email = models.EmailField(max_length=200)
+    seat_number = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Seat of the booking, in classes with seat inventory."
+    )
+
+    class Meta(TimeStampedModel.Meta):
+        indexes = [
+            models.Index(fields=["client_email", "created_at"], name="booking_email_created_idx"),
+            models.Index(fields=["created_at"], name="booking_created_idx"),
+        ]
+        constraints = [
+            # Guards against duplicate bookings, even when two requests race each other.
+            models.UniqueConstraint(
+                fields=["fitness_class", "client_email"], name="unique_client_booking"
+            ),
+            models.UniqueConstraint(
+                fields=["fitness_class", "seat_number"], name="unique_class_seat_booking"
+            ),
+        ]
+
+    def save(self, *args, claim_slot=True, **kwargs):
+        if self.pk is None and claim_slot:
+            # Seat claim and booking insert commit or roll back together.
+            with transaction.atomic():
+                seat_numbers = self.fitness_class.book_slot(seat_number=self.seat_number)
+                if seat_numbers:
+                    self.seat_number = seat_numbers[0]
+                super().save(*args, **kwargs)
+            return
 
-    def save(self, *args, **kwargs):
-        if self.pk is None:
-            self.fitness_class.book_slot()
         super().save(*args, **kwargs)
+
+    def cancel(self):
+        """
+        Deletes this booking and hands its seat to the head of the waitlist, or gives it back to the
+        class if nobody is waiting, in one transaction.
+        """
+        if self.fitness_class.class_time <= timezone.now():
+            raise ClassStartedError("Class already started, cannot cancel booking.")
+
+        with transaction.atomic():
+            # Only the request that actually deleted the booking releases the seat.
+            deleted, _ = FitnessClassBooking.objects.filter(pk=self.pk).delete()
+            if deleted and self.fitness_class.promote_waitlist(seat_number=self.seat_number) is None:
+                self.fitness_class.release_slot(seat_numbers=[self.seat_number])
+
+
+class WaitlistEntryQuerySet(models.QuerySet):
+    def with_position(self):
+        """
+        Annotates the 1-based position of every entry in the waitlist of its class, counted on the
+        `(fitness_class, id)` index.
+        """
+        ahead = (
+            WaitlistEntry.objects.filter(
+                fitness_class=OuterRef("fitness_class"), id__lt=OuterRef("id")
+            )
+            .order_by()
+            .values("fitness_class")
+            .annotate(count=Count("id"))
+            .values("count")
+        )
+
+        return self.annotate(position=Coalesce(Subquery(ahead), 0) + 1)
+
+
+class WaitlistEntry(TimeStampedModel):
+    """
+    Stores clients waiting for a seat of a full fitness class, first come first served.
+    """
+    fitness_class = models.ForeignKey(
+        FitnessClass, on_delete=models.CASCADE, related_name="waitlist"
+    )
+    client_name = models.CharField(max_length=100)
+    client_email = models.EmailField(max_length=200)
+
+    objects = WaitlistEntryQuerySet.as_manager()
+
+    class Meta(TimeStampedModel.Meta):
+        indexes = [
+            # Ids only grow, so they give the FIFO order of the waitlist of a class.
+            models.Index(fields=["fitness_class", "id"], name="waitlist_class_fifo_idx"),
+            models.Index(fields=["client_email"], name="waitlist_email_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["fitness_class", "client_email"], name="unique_client_waitlist_entry"
+            ),
+        ]
+
+    @property
+    def position(self):
+        return WaitlistEntry.objects.filter(
+            fitness_class_id=self.fitness_class_id, id__lt=self.id
+        ).count() + 1
+
+    def promote(self, seat_number=None):
+        """
+        Turns this entry into a booking on a seat already held for it, numbered `seat_number` in
+        classes with seat inventory. Returns None, dropping the entry, if the client has booked
+        this class in the meantime.
+        """
+        booking = FitnessClassBooking(
+            fitness_class=self.fitness_class,
+            client_name=self.client_name,
+            client_email=self.client_email,
+            seat_number=seat_number,
+        )
+        try:
+            with transaction.atomic():
+                booking.save(claim_slot=False)
+        except IntegrityError:
+            booking = None
+
+        self.delete()
+        return booking
+
+
+class ArchivedFitnessClass(models.Model):
+    """
+    Stores past fitness classes moved out of FitnessClass by the `archive_past_classes` command,
+    with their original ids and timestamps.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=100, null=True, blank=True)
+    description = models.TextField(null=True, blank=True)
+    class_type = models.CharField(max_length=10, choices=ClassTypeChoices.choices)
+    class_time = models.DateTimeField()
+    instructor_name = models.CharField(max_length=100)
+    instructor_email = models.EmailField(max_length=200)
+    max_slots = models.PositiveIntegerField()
+    available_slots = models.PositiveIntegerField()
+    seat_inventory = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["class_time"], name="archived_class_time_idx"),
+        ]
+
+
+class ArchivedFitnessClassBooking(models.Model):
+    """
+    Stores the bookings of archived fitness classes, with their original ids and timestamps.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    fitness_class = models.ForeignKey(
+        ArchivedFitnessClass, on_delete=models.CASCADE, related_name="bookings"
+    )
+    client_name = models.CharField(max_length=100)
+    client_email = models.EmailField(max_length=200)
+    seat_number = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["client_email", "created_at"], name="archived_booking_email_idx"
+            ),
+            models.Index(fields=["created_at"], name="archived_booking_created_idx"),
+        ]
+
+
+_deferred_summary_emails = ContextVar("deferred_summary_emails", default=None)
+
+
+class ClientBookingSummaryQuerySet(models.QuerySet):
+    def current(self):
+        """
+        Summaries whose upcoming count and next class are still exact, which they are until that
+        next class starts.
+        """
+        return self.filter(Q(next_class_time__isnull=True) | Q(next_class_time__gt=timezone.now()))
+
+    def record_bookings(self, bookings):
+        """
+        Counts new bookings in the summaries of their clients with one UPDATE each, rebuilding the
+        summaries that are missing or out of date instead.
+        """
+        now = timezone.now()
+        missing = []
+        for booking in bookings:
+            class_time = booking.fitness_class.class_time
+            updates = {}
+            if class_time > now:
+                earlier = Q(next_class_time__isnull=True) | Q(next_class_time__gt=class_time)
+                updates = {
+                    "upcoming_count": F("upcoming_count") + 1,
+                    "next_class_id": Case(
+                        When(earlier, then=Value(booking.fitness_class_id)),
+                        default=F("next_class_id"),
+                        output_field=models.BigIntegerField(),
+                    ),
+                    "next_class_time": Case(
+                        When(earlier, then=Value(class_time)), default=F("next_class_time")
+                    ),
+                }
+
+            updated = self.current().filter(client_email=booking.client_email).update(
+                client_name=booking.client_name,
+                booking_count=F("booking_count") + 1,
+                updated_at=now,
+                **updates,
+            )
+            if not updated:
+                missing.append(booking.client_email)
+
+        if missing:
+            self.rebuild(missing)
+
+    def record_deleted_booking(self, booking):
+        """
+        Takes a deleted booking out of the summary of its client with one UPDATE, rebuilding the
+        summary instead if it is out of date or the booking was for its next class. Deleting that
+        class sets the next class to NULL before its bookings are deleted, so a summary whose next
+        class is gone but whose next class time is set is rebuilt too.
+        """
+        deferred = _deferred_summary_emails.get()
+        if deferred is not None:
+            deferred.add(booking.client_email)
+            return
+
+        upcoming = Exists(
+            FitnessClass.objects.filter(pk=booking.fitness_class_id, class_time__gt=timezone.now())
+        )
+        updated = (
+            self.current()
+            .filter(client_email=booking.client_email)
+            .exclude(
+                Q(next_class_id=booking.fitness_class_id)
+                | Q(next_class__isnull=True, next_class_time__isnull=False)
+            )
+            .update(
+                booking_count=Greatest(F("booking_count") - 1, 0),
+                upcoming_count=Greatest(
+                    F("upcoming_count") - Case(When(upcoming, then=Value(1)), default=Value(0)),
+                    0,
+                ),
+                updated_at=timezone.now(),
+            )
+        )
+        if not updated:
+            self.rebuild([booking.client_email])
+
+    @contextmanager
+    def rebuild_after_deletes(self):
+        """
+        Defers the summary updates of bookings deleted inside the block, and rebuilds the
+        summaries of their clients once when it exits, for deletes of many bookings at once.
+        """
+        emails = set()
+        token = _deferred_summary_emails.set(emails)
+        try:
+            yield
+        finally:
+            _deferred_summary_emails.reset(token)
+
+        if emails:
+            self.rebuild(emails)
+
+    def rebuild(self, emails=None, batch_size=1000):
+        """
+        Recomputes the summaries of `emails`, or of every client, from their bookings with one
+        grouped query, and deletes the summaries of clients left without bookings. Returns the
+        number of summaries written.
+        """
+        upcoming = Q(fitness_class__class_time__gt=timezone.now())
+        next_class = (
+            FitnessClassBooking.objects.filter(upcoming, client_email=OuterRef("client_email"))
+            .order_by("fitness_class__class_time", "fitness_class_id")
+            .values("fitness_class_id")[:1]
+        )
+        bookings = FitnessClassBooking.objects.order_by()
+        if emails is not None:
+            bookings = bookings.filter(client_email__in=emails)
+
+        rows = (
+            bookings.values("client_email")
+            .annotate(
+                name=Max("client_name"),
+                booking_count=Count("id"),
+                upcoming_count=Count("id", filter=upcoming),
+                next_class_id=Subquery(next_class),
+                next_class_time=Min("fitness_class__class_time", filter=upcoming),
+            )
+            .iterator(chunk_size=batch_size)
+        )
+        written = set()
+        while batch := list(islice(rows, batch_size)):
+            self.bulk_create(
+                [ClientBookingSummary(client_name=row.pop("name"), **row) for row in batch],
+                update_conflicts=True,
+                unique_fields=["client_email"],
+                update_fields=[
+                    "client_name",
+                    "booking_count",
+                    "upcoming_count",
+                    "next_class",
+                    "next_class_time",
+                    "updated_at",
+                ],
+            )
+            written.update(row["client_email"] for row in batch)
+
+        if emails is None:
+            self.exclude(client_email__in=bookings.values("client_email")).delete()
+        elif set(emails) - written:
+            self.filter(client_email__in=set(emails) - written).delete()
+
+        return len(written)
+
+
+class ClientBookingSummary(models.Model):
+    """
+    Stores the booking counts and the next booked class of every client, kept up to date as
+    bookings are made and deleted, so a client is summarized without reading their bookings.
+    Archived bookings are not counted.
+    """
+    client_email = models.EmailField(max_length=200, unique=True)
+    client_name = models.CharField(max_length=100)
+    booking_count = models.PositiveIntegerField(default=0)
+    upcoming_count = models.PositiveIntegerField(default=0)
+    next_class = models.ForeignKey(
+        FitnessClass, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    # Copy of the class time of the next class, so updates can compare against it.
+    next_class_time = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ClientBookingSummaryQuerySet.as_manager()
+
+    @classmethod
+    def get_for_email(cls, email):
+        """
+        Returns the summary of `email`, rebuilt first if it is missing or out of date, or an
+        unsaved empty summary if the client has no bookings.
+        """
+        summaries = cls.objects.select_related("next_class").filter(client_email=email)
+        summary = summaries.first()
+        if summary is None or summary.is_stale:
+            cls.objects.rebuild([email])
+            summary = summaries.first()
+
+        return summary or cls(client_email=email)
+
+    @property
+    def is_stale(self):
+        return self.next_class_time is not None and self.next_class_time <= timezone.now()
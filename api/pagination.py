@@ -0,0 +1,152 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on an ordering column plus the primary key.
+
+    The cursor holds the `(value, id)` of the last row of the page, and the next page starts with
+    an index range scan right after it, so deep pages cost the same as the first page.
+    Subclasses set `ordering` to the ordering column and the primary key, e.g. `("class_time", "id")`,
+    prefixed with "-" for descending order.
+    """
+    ordering = ("id",)
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view)
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Async counterpart of `paginate_queryset`, fetching the page with the async ORM.
+        """
+        return await self.apaginate_querysets([queryset], request)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Paginates the rows of several querysets, like bookings split across the hot and archive
+        tables, as one list. Each queryset fetches a page at most, then the pages are merged.
+        """
+        return self.get_page(
+            self.merge_pages([list(self.get_page_queryset(qs, request)) for qs in querysets])
+        )
+
+    async def apaginate_querysets(self, querysets, request):
+        pages = []
+        for queryset in querysets:
+            queryset = self.get_page_queryset(queryset, request)
+            pages.append([row async for row in queryset.aiterator()])
+
+        return self.get_page(self.merge_pages(pages))
+
+    def merge_pages(self, pages):
+        if len(pages) == 1:
+            return pages[0]
+
+        rows = [row for page in pages for row in page]
+        rows.sort(key=self.get_position, reverse=self.ordering[0].startswith("-"))
+
+        return rows
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Returns the lazy queryset of the requested page, plus one row to tell if there is a next page.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.next_position = None
+
+        position = self.decode_cursor(request, queryset.model)
+        if position is not None:
+            queryset = self.filter_after(queryset, position)
+
+        return queryset.order_by(*self.ordering)[: self.page_size + 1]
+
+    def get_page(self, rows):
+        if len(rows) > self.page_size:
+            rows = rows[: self.page_size]
+            self.next_position = self.get_position(rows[-1])
+
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        return {"next": self.get_next_link(), "results": data}
+
+    def get_page_size(self, request):
+        page_size = settings.API_PAGE_SIZE
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            pass
+
+        return max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+
+        value, pk = self.next_position
+        cursor = base64.urlsafe_b64encode(
+            json.dumps([value.isoformat() if hasattr(value, "isoformat") else value, pk]).encode()
+        ).decode()
+        url = self.request.build_absolute_uri()
+
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_position(self, row):
+        field, pk = (name.lstrip("-") for name in self.ordering)
+        if isinstance(row, dict):
+            return row[field], row[pk]
+
+        return getattr(row, field), getattr(row, pk)
+
+    def decode_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+
+        field, pk = (name.lstrip("-") for name in self.ordering)
+        try:
+            value, pk_value = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return (
+                model._meta.get_field(field).to_python(value),
+                model._meta.get_field(pk).to_python(pk_value),
+            )
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def filter_after(self, queryset, position):
+        field, pk = self.ordering
+        value, pk_value = position
+        if field.startswith("-"):
+            field, pk = field[1:], pk[1:]
+            return queryset.filter(**{f"{field}__lte": value}).exclude(
+                Q(**{field: value, f"{pk}__gte": pk_value})
+            )
+
+        return queryset.filter(**{f"{field}__gte": value}).exclude(
+            Q(**{field: value, f"{pk}__lte": pk_value})
+        )
+
+
+class FitnessClassPagination(KeysetPagination):
+    ordering = ("class_time", "id")
+
+
+class BookingPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
@@ -0,0 +1,146 @@
+"""
+Database routing of the list APIs to read replicas, see DATABASE_REPLICAS in settings.py.
+
+Reads go to the primary unless ReplicaRoutingMiddleware lets a request read from a replica, which
+it does for GET requests of views with `replica_reads = True`. A request that writes reads from
+the primary for the rest of the request, and its response sets a cookie pinning the client's reads
+to the primary for REPLICA_STICKY_SECONDS, so clients see their own bookings while the replicas
+catch up.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PRIMARY_PIN_COOKIE = "primary_pinned_until"
+
+_routing = ContextVar("database_routing", default=None)
+
+
+class RoutingState:
+    """
+    Database routing of the current request.
+    """
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica = False
+        self.written = False
+
+
+def is_pinned_to_primary():
+    """
+    Returns whether the client of the current request wrote in the last REPLICA_STICKY_SECONDS.
+    """
+    state = _routing.get()
+
+    return state is not None and state.pinned
+
+
+def reads_from_replica():
+    """
+    Returns whether the reads of the current request go to a replica.
+    """
+    state = _routing.get()
+
+    return (
+        state is not None
+        and state.replica
+        and not state.written
+        and bool(settings.DATABASE_REPLICAS)
+    )
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends the reads of replica requests to a random DATABASE_REPLICAS alias and every write to
+    the primary. Other reads are left to Django, which reads from the primary or from the database
+    of the instance they start from.
+    """
+    def db_for_read(self, model, **hints):
+        if not reads_from_replica():
+            return None
+
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.written = True
+
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Middleware to route the reads of every request, see PrimaryReplicaRouter.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        state = RoutingState(pinned=self.is_pinned(request))
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        return self.pin_writer(state, response)
+
+    async def __acall__(self, request):
+        # Sync views and ORM calls run with a copy of this context, sharing the state object.
+        state = RoutingState(pinned=self.is_pinned(request))
+        token = _routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+        return self.pin_writer(state, response)
+
+    def pin_writer(self, state, response):
+        if state.written and settings.DATABASE_REPLICAS:
+            sticky = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE,
+                str(time.time() + sticky),
+                max_age=sticky,
+                httponly=True,
+                samesite="Lax",
+            )
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing.get()
+        view_class = getattr(view_func, "view_class", None)
+        if (
+            request.method in ("GET", "HEAD")
+            and getattr(view_class, "replica_reads", False)
+            and not state.pinned
+        ):
+            state.replica = True
+
+    def is_pinned(self, request):
+        try:
+            return float(request.COOKIES.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
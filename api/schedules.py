@@ -0,0 +1,81 @@
+"""
+Recurring class schedules, expanded into fitness classes by the `import_schedule` command.
+"""
+import csv
+import json
+from datetime import datetime, timedelta
+
+from rest_framework import serializers
+
+from api.constants import ClassTypeChoices, WeekdayChoices
+from api.models import FitnessClass
+
+WEEKDAYS = {
+    **{label.lower(): value for value, label in WeekdayChoices.choices},
+    **{label[:3].lower(): value for value, label in WeekdayChoices.choices},
+}
+
+
+class ScheduleSerializer(serializers.Serializer):
+    """
+    Serializer to validate a recurring schedule, a class held every week on the same weekday
+    and time, e.g. every monday at 07:00.
+    """
+    name = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    description = serializers.CharField(required=False, allow_blank=True)
+    class_type = serializers.ChoiceField(choices=ClassTypeChoices.choices)
+    weekday = serializers.CharField(help_text="Weekday name like monday, or mon.")
+    time = serializers.TimeField()
+    instructor_name = serializers.CharField(max_length=100)
+    instructor_email = serializers.EmailField(max_length=200)
+    capacity = serializers.IntegerField(min_value=1)
+    start_date = serializers.DateField(required=False, help_text="First day of the schedule.")
+    end_date = serializers.DateField(required=False, help_text="Last day of the schedule.")
+
+    def validate_weekday(self, value):
+        try:
+            return WEEKDAYS[value.strip().lower()]
+        except KeyError:
+            raise serializers.ValidationError(f'"{value}" is not a valid weekday.')
+
+
+def read_schedules(path):
+    """
+    Reads schedule rows from a CSV file with a header row, or a JSON file holding a list.
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.lower().endswith(".json"):
+            schedules = json.load(file)
+            if not isinstance(schedules, list):
+                raise ValueError("expected a JSON list of schedules.")
+
+            return schedules
+
+        # Empty CSV cells are left out, so optional fields fall back to their defaults.
+        return [
+            {key: value for key, value in row.items() if value not in ("", None)}
+            for row in csv.DictReader(file)
+        ]
+
+
+def expand_schedule(schedule, start_date, end_date, tz):
+    """
+    Yields an unsaved fitness class for every occurrence of `schedule` between the two dates,
+    both included, with `available_slots` set since `bulk_create` skips `FitnessClass.save()`.
+    """
+    day = max(start_date, schedule.get("start_date", start_date))
+    end_date = min(end_date, schedule.get("end_date", end_date))
+    day += timedelta(days=(schedule["weekday"] - day.weekday()) % 7)
+
+    while day <= end_date:
+        yield FitnessClass(
+            name=schedule.get("name") or None,
+            description=schedule.get("description") or None,
+            class_type=schedule["class_type"],
+            class_time=datetime.combine(day, schedule["time"], tzinfo=tz),
+            instructor_name=schedule["instructor_name"],
+            instructor_email=schedule["instructor_email"],
+            max_slots=schedule["capacity"],
+            available_slots=schedule["capacity"],
+        )
+        day += timedelta(days=7)
@@ -1,8 +1,47 @@
+from collections import defaultdict
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import serializers
 
-from api.constants import ClassTypeChoices
-from api.models import FitnessClass, FitnessClassBooking
-import pytz
+from api.constants import BatchModeChoices, ClassTypeChoices, MAX_BATCH_BOOKINGS
+from api.models import (
+    ClassStartedError,
+    ClientBookingSummary,
+    DuplicateBookingError,
+    FitnessClass,
+    FitnessClassBooking,
+    WaitlistEntry,
+)
+
+CLASS_TYPE_LABELS = dict(ClassTypeChoices.choices)
+
+
+@lru_cache(maxsize=None)
+def get_timezone(name):
+    """
+    Returns the time zone for an IANA name like `Asia/Kolkata`, cached for the process lifetime.
+    """
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise serializers.ValidationError(f'Unknown time zone "{name}".')
+
+
+def format_datetime(value, tz):
+    """
+    Formats a datetime in the given time zone exactly like `serializers.DateTimeField` does.
+    """
+    if not value:
+        return None
+
+    value = value.astimezone(tz).isoformat()
+    if value.endswith("+00:00"):
+        value = value[:-6] + "Z"
+
+    return value
 
 
 class FitnessClassSerializer(serializers.ModelSerializer):
@@ -25,18 +64,21 @@ class FitnessClassSerializer(serializers.ModelSerializer):
             "available_slots",
             "max_slots",
             "is_available",
+            "seat_inventory",
             "created_at",
         )
 
-    def to_representation(self, instance):
-        self.fields["class_time"] = serializers.DateTimeField(
-            default_timezone=pytz.timezone(self.context["timezone"])
+    def get_fields(self):
+        # Fields are built once per serializer, so the time zone is resolved once, not per row.
+        fields = super().get_fields()
+        fields["class_time"] = serializers.DateTimeField(
+            default_timezone=get_timezone(self.context["timezone"])
         )
 
-        return super().to_representation(instance)
+        return fields
 
     def get_class_type_display(self, obj):
-        return dict(ClassTypeChoices.choices)[obj.class_type]
+        return CLASS_TYPE_LABELS[obj.class_type]
 
 
 class BookingSerializer(serializers.ModelSerializer):
@@ -47,6 +89,11 @@ class BookingSerializer(serializers.ModelSerializer):
         source="fitness_class", read_only=True
     )
     booked_at = serializers.DateTimeField(source="created_at", read_only=True)
+    seat_number = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        help_text="Seat to book in classes with seat inventory, any free seat if left out.",
+    )
 
     class Meta:
         model = FitnessClassBooking
@@ -56,20 +103,400 @@ class BookingSerializer(serializers.ModelSerializer):
             "fitness_class_details",
             "client_name",
             "client_email",
+            "seat_number",
             "booked_at",
         )
+        # Skip the unique together validator DRF derives from `unique_client_booking`.
+        validators = []
 
-    def to_representation(self, instance):
-        self.fields["booked_at"] = serializers.DateTimeField(
-            source="created_at", default_timezone=pytz.timezone(self.context["timezone"]), read_only=True
+    def get_fields(self):
+        fields = super().get_fields()
+        fields["booked_at"] = serializers.DateTimeField(
+            source="created_at",
+            default_timezone=get_timezone(self.context["timezone"]),
+            read_only=True,
         )
 
-        return super().to_representation(instance)
+        return fields
+
+    def create(self, validated_data):
+        # Duplicate bookings are caught by the `unique_client_booking` constraint instead of a
+        # pre-check query, which also covers two requests racing each other.
+        try:
+            return super().create(validated_data)
+        except IntegrityError:
+            raise DuplicateBookingError("You have already booked this class.")
+
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    """
+    WaitlistEntry serializer to put a client on the waitlist of a full fitness class.
+    Saving returns the booking instead of the entry if a seat was free for it after all.
+    """
+    fitness_class_details = FitnessClassSerializer(
+        source="fitness_class", read_only=True
+    )
+    position = serializers.IntegerField(read_only=True)
+    waitlisted_at = serializers.DateTimeField(source="created_at", read_only=True)
+
+    class Meta:
+        model = WaitlistEntry
+        fields = (
+            "id",
+            "fitness_class",
+            "fitness_class_details",
+            "client_name",
+            "client_email",
+            "position",
+            "waitlisted_at",
+        )
+        validators = []
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields["waitlisted_at"] = serializers.DateTimeField(
+            source="created_at",
+            default_timezone=get_timezone(self.context["timezone"]),
+            read_only=True,
+        )
+
+        return fields
+
+    def create(self, validated_data):
+        fitness_class = validated_data["fitness_class"]
+        if fitness_class.class_time <= timezone.now():
+            raise ClassStartedError("Class already started, cannot join its waitlist.")
+        if fitness_class.bookings.filter(client_email=validated_data["client_email"]).exists():
+            raise DuplicateBookingError("You have already booked this class.")
+
+        try:
+            with transaction.atomic():
+                entry = super().create(validated_data)
+        except IntegrityError:
+            raise DuplicateBookingError("You are already on the waitlist of this class.")
+
+        # A seat freed after the booking failed, but before this entry existed, had nobody to go
+        # to. Hand it to the head of the waitlist, which may be this very entry.
+        booking = fitness_class.promote_waitlist(claim_slot=True)
+        if booking is not None and booking.client_email == entry.client_email:
+            return booking
+
+        return entry
+
+
+class NextClassSerializer(serializers.ModelSerializer):
+    """
+    FitnessClass serializer with only the details a client needs to get to their next class.
+    """
+    class Meta:
+        model = FitnessClass
+        fields = ("id", "name", "class_type", "class_time", "instructor_name")
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields["class_time"] = serializers.DateTimeField(
+            default_timezone=get_timezone(self.context["timezone"])
+        )
+
+        return fields
+
+
+class ClientBookingSummarySerializer(serializers.ModelSerializer):
+    """
+    ClientBookingSummary serializer to get the booking counts and next class of a client.
+    """
+    next_class = NextClassSerializer(read_only=True)
+
+    class Meta:
+        model = ClientBookingSummary
+        fields = ("client_email", "client_name", "booking_count", "upcoming_count", "next_class")
+
+
+class FitnessClassFilterSerializer(serializers.Serializer):
+    """
+    Serializer to validate the filters of the class list.
+    Classes can be filtered by class type, instructor email, class time range and available
+    slots, and searched by name.
+    """
+    class_type = serializers.ChoiceField(choices=ClassTypeChoices.choices, required=False)
+    instructor = serializers.EmailField(required=False, help_text="Instructor email.")
+    start = serializers.DateTimeField(required=False, help_text="Starting at or after.")
+    end = serializers.DateTimeField(required=False, help_text="Starting before.")
+    available_only = serializers.BooleanField(required=False)
+    search = serializers.CharField(required=False, max_length=100, help_text="Part of the name.")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Resolved up front, as an unknown time zone fails the request rather than a filter.
+        self.timezone = get_timezone(self.context["timezone"])
+
+    def get_fields(self):
+        # Dates without a time zone are in the time zone of the request.
+        fields = super().get_fields()
+        for name in ("start", "end"):
+            fields[name] = serializers.DateTimeField(
+                required=False,
+                default_timezone=self.timezone,
+                help_text=fields[name].help_text,
+            )
+
+        return fields
 
     def validate(self, data):
-        if FitnessClassBooking.objects.filter(
-            fitness_class=data["fitness_class"], client_email=data["client_email"]
-        ).exists():
-            raise serializers.ValidationError("You have already booked this class.")
+        if "start" in data and "end" in data and data["start"] >= data["end"]:
+            raise serializers.ValidationError("start must be before end.")
 
         return data
+
+    def filter_queryset(self, queryset):
+        if "class_type" in self.validated_data:
+            queryset = queryset.filter(class_type=self.validated_data["class_type"])
+        if "instructor" in self.validated_data:
+            queryset = queryset.filter(instructor_email=self.validated_data["instructor"])
+        if "start" in self.validated_data:
+            queryset = queryset.filter(class_time__gte=self.validated_data["start"])
+        if "end" in self.validated_data:
+            queryset = queryset.filter(class_time__lt=self.validated_data["end"])
+        if self.validated_data.get("available_only"):
+            queryset = queryset.filter(available_slots__gt=0)
+        if "search" in self.validated_data:
+            queryset = queryset.filter(name__icontains=self.validated_data["search"])
+
+        return queryset
+
+
+class FitnessClassValuesSerializer:
+    """
+    Read only fast path of FitnessClassSerializer for list APIs.
+
+    It builds the exact same output from `.values()` rows instead of model instances, with the
+    time zones resolved once per request instead of once per row.
+    """
+    values = (
+        "id",
+        "name",
+        "description",
+        "class_type",
+        "class_time",
+        "instructor_name",
+        "instructor_email",
+        "available_slots",
+        "max_slots",
+        "seat_inventory",
+        "created_at",
+    )
+
+    def __init__(self, context):
+        self.timezone = get_timezone(context["timezone"])
+        self.default_timezone = timezone.get_current_timezone()
+
+    def to_representation(self, row, prefix=""):
+        available_slots = row[f"{prefix}available_slots"]
+        class_type = row[f"{prefix}class_type"]
+
+        return {
+            "id": row[f"{prefix}id"],
+            "name": row[f"{prefix}name"],
+            "description": row[f"{prefix}description"],
+            "class_type": class_type,
+            "class_type_display": CLASS_TYPE_LABELS[class_type],
+            "class_time": format_datetime(row[f"{prefix}class_time"], self.timezone),
+            "instructor_name": row[f"{prefix}instructor_name"],
+            "instructor_email": row[f"{prefix}instructor_email"],
+            "available_slots": available_slots,
+            "max_slots": row[f"{prefix}max_slots"],
+            "is_available": available_slots > 0,
+            "seat_inventory": row[f"{prefix}seat_inventory"],
+            "created_at": format_datetime(row[f"{prefix}created_at"], self.default_timezone),
+        }
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class BookingValuesSerializer:
+    """
+    Read only fast path of BookingSerializer for list APIs, see FitnessClassValuesSerializer.
+    """
+    values = (
+        "id",
+        "client_name",
+        "client_email",
+        "seat_number",
+        "created_at",
+    ) + tuple(f"fitness_class__{name}" for name in FitnessClassValuesSerializer.values)
+
+    def __init__(self, context):
+        self.timezone = get_timezone(context["timezone"])
+        self.fitness_class_serializer = FitnessClassValuesSerializer(context)
+
+    def to_representation(self, row):
+        return {
+            "id": row["id"],
+            "fitness_class": row["fitness_class__id"],
+            "fitness_class_details": self.fitness_class_serializer.to_representation(
+                row, prefix="fitness_class__"
+            ),
+            "client_name": row["client_name"],
+            "client_email": row["client_email"],
+            "seat_number": row["seat_number"],
+            "booked_at": format_datetime(row["created_at"], self.timezone),
+        }
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class WaitlistEntryValuesSerializer:
+    """
+    Read only fast path of WaitlistEntrySerializer for list APIs, see FitnessClassValuesSerializer.
+    Rows must be annotated with `position`.
+    """
+    values = (
+        "id",
+        "client_name",
+        "client_email",
+        "position",
+        "created_at",
+    ) + tuple(f"fitness_class__{name}" for name in FitnessClassValuesSerializer.values)
+
+    def __init__(self, context):
+        self.timezone = get_timezone(context["timezone"])
+        self.fitness_class_serializer = FitnessClassValuesSerializer(context)
+
+    def to_representation(self, row):
+        return {
+            "id": row["id"],
+            "fitness_class": row["fitness_class__id"],
+            "fitness_class_details": self.fitness_class_serializer.to_representation(
+                row, prefix="fitness_class__"
+            ),
+            "client_name": row["client_name"],
+            "client_email": row["client_email"],
+            "position": row["position"],
+            "waitlisted_at": format_datetime(row["created_at"], self.timezone),
+        }
+
+    def serialize(self, rows):
+        return [self.to_representation(row) for row in rows]
+
+
+class BatchBookingItemSerializer(serializers.Serializer):
+    """
+    Single booking inside a batch. The fitness class is resolved by the batch serializer in one
+    query, instead of one query per item.
+    """
+    fitness_class = serializers.IntegerField()
+    client_name = serializers.CharField(max_length=100)
+    client_email = serializers.EmailField(max_length=200)
+
+
+class BatchBookingSerializer(serializers.Serializer):
+    """
+    Serializer to book several fitness classes in one request, for group and corporate sign-ups.
+
+    In `partial` mode every booking that can be made is made and the rest are reported as failed.
+    In `atomic` mode either all bookings are made or none of them.
+    """
+    mode = serializers.ChoiceField(
+        choices=BatchModeChoices.choices, default=BatchModeChoices.PARTIAL
+    )
+    bookings = BatchBookingItemSerializer(
+        many=True, allow_empty=False, max_length=MAX_BATCH_BOOKINGS
+    )
+
+    def create(self, validated_data):
+        items = validated_data["bookings"]
+        atomic = validated_data["mode"] == BatchModeChoices.ATOMIC
+        errors = {}
+
+        classes = FitnessClass.objects.in_bulk({item["fitness_class"] for item in items})
+        booked = set(
+            FitnessClassBooking.objects.filter(
+                fitness_class__in=classes.keys(),
+                client_email__in={item["client_email"] for item in items},
+            ).values_list("fitness_class_id", "client_email")
+        )
+
+        pending = defaultdict(list)
+        for index, item in enumerate(items):
+            key = (item["fitness_class"], item["client_email"])
+            if item["fitness_class"] not in classes:
+                errors[index] = f'Invalid pk "{item["fitness_class"]}" - object does not exist.'
+            elif key in booked:
+                errors[index] = "You have already booked this class."
+            else:
+                booked.add(key)
+                pending[item["fitness_class"]].append(index)
+
+        bookings = {}
+        try:
+            with transaction.atomic():
+                if not (atomic and errors):
+                    for class_id, indexes in pending.items():
+                        claimed, seat_numbers, error = self._claim_slots(
+                            classes[class_id], len(indexes), partial=not atomic
+                        )
+                        for index in indexes[claimed:]:
+                            errors[index] = error
+                        for position, index in enumerate(indexes[:claimed]):
+                            bookings[index] = FitnessClassBooking(
+                                fitness_class=classes[class_id],
+                                client_name=items[index]["client_name"],
+                                client_email=items[index]["client_email"],
+                                seat_number=seat_numbers[position] if seat_numbers else None,
+                            )
+
+                if atomic and errors:
+                    transaction.set_rollback(True)
+                    bookings = {}
+                else:
+                    FitnessClassBooking.objects.bulk_create(bookings.values())
+                    # Bulk inserts send no post_save signals, so the summaries of the clients
+                    # are rebuilt with one grouped query instead.
+                    ClientBookingSummary.objects.rebuild(
+                        {booking.client_email for booking in bookings.values()}
+                    )
+        except IntegrityError:
+            raise serializers.ValidationError(
+                "One of these classes was booked concurrently by the same client, please retry."
+            )
+
+        results = []
+        for index in range(len(items)):
+            if index in bookings:
+                booking = BookingSerializer(bookings[index], context=self.context).data
+                results.append({"index": index, "status": "booked", "booking": booking})
+            elif index in errors:
+                results.append({"index": index, "status": "failed", "error": errors[index]})
+            else:
+                results.append(
+                    {"index": index, "status": "skipped", "error": "Batch was not booked."}
+                )
+
+        return {
+            "mode": validated_data["mode"],
+            "booked": len(bookings),
+            "failed": len(items) - len(bookings),
+            "results": results,
+        }
+
+    @staticmethod
+    def _claim_slots(fitness_class, seats, partial):
+        """
+        Claims seats for all pending bookings of a class with one decrement. In partial mode falls
+        back to claiming whatever seats are left. Returns the claimed count, the claimed seat
+        numbers in classes with seat inventory, and the error, if any.
+        """
+        error = None
+        while seats:
+            try:
+                seat_numbers = fitness_class.book_slot(seats=seats)
+                return seats, seat_numbers, error
+            except serializers.ValidationError as exc:
+                error = str(exc.detail[0])
+                if not partial or not 0 < fitness_class.available_slots < seats:
+                    return 0, None, error
+                seats = fitness_class.available_slots
+
+        return 0, None, error
@@ -0,0 +1,44 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.availability import availability_snapshot
+from api.cache import invalidate_class_list
+from api.metrics import count_query
+from api.models import ClientBookingSummary, FitnessClass, FitnessClassBooking
+from api.throttling import class_type_cache
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    # Connections are reopened on the same wrapper, which keeps its execute wrappers.
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+@receiver(post_save, sender=FitnessClass)
+@receiver(post_delete, sender=FitnessClass)
+def invalidate_class_list_on_class_change(sender, **kwargs):
+    invalidate_class_list()
+
+
+@receiver(post_delete, sender=FitnessClass)
+def discard_deleted_class_availability(sender, instance, **kwargs):
+    availability_snapshot.discard(instance.pk)
+
+
+@receiver(post_save, sender=FitnessClass)
+@receiver(post_delete, sender=FitnessClass)
+def discard_changed_class_type(sender, instance, **kwargs):
+    class_type_cache.discard(instance.pk)
+
+
+@receiver(post_save, sender=FitnessClassBooking)
+def record_booking_in_summary(sender, instance, created, **kwargs):
+    if created:
+        ClientBookingSummary.objects.record_bookings([instance])
+
+
+@receiver(post_delete, sender=FitnessClassBooking)
+def record_deleted_booking_in_summary(sender, instance, **kwargs):
+    ClientBookingSummary.objects.record_deleted_booking(instance)
@@ -1,11 +1,64 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from unittest import mock, skipUnless
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.http import http_date
 from datetime import timedelta
-from rest_framework.test import APITestCase
+from django.test import override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework import status
+from rest_framework.serializers import ValidationError
 
-from api.models import FitnessClass, FitnessClassBooking
-from api.constants import ClassTypeChoices
+from api.archive import archive_classes
+from api.availability import availability_snapshot
+from api.cache import get_class_list_cache_stats
+from api.idempotency import idempotent_response
+from api.metrics import metrics
+from api.middleware import MetricsMiddleware
+from api.throttling import class_type_cache, token_buckets
+from api.routers import PRIMARY_PIN_COOKIE, ReplicaRoutingMiddleware
+from api.models import (
+    ArchivedFitnessClass,
+    ArchivedFitnessClassBooking,
+    ClassFullError,
+    ClassStartedError,
+    ClientBookingSummary,
+    FitnessClass,
+    FitnessClassBooking,
+    WaitlistEntry,
+)
+from api.serializers import (
+    BookingSerializer,
+    BookingValuesSerializer,
+    FitnessClassSerializer,
+    FitnessClassValuesSerializer,
+    WaitlistEntrySerializer,
+)
+from api.views import BookingListView, FitnessClassListView
+from api.constants import BookingOutcomeChoices, ClassTypeChoices
 
 
 class BookingCreateViewTests(APITestCase):
@@ -54,6 +107,10 @@ class BookingCreateViewTests(APITestCase):
         )
         cls.future_class.refresh_from_db()
 
+    def setUp(self):
+        cache.clear()
+        token_buckets.reset()
+
     def test_valid_booking_scenarios(self):
         """Test all valid booking scenarios."""
         url = reverse("api:book-class")
@@ -102,6 +159,7 @@ class BookingCreateViewTests(APITestCase):
                     "fitness_class_details",
                     "client_name",
                     "client_email",
+                    "seat_number",
                     "booked_at",
                 }
                 self.assertEqual(set(response.data.keys()), expected_keys)
@@ -148,15 +206,6 @@ class BookingCreateViewTests(APITestCase):
                 },
                 "expected_error": "Class already started",
             },
-            {
-                "name": "full_class",
-                "data": {
-                    "fitness_class": self.full_class.id,
-                    "client_name": "New Client",
-                    "client_email": "newfull@example.com",
-                },
-                "expected_error": "No available slots",
-            },
             {
                 "name": "missing_fitness_class",
                 "data": {
@@ -223,3 +272,2483 @@ class BookingCreateViewTests(APITestCase):
                 self.assertEqual(self.future_class.available_slots, 4)
                 self.assertEqual(self.past_class.available_slots, 5)
                 self.assertEqual(self.full_class.available_slots, 0)
+
+
+class BatchBookingCreateViewTests(APITestCase):
+    """
+    Test to check working of batch class booking API.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.yoga_class = FitnessClass.objects.create(
+            name="Team Yoga",
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() + timedelta(days=2),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=3,
+            available_slots=3,
+        )
+        cls.hiit_class = FitnessClass.objects.create(
+            name="Team HIIT",
+            class_type=ClassTypeChoices.HIIT,
+            class_time=timezone.now() + timedelta(days=3),
+            instructor_name="abc",
+            instructor_email="abc@example.com",
+            max_slots=10,
+            available_slots=10,
+        )
+        FitnessClassBooking.objects.create(
+            fitness_class=cls.hiit_class,
+            client_name="Existing Client",
+            client_email="existing@example.com",
+        )
+
+    def booking(self, fitness_class, email):
+        return {
+            "fitness_class": fitness_class.id,
+            "client_name": "Team Member",
+            "client_email": email,
+        }
+
+    def test_partial_batch_books_what_it_can(self):
+        """Test partial mode books available seats and reports the failures."""
+        url = reverse("api:book-class-batch")
+        data = {
+            "mode": "partial",
+            "bookings": [
+                self.booking(self.yoga_class, f"member{i}@example.com") for i in range(4)
+            ]
+            + [
+                self.booking(self.hiit_class, "existing@example.com"),
+                self.booking(self.hiit_class, "member0@example.com"),
+            ],
+        }
+
+        response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["booked"], 4)
+        self.assertEqual(response.data["failed"], 2)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["booked", "booked", "booked", "failed", "failed", "booked"],
+        )
+        self.assertIn("Only 3 slots left", response.data["results"][3]["error"])
+        self.assertIn("already booked", response.data["results"][4]["error"])
+        self.yoga_class.refresh_from_db()
+        self.hiit_class.refresh_from_db()
+        self.assertEqual(self.yoga_class.available_slots, 0)
+        self.assertEqual(self.hiit_class.available_slots, 8)
+        self.assertEqual(FitnessClassBooking.objects.count(), 5)
+
+    def test_atomic_batch_books_nothing_on_failure(self):
+        """Test atomic mode rolls back every booking when one of them fails."""
+        url = reverse("api:book-class-batch")
+        data = {
+            "mode": "atomic",
+            "bookings": [
+                self.booking(self.hiit_class, "member0@example.com"),
+                self.booking(self.yoga_class, "member0@example.com"),
+                self.booking(self.yoga_class, "member0@example.com"),
+            ],
+        }
+
+        response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["booked"], 0)
+        self.assertEqual(response.data["results"][2]["status"], "failed")
+        self.yoga_class.refresh_from_db()
+        self.hiit_class.refresh_from_db()
+        self.assertEqual(self.yoga_class.available_slots, 3)
+        self.assertEqual(self.hiit_class.available_slots, 9)
+        self.assertEqual(FitnessClassBooking.objects.count(), 1)
+
+    def test_atomic_batch_claims_one_decrement_per_class(self):
+        """Test a successful atomic batch runs a fixed number of queries."""
+        url = reverse("api:book-class-batch")
+        data = {
+            "mode": "atomic",
+            "bookings": [
+                self.booking(self.hiit_class, f"member{i}@example.com") for i in range(5)
+            ],
+        }
+
+        # Class lookup, duplicate check, savepoint, decrement, bulk insert, summaries rebuild
+        # (grouped select and upsert), release.
+        with self.assertNumQueries(8):
+            response = self.client.post(url, data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["booked"], 5)
+        self.hiit_class.refresh_from_db()
+        self.assertEqual(self.hiit_class.available_slots, 4)
+
+
+class ListPaginationTests(APITestCase):
+    """
+    Test to check cursor pagination of class and booking list APIs.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        class_time = timezone.now() + timedelta(days=1)
+        cls.classes = [
+            FitnessClass.objects.create(
+                name=f"Yoga {i}",
+                class_type=ClassTypeChoices.YOGA,
+                # Pairs of classes share a start time, to check ties are paged by id.
+                class_time=class_time + timedelta(hours=i // 2),
+                instructor_name="Jane Doe",
+                instructor_email="jane@example.com",
+                max_slots=10,
+                available_slots=10,
+            )
+            for i in range(5)
+        ]
+        cls.bookings = [
+            FitnessClassBooking.objects.create(
+                fitness_class=fitness_class,
+                client_name="Client",
+                client_email="client@example.com",
+            )
+            for fitness_class in cls.classes
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def collect_pages(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            ids.extend(row["id"] for row in response.data["results"])
+            url = response.data["next"]
+
+        return ids
+
+    def test_class_list_pages_by_class_time_and_id(self):
+        """Test walking every page returns each class once, in schedule order."""
+        ids = self.collect_pages(reverse("api:class-list") + "?page_size=2")
+
+        self.assertEqual(ids, [fitness_class.id for fitness_class in self.classes])
+
+    def test_booking_list_pages_latest_first(self):
+        """Test walking every page returns each booking once, latest first."""
+        ids = self.collect_pages(
+            reverse("api:booking-list") + "?email=client@example.com&page_size=2"
+        )
+
+        self.assertEqual(ids, [booking.id for booking in reversed(self.bookings)])
+
+    @override_settings(API_MAX_PAGE_SIZE=3)
+    def test_page_size_is_capped(self):
+        """Test clients cannot ask for more rows than the configured maximum."""
+        response = self.client.get(reverse("api:class-list") + "?page_size=1000")
+
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertIsNotNone(response.data["next"])
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is rejected."""
+        response = self.client.get(reverse("api:class-list") + "?cursor=garbage")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@skipUnless(connection.vendor == "sqlite", "Checks SQLite query plans.")
+class ListQueryPlanTests(APITestCase):
+    """
+    Test to check that list API queries are served by an index instead of a table scan or sort.
+    """
+    def explain(self, view_class, params=None):
+        view = view_class(
+            request=Request(APIRequestFactory().get("/", params)), format_kwarg=None
+        )
+        queryset = view.filter_queryset(view.get_queryset())
+        queryset = queryset.order_by(*view.pagination_class.ordering)
+
+        return queryset[:50].explain()
+
+    def test_list_queries_use_indexes(self):
+        """Test each list query searches an index and needs no extra sort."""
+        test_cases = [
+            ("class_list", FitnessClassListView, None, "fitness_class_time_idx"),
+            (
+                "class_type",
+                FitnessClassListView,
+                {"class_type": "hiit"},
+                "fitness_class_type_time_idx",
+            ),
+            (
+                "instructor",
+                FitnessClassListView,
+                {"instructor": "jane@example.com"},
+                "fitness_class_instructor_idx",
+            ),
+            (
+                "available_only",
+                FitnessClassListView,
+                {"available_only": "true"},
+                "fitness_class_available_idx",
+            ),
+            ("all_bookings", BookingListView, None, "booking_created_idx"),
+            (
+                "client_bookings",
+                BookingListView,
+                {"email": "client@example.com"},
+                "booking_email_created_idx",
+            ),
+        ]
+
+        for name, view_class, params, index in test_cases:
+            with self.subTest(name):
+                plan = self.explain(view_class, params)
+
+                self.assertIn(f"USING INDEX {index}", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+
+class ClassListFilterTests(APITestCase):
+    """
+    Test to check working of the class list filters.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.classes = {
+            "yoga": FitnessClass.objects.create(
+                name="Morning Yoga",
+                class_type=ClassTypeChoices.YOGA,
+                class_time=now + timedelta(days=1),
+                instructor_name="Jane Doe",
+                instructor_email="jane@example.com",
+                max_slots=10,
+                available_slots=10,
+            ),
+            "full_yoga": FitnessClass.objects.create(
+                name="Evening Yoga",
+                class_type=ClassTypeChoices.YOGA,
+                class_time=now + timedelta(days=2),
+                instructor_name="John Doe",
+                instructor_email="john@example.com",
+                max_slots=10,
+                available_slots=0,
+            ),
+            "hiit": FitnessClass.objects.create(
+                name="Power HIIT",
+                class_type=ClassTypeChoices.HIIT,
+                class_time=now + timedelta(days=3),
+                instructor_name="Jane Doe",
+                instructor_email="jane@example.com",
+                max_slots=10,
+                available_slots=5,
+            ),
+        }
+        cls.start = (now + timedelta(days=2) - timedelta(hours=1)).isoformat()
+
+    def setUp(self):
+        cache.clear()
+
+    def list_classes(self, params, url="api:class-list"):
+        return self.client.get(reverse(url), params)
+
+    def test_filters(self):
+        """Test every filter, alone and combined, on the sync and async class lists."""
+        test_cases = [
+            ("no_filter", {}, ["yoga", "full_yoga", "hiit"]),
+            ("class_type", {"class_type": "yoga"}, ["yoga", "full_yoga"]),
+            ("instructor", {"instructor": "jane@example.com"}, ["yoga", "hiit"]),
+            ("start", {"start": self.start}, ["full_yoga", "hiit"]),
+            ("end", {"end": self.start}, ["yoga"]),
+            ("available_only", {"available_only": "true"}, ["yoga", "hiit"]),
+            ("search", {"search": "yoga"}, ["yoga", "full_yoga"]),
+            (
+                "combined",
+                {"class_type": "yoga", "available_only": "true", "search": "MORNING"},
+                ["yoga"],
+            ),
+        ]
+
+        for url in ("api:class-list", "api:async-class-list"):
+            for name, params, expected in test_cases:
+                with self.subTest(url=url, filter=name):
+                    response = self.list_classes(params, url)
+
+                    self.assertEqual(response.status_code, status.HTTP_200_OK)
+                    self.assertEqual(
+                        [row["id"] for row in response.json()["results"]],
+                        [self.classes[key].id for key in expected],
+                    )
+
+    def test_invalid_filters(self):
+        """Test invalid filters are rejected."""
+        test_cases = [
+            ("class_type", {"class_type": "boxing"}),
+            ("instructor", {"instructor": "not-an-email"}),
+            ("start", {"start": "tomorrow"}),
+            ("range", {"start": self.start, "end": self.start}),
+        ]
+
+        for name, params in test_cases:
+            with self.subTest(name):
+                response = self.list_classes(params)
+
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(API_MAX_PAGE_SIZE=1000)
+class QueryCountTests(APITestCase):
+    """
+    Test to check that APIs run a constant number of queries, whatever the number of rows.
+    """
+    sizes = (1, 100, 1000)
+
+    def setUp(self):
+        token_buckets.reset()
+        cache.clear()
+
+    def seed(self, size):
+        """Tops up classes and bookings of `client@example.com` to `size` rows each."""
+        class_time = timezone.now() + timedelta(days=1)
+        existing = FitnessClass.objects.count()
+        classes = FitnessClass.objects.bulk_create(
+            FitnessClass(
+                name=f"Yoga {i}",
+                class_type=ClassTypeChoices.YOGA,
+                class_time=class_time + timedelta(minutes=i),
+                instructor_name="Jane Doe",
+                instructor_email="jane@example.com",
+                max_slots=10,
+                available_slots=9,
+            )
+            for i in range(existing, size)
+        )
+        FitnessClassBooking.objects.bulk_create(
+            FitnessClassBooking(
+                fitness_class=fitness_class,
+                client_name="Client",
+                client_email="client@example.com",
+            )
+            for fitness_class in classes
+        )
+
+    def test_list_query_counts(self):
+        """Test list APIs run constant queries for a full page of 1, 100 and 1000 rows."""
+        # ETag aggregate and page, plus the waitlist aggregate and rows of a client.
+        urls = [
+            (reverse("api:class-list"), {}, 2),
+            (reverse("api:booking-list"), {}, 2),
+            (reverse("api:booking-list"), {"email": "client@example.com"}, 4),
+        ]
+
+        for size in self.sizes:
+            self.seed(size)
+            for url, params, queries in urls:
+                with self.subTest(url=url, params=params, size=size):
+                    with self.assertNumQueries(queries):
+                        response = self.client.get(url, {"page_size": size, **params})
+
+                    self.assertEqual(len(response.data["results"]), size)
+
+    def test_booking_query_count(self):
+        """Test booking a class runs the same queries with 1, 100 and 1000 rows present."""
+        url = reverse("api:book-class")
+
+        for size in self.sizes:
+            self.seed(size)
+            data = {
+                "fitness_class": FitnessClass.objects.latest("id").id,
+                "client_name": "New Client",
+                "client_email": f"new{size}@example.com",
+            }
+            with self.subTest(size=size):
+                # Class lookup, savepoint, seat claim, booking insert, summary update, summary
+                # rebuild of the new client (grouped select and upsert), release.
+                with self.assertNumQueries(8):
+                    response = self.client.post(url, data, format="json")
+
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class ValuesSerializerTests(APITestCase):
+    """
+    Test to check that the read only values serializers match the model serializers byte for byte.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        for i, class_type in enumerate(ClassTypeChoices.values):
+            fitness_class = FitnessClass.objects.create(
+                name=None if i == 0 else f"Class {i}",
+                description=None if i == 1 else "Some description",
+                class_type=class_type,
+                class_time=timezone.now() + timedelta(days=i + 1, microseconds=i),
+                instructor_name="Jane Doe",
+                instructor_email="jane@example.com",
+                max_slots=1,
+                available_slots=1,
+            )
+            FitnessClassBooking.objects.create(
+                fitness_class=fitness_class,
+                client_name="Client",
+                client_email="client@example.com",
+            )
+
+    def test_output_is_byte_identical(self):
+        """Test both serialization paths render the same JSON in several time zones."""
+        renderer = JSONRenderer()
+        test_cases = [
+            (FitnessClassSerializer, FitnessClassValuesSerializer, FitnessClass),
+            (BookingSerializer, BookingValuesSerializer, FitnessClassBooking),
+        ]
+
+        for tz in ("Asia/Kolkata", "UTC", "America/New_York"):
+            context = {"timezone": tz}
+            for serializer_class, values_serializer_class, model in test_cases:
+                with self.subTest(serializer=serializer_class.__name__, timezone=tz):
+                    queryset = model.objects.order_by("id")
+                    values_serializer = values_serializer_class(context)
+
+                    self.assertEqual(
+                        renderer.render(values_serializer.serialize(
+                            queryset.values(*values_serializer.values)
+                        )),
+                        renderer.render(serializer_class(
+                            queryset, many=True, context=context
+                        ).data),
+                    )
+
+    def test_unknown_timezone(self):
+        """Test an unknown X-Timezone header is rejected."""
+        response = self.client.get(reverse("api:class-list"), HTTP_X_TIMEZONE="Mars/Olympus")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ClassListCacheTests(APITestCase):
+    """
+    Test to check caching and invalidation of the class list API.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.fitness_class = FitnessClass.objects.create(
+            name="Morning Yoga",
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() + timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=10,
+            available_slots=10,
+        )
+
+    def setUp(self):
+        token_buckets.reset()
+        cache.clear()
+
+    def test_repeated_read_is_served_from_cache(self):
+        """Test the second identical read runs no query, and other time zones miss."""
+        url = reverse("api:class-list")
+
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        other_timezone = self.client.get(url, HTTP_X_TIMEZONE="UTC")
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(other_timezone["X-Cache"], "MISS")
+        self.assertEqual(get_class_list_cache_stats(), {"hits": 1, "misses": 2})
+
+    def test_booking_is_visible_on_next_read(self):
+        """Test a booking invalidates the cached class list right away."""
+        url = reverse("api:class-list")
+        self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("api:book-class"),
+                {
+                    "fitness_class": self.fitness_class.id,
+                    "client_name": "New Client",
+                    "client_email": "new@example.com",
+                },
+                format="json",
+            )
+        response = self.client.get(url)
+
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"][0]["available_slots"], 9)
+
+    def test_class_change_invalidates_cache(self):
+        """Test saving a class invalidates the cached class list."""
+        url = reverse("api:class-list")
+        self.client.get(url)
+
+        self.fitness_class.name = "Evening Yoga"
+        self.fitness_class.save()
+        response = self.client.get(url)
+
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"][0]["name"], "Evening Yoga")
+
+    def test_cache_expires_when_first_class_starts(self):
+        """Test a cached page is not kept past the start of its earliest class."""
+        FitnessClass.objects.create(
+            name="Starting soon",
+            class_type=ClassTypeChoices.HIIT,
+            class_time=timezone.now() + timedelta(seconds=30),
+            instructor_name="abc",
+            instructor_email="abc@example.com",
+            max_slots=10,
+            available_slots=10,
+        )
+        view = FitnessClassListView()
+
+        response = self.client.get(reverse("api:class-list"))
+
+        self.assertLessEqual(view.get_cache_timeout(response.data["results"]), 30)
+        self.assertEqual(view.get_cache_timeout([]), settings.CLASS_LIST_CACHE_TIMEOUT)
+
+
+class ConditionalListTests(APITestCase):
+    """
+    Test to check conditional GET support of list APIs.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.fitness_class = FitnessClass.objects.create(
+            name="Morning Yoga",
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() + timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=10,
+            available_slots=10,
+        )
+        FitnessClassBooking.objects.create(
+            fitness_class=cls.fitness_class,
+            client_name="Client",
+            client_email="client@example.com",
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_list_is_not_modified(self):
+        """Test If-None-Match gets a 304 from the aggregate queries alone."""
+        # The bookings of a client also aggregate its waitlist.
+        urls = [
+            (reverse("api:class-list"), 1),
+            (reverse("api:booking-list") + "?email=client@example.com", 2),
+        ]
+
+        for url, queries in urls:
+            with self.subTest(url):
+                response = self.client.get(url)
+                cache.clear()
+
+                with self.assertNumQueries(queries):
+                    not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+                self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual(not_modified.content, b"")
+                self.assertEqual(not_modified["ETag"], response["ETag"])
+                self.assertNotIn("Last-Modified", response)
+
+    def test_shrunk_list_is_modified(self):
+        """Test a list that lost a row is not answered with a 304."""
+        other_class = FitnessClass.objects.create(
+            name="Evening Yoga",
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() + timedelta(days=2),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=10,
+            available_slots=10,
+        )
+        FitnessClassBooking.objects.create(
+            fitness_class=other_class, client_name="Client", client_email="client@example.com"
+        )
+        urls = [
+            reverse("api:class-list"),
+            reverse("api:booking-list") + "?email=client@example.com",
+        ]
+        etags = [self.client.get(url)["ETag"] for url in urls]
+
+        # The oldest booking and class leave the lists, the latest updated_at stays the same.
+        FitnessClassBooking.objects.filter(fitness_class=self.fitness_class).delete()
+        FitnessClass.objects.filter(pk=self.fitness_class.pk).delete()
+        cache.clear()
+
+        for url, etag in zip(urls, etags):
+            with self.subTest(url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time()))
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(len(response.data["results"]), 1)
+                self.assertEqual(since.status_code, status.HTTP_200_OK)
+
+    def test_cached_class_list_is_not_modified_without_queries(self):
+        """Test a cached class list answers If-None-Match without touching the database."""
+        url = reverse("api:class-list")
+        response = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_changes_give_new_etag(self):
+        """Test a booking, a time zone or a different page change the ETag."""
+        classes_url = reverse("api:class-list")
+        bookings_url = reverse("api:booking-list") + "?email=client@example.com"
+        classes_etag = self.client.get(classes_url)["ETag"]
+        bookings_etag = self.client.get(bookings_url)["ETag"]
+
+        self.assertNotEqual(
+            self.client.get(classes_url, HTTP_X_TIMEZONE="UTC")["ETag"], classes_etag
+        )
+        self.assertNotEqual(
+            self.client.get(classes_url, {"page_size": 1})["ETag"], classes_etag
+        )
+
+        FitnessClassBooking.objects.create(
+            fitness_class=self.fitness_class,
+            client_name="Client",
+            client_email="other@example.com",
+        )
+        cache.clear()
+        response = self.client.get(classes_url, HTTP_IF_NONE_MATCH=classes_etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], classes_etag)
+        # The client's own booking shows the class's new seat count.
+        self.assertNotEqual(self.client.get(bookings_url)["ETag"], bookings_etag)
+
+
+class ClassAvailabilityViewTests(APITestCase):
+    """
+    Test to check working of the class availability API.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.future_class = FitnessClass.objects.create(
+            name="Morning Yoga",
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() + timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=10,
+            available_slots=10,
+        )
+        cls.past_class = FitnessClass.objects.create(
+            name="Past HIIT",
+            class_type=ClassTypeChoices.HIIT,
+            class_time=timezone.now() - timedelta(days=1),
+            instructor_name="abc",
+            instructor_email="abc@example.com",
+            max_slots=20,
+            available_slots=5,
+        )
+
+    def setUp(self):
+        availability_snapshot.reset()
+
+    def test_availability_of_upcoming_classes(self):
+        """Test the map holds upcoming classes only and is then served from memory."""
+        url = reverse("api:class-availability")
+        response = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {str(self.future_class.id): 10})
+        self.assertEqual(cached.json(), response.json())
+
+    def test_booking_is_visible_on_next_read(self):
+        """Test a booking in this process refreshes the snapshot on the next read."""
+        url = reverse("api:class-availability")
+        self.client.get(url)
+
+        FitnessClassBooking.objects.create(
+            fitness_class=self.future_class,
+            client_name="Client",
+            client_email="client@example.com",
+        )
+        response = self.client.get(url)
+
+        self.assertEqual(response.json(), {str(self.future_class.id): 9})
+
+    @override_settings(CLASS_AVAILABILITY_MAX_STALENESS=0)
+    def test_other_process_writes_are_picked_up(self):
+        """Test writes this process was not told about show up once the snapshot is stale."""
+        url = reverse("api:class-availability")
+        self.client.get(url)
+        new_class = FitnessClass.objects.create(
+            name="Evening Zumba",
+            class_type=ClassTypeChoices.ZUMBA,
+            class_time=timezone.now() + timedelta(days=2),
+            instructor_name="xyz",
+            instructor_email="xyz@example.com",
+            max_slots=5,
+            available_slots=5,
+        )
+        FitnessClass.objects.filter(pk=self.future_class.pk).update(
+            available_slots=3, updated_at=timezone.now()
+        )
+
+        response = self.client.get(url)
+
+        self.assertEqual(
+            response.json(), {str(self.future_class.id): 3, str(new_class.id): 5}
+        )
+
+    @override_settings(CLASS_AVAILABILITY_MAX_STALENESS=0)
+    def test_refresh_and_discard_keep_map_being_read(self):
+        """Test refreshes and discards swap in a new map instead of changing the one read."""
+        availability_snapshot.get()
+        classes = availability_snapshot._classes
+        FitnessClass.objects.filter(pk=self.future_class.pk).update(
+            available_slots=3, updated_at=timezone.now()
+        )
+
+        self.assertEqual(availability_snapshot.get(), {self.future_class.id: 3})
+        availability_snapshot.discard(self.future_class.id)
+
+        self.assertEqual(list(classes), [self.future_class.id])
+        self.assertEqual(classes[self.future_class.id][0], 10)
+
+
+class AsyncListViewTests(APITestCase):
+    """
+    Test to check that async list APIs serve the same responses as the sync ones.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            fitness_class = FitnessClass.objects.create(
+                name=f"Yoga {i}",
+                class_type=ClassTypeChoices.YOGA,
+                class_time=timezone.now() + timedelta(days=i + 1),
+                instructor_name="Jane Doe",
+                instructor_email="jane@example.com",
+                max_slots=10,
+                available_slots=10,
+            )
+            FitnessClassBooking.objects.create(
+                fitness_class=fitness_class,
+                client_name="Client",
+                client_email="client@example.com",
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_async_responses_match_sync_responses(self):
+        """Test each async list API returns the same body and validators as its sync twin."""
+        test_cases = [
+            ("api:class-list", "api:async-class-list", {"page_size": 2}),
+            ("api:booking-list", "api:async-booking-list", {"email": "client@example.com"}),
+        ]
+
+        for sync_name, async_name, params in test_cases:
+            with self.subTest(async_name):
+                expected = await self.async_client.get(
+                    reverse(sync_name), params, headers={"X-Timezone": "UTC"}
+                )
+                response = await self.async_client.get(
+                    reverse(async_name), params, headers={"X-Timezone": "UTC"}
+                )
+
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response["ETag"], expected["ETag"])
+                self.assertEqual(
+                    response.content.replace(b"/async/", b"/"), expected.content
+                )
+
+    async def test_async_conditional_and_error_responses(self):
+        """Test async list APIs answer conditional GETs and reject bad input."""
+        url = reverse("api:async-class-list")
+        response = await self.async_client.get(url)
+
+        not_modified = await self.async_client.get(
+            url, headers={"If-None-Match": response["ETag"]}
+        )
+        bad_cursor = await self.async_client.get(url, {"cursor": "garbage"})
+        bad_timezone = await self.async_client.get(url, headers={"X-Timezone": "Mars/Olympus"})
+
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(bad_cursor.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(bad_timezone.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BookingExportTests(APITestCase):
+    """
+    Test to check working of the bookings export API and command.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.classes = [
+            FitnessClass.objects.create(
+                name=f"Yoga {i}",
+                class_type=ClassTypeChoices.YOGA,
+                class_time=timezone.now() + timedelta(days=i + 1),
+                instructor_name="Jane Doe",
+                instructor_email="jane@example.com",
+                max_slots=10,
+                available_slots=10,
+            )
+            for i in range(2)
+        ]
+        cls.bookings = [
+            FitnessClassBooking.objects.create(
+                fitness_class=fitness_class,
+                client_name="Client, Jr.",
+                client_email=email,
+            )
+            for fitness_class in cls.classes
+            for email in ("client@example.com", "other@example.com")
+        ]
+
+    def export(self, params):
+        response = self.client.get(reverse("api:booking-export"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_ndjson_export(self):
+        """Test NDJSON export writes one booking list item per line, filtered."""
+        response, content = self.export(
+            {"email": "client@example.com", "fitness_class": self.classes[1].id}
+        )
+        list_response = self.client.get(
+            reverse("api:booking-list"), {"email": "client@example.com"}
+        )
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(
+            [json.loads(line) for line in content.splitlines()],
+            [list_response.json()["results"][0]],
+        )
+
+    def test_csv_export(self):
+        """Test CSV export writes a header and one quoted row per booking, in booking order."""
+        response, content = self.export({"format": "csv", "end": timezone.now().isoformat()})
+
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        self.assertEqual([int(row["id"]) for row in rows], [b.id for b in self.bookings])
+        self.assertEqual(rows[0]["client_name"], "Client, Jr.")
+        self.assertEqual(rows[0]["class_name"], "Yoga 0")
+
+    def test_invalid_filters(self):
+        """Test bad filters are rejected before anything is streamed."""
+        for params in ({"email": "nope"}, {"start": "2025-01-02T00:00", "end": "2025-01-01T00:00"}):
+            with self.subTest(params):
+                response = self.client.get(reverse("api:booking-export"), params)
+
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_command_matches_api(self):
+        """Test the export command writes the same lines as the export API."""
+        for export_format in ("ndjson", "csv"):
+            with self.subTest(export_format):
+                stdout = io.StringIO()
+                call_command("export_bookings", format=export_format, stdout=stdout)
+
+                self.assertEqual(stdout.getvalue(), self.export({"format": export_format})[1])
+
+    def test_memory_stays_flat(self):
+        """Test peak memory of an export does not grow with the number of bookings."""
+        def peak_memory(count):
+            FitnessClassBooking.objects.bulk_create(
+                FitnessClassBooking(
+                    fitness_class=self.classes[0],
+                    client_name="Client",
+                    client_email=f"client{count}.{i}@example.com",
+                )
+                for i in range(count)
+            )
+            response = self.client.get(reverse("api:booking-export"), {"format": "csv"})
+            tracemalloc.start()
+            for _ in response.streaming_content:
+                pass
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            return peak
+
+        # Both exports span several chunks of rows, the larger one four times as many.
+        small, large = peak_memory(3000), peak_memory(12000)
+
+        self.assertLess(large, small * 1.5)
+
+
+class ImportScheduleCommandTests(APITestCase):
+    """
+    Test to check working of the schedule import command.
+    """
+    csv_schedules = (
+        "name,class_type,weekday,time,instructor_name,instructor_email,capacity,end_date\n"
+        "Morning Yoga,yoga,monday,07:00,Jane Doe,jane@example.com,12,\n"
+        "Evening HIIT,hiit,Wed,18:30,abc,abc@example.com,20,2030-01-09\n"
+    )
+
+    def write_schedules(self, content, suffix=".csv"):
+        file = tempfile.NamedTemporaryFile("w", suffix=suffix, delete=False)
+        file.write(content)
+        file.close()
+        self.addCleanup(os.remove, file.name)
+
+        return file.name
+
+    def import_schedule(self, path, **options):
+        stdout = io.StringIO()
+        call_command(
+            "import_schedule", path, start="2030-01-01", end="2030-01-21", stdout=stdout, **options
+        )
+
+        return stdout.getvalue()
+
+    def test_import_expands_schedules(self):
+        """Test every weekly occurrence in range is created with all its seats available."""
+        output = self.import_schedule(self.write_schedules(self.csv_schedules), timezone="UTC")
+
+        yoga = FitnessClass.objects.filter(class_type=ClassTypeChoices.YOGA).order_by("class_time")
+        self.assertIn("Created 5 classes", output)
+        self.assertEqual(
+            [fitness_class.class_time.isoformat() for fitness_class in yoga],
+            ["2030-01-07T07:00:00+00:00", "2030-01-14T07:00:00+00:00", "2030-01-21T07:00:00+00:00"],
+        )
+        # The HIIT schedule ends on 2030-01-09.
+        self.assertEqual(FitnessClass.objects.filter(class_type=ClassTypeChoices.HIIT).count(), 2)
+        self.assertEqual(
+            set(FitnessClass.objects.values_list("max_slots", "available_slots")),
+            {(12, 12), (20, 20)},
+        )
+
+    def test_import_is_idempotent(self):
+        """Test re-running an import, also from JSON, creates no duplicate classes."""
+        path = self.write_schedules(self.csv_schedules)
+        json_path = self.write_schedules(
+            json.dumps([{
+                "class_type": "zumba",
+                "weekday": "friday",
+                "time": "09:00",
+                "instructor_name": "Jane Doe",
+                "instructor_email": "jane@example.com",
+                "capacity": 8,
+            }]),
+            suffix=".json",
+        )
+
+        self.import_schedule(path)
+        output = self.import_schedule(path)
+        self.import_schedule(json_path)
+
+        self.assertIn("Created 0 classes", output)
+        self.assertIn("skipped 5 existing", output)
+        self.assertEqual(FitnessClass.objects.count(), 8)
+
+    def test_invalid_schedules_import_nothing(self):
+        """Test a file with an invalid row is rejected as a whole."""
+        path = self.write_schedules(self.csv_schedules + "Bad,pilates,someday,7pm,x,x,0,\n")
+
+        with self.assertRaisesMessage(CommandError, "row 3"):
+            self.import_schedule(path)
+
+        self.assertEqual(FitnessClass.objects.count(), 0)
+
+    def test_save_initialises_available_slots(self):
+        """Test a class created without available slots starts with all seats available."""
+        fitness_class = FitnessClass.objects.create(
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() + timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=15,
+        )
+
+        self.assertEqual(fitness_class.available_slots, 15)
+
+
+class BookingCancelViewTests(APITestCase):
+    """
+    Test to check working of the booking cancellation API.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.fitness_class = FitnessClass.objects.create(
+            name="Morning Yoga",
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() + timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=10,
+            available_slots=10,
+        )
+        cls.booking = FitnessClassBooking.objects.create(
+            fitness_class=cls.fitness_class,
+            client_name="Client",
+            client_email="client@example.com",
+        )
+
+    def cancel(self, email):
+        return self.client.delete(
+            reverse("api:booking-cancel", args=[self.booking.id]) + f"?email={email}"
+        )
+
+    def test_cancel_releases_seat(self):
+        """Test cancelling deletes the booking and gives its seat back."""
+        response = self.cancel("client@example.com")
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(FitnessClassBooking.objects.filter(pk=self.booking.pk).exists())
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 10)
+
+    def test_invalid_cancellations(self):
+        """Test bookings of other clients, or of started classes, cannot be cancelled."""
+        FitnessClass.objects.filter(pk=self.fitness_class.pk).update(
+            class_time=timezone.now() - timedelta(minutes=1)
+        )
+        test_cases = [
+            ("other_client", "other@example.com", status.HTTP_404_NOT_FOUND),
+            ("no_email", "", status.HTTP_404_NOT_FOUND),
+            ("class_started", "client@example.com", status.HTTP_400_BAD_REQUEST),
+        ]
+
+        for name, email, expected_status in test_cases:
+            with self.subTest(name):
+                response = self.cancel(email)
+
+                self.assertEqual(response.status_code, expected_status)
+                self.assertTrue(FitnessClassBooking.objects.filter(pk=self.booking.pk).exists())
+                self.fitness_class.refresh_from_db()
+                self.assertEqual(self.fitness_class.available_slots, 9)
+
+
+class ReconcileSlotsCommandTests(APITestCase):
+    """
+    Test to check working of the slot reconciliation command.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.classes = [
+            FitnessClass.objects.create(
+                name=f"Yoga {i}",
+                class_type=ClassTypeChoices.YOGA,
+                class_time=timezone.now() + timedelta(days=1),
+                instructor_name="Jane Doe",
+                instructor_email="jane@example.com",
+                max_slots=3,
+                available_slots=3,
+            )
+            for i in range(3)
+        ]
+        for fitness_class in cls.classes:
+            FitnessClassBooking.objects.create(
+                fitness_class=fitness_class,
+                client_name="Client",
+                client_email="client@example.com",
+            )
+        FitnessClass.objects.filter(pk=cls.classes[0].pk).update(available_slots=0)
+        FitnessClass.objects.filter(pk=cls.classes[1].pk).update(available_slots=3)
+
+    def available_slots(self):
+        return list(
+            FitnessClass.objects.order_by("id").values_list("available_slots", flat=True)
+        )
+
+    def test_reconcile_fixes_drift(self):
+        """Test drifted counters are fixed with one aggregate and guarded updates."""
+        stdout = io.StringIO()
+
+        with self.assertNumQueries(7):
+            call_command("reconcile_slots", stdout=stdout)
+
+        self.assertIn("Fixed 2 drifted classes", stdout.getvalue())
+        self.assertEqual(self.available_slots(), [2, 2, 2])
+
+    def test_reconcile_frees_seats_without_booking(self):
+        """Test seats claimed without a booking are freed and the seats counted instead."""
+        seat_class = FitnessClass.objects.create(
+            name="Flash HIIT",
+            class_type=ClassTypeChoices.HIIT,
+            class_time=timezone.now() + timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=3,
+            available_slots=3,
+            seat_inventory=True,
+        )
+        FitnessClassBooking(
+            fitness_class=seat_class, client_name="Client", client_email="client@example.com"
+        ).save()
+        seat_class.seats.filter(number=3).update(is_taken=True)
+        FitnessClass.objects.filter(pk=seat_class.pk).update(available_slots=1)
+        stdout = io.StringIO()
+
+        call_command("reconcile_slots", stdout=stdout)
+
+        self.assertIn(f"Class {seat_class.id}: 1 available slots, expected 2", stdout.getvalue())
+        self.assertEqual(
+            list(seat_class.seats.filter(is_taken=False).values_list("number", flat=True)), [2, 3]
+        )
+        self.assertEqual(self.available_slots(), [2, 2, 2, 2])
+
+    def test_reconcile_keeps_bookings_made_meanwhile(self):
+        """Test a booking committed after the report is counted by the fix."""
+        reconcile = FitnessClass.objects.reconcile_available_slots
+
+        def book_then_reconcile():
+            FitnessClassBooking.objects.create(
+                fitness_class=self.classes[2], client_name="Client", client_email="late@example.com"
+            )
+            return reconcile()
+
+        with mock.patch.object(
+            FitnessClass.objects, "reconcile_available_slots", book_then_reconcile
+        ):
+            call_command("reconcile_slots", stdout=io.StringIO())
+
+        self.assertEqual(self.available_slots(), [2, 2, 1])
+
+    def test_dry_run_reports_only(self):
+        """Test a dry run reports drifted classes without fixing them."""
+        stdout = io.StringIO()
+
+        call_command("reconcile_slots", dry_run=True, stdout=stdout)
+
+        self.assertIn(f"Class {self.classes[0].id}: 0 available slots, expected 2", stdout.getvalue())
+        self.assertEqual(self.available_slots(), [0, 3, 2])
+
+
+class ArchivePastClassesCommandTests(APITestCase):
+    """
+    Test to check working of the archival of past classes and listing of archived bookings.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.old_classes = [cls.create_class(days) for days in (-300, -200, -100)]
+        cls.recent_class = cls.create_class(-10)
+        cls.future_class = cls.create_class(10)
+        cls.bookings = []
+        for fitness_class in [*cls.old_classes, cls.recent_class, cls.future_class]:
+            booking = FitnessClassBooking(
+                fitness_class=fitness_class,
+                client_name="Client",
+                client_email="client@example.com",
+            )
+            booking.save(claim_slot=False)
+            cls.bookings.append(booking)
+        WaitlistEntry.objects.create(
+            fitness_class=cls.old_classes[0], client_name="Waiting", client_email="w@example.com"
+        )
+
+    @classmethod
+    def create_class(cls, days):
+        return FitnessClass.objects.create(
+            name=f"Yoga {days}",
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() + timedelta(days=days),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=5,
+            available_slots=4,
+        )
+
+    def archive(self, **options):
+        stdout = io.StringIO()
+        call_command("archive_past_classes", sleep=0, stdout=stdout, **options)
+
+        return stdout.getvalue()
+
+    def list_booking_ids(self, url="api:booking-list", **params):
+        response = self.client.get(reverse(url), {"email": "client@example.com", **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [row["id"] for row in response.json()["results"]]
+
+    def test_archives_classes_past_retention_with_bookings(self):
+        """Test classes older than --days move with their bookings, keeping ids and times."""
+        output = self.archive(days=30)
+
+        self.assertIn("Archived 3 classes and 3 bookings", output)
+        self.assertEqual(
+            set(FitnessClass.objects.values_list("id", flat=True)),
+            {self.recent_class.id, self.future_class.id},
+        )
+        self.assertEqual(FitnessClassBooking.objects.count(), 2)
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+        archived = ArchivedFitnessClass.objects.get(pk=self.old_classes[0].id)
+        self.assertEqual(archived.class_time, self.old_classes[0].class_time)
+        self.assertEqual(archived.created_at, self.old_classes[0].created_at)
+        self.assertEqual(archived.available_slots, 4)
+        booking = ArchivedFitnessClassBooking.objects.get(pk=self.bookings[0].id)
+        self.assertEqual(booking.fitness_class_id, archived.id)
+        self.assertEqual(booking.created_at, self.bookings[0].created_at)
+
+    def test_archive_batch_runs_constant_queries(self):
+        """Test a batch runs the same queries however many bookings it moves."""
+        counts = []
+        for clients in (1, 20):
+            fitness_class = self.create_class(-400)
+            for i in range(clients):
+                FitnessClassBooking(
+                    fitness_class=fitness_class,
+                    client_name="Client",
+                    client_email=f"client{i}@example.com",
+                ).save(claim_slot=False)
+
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(
+                    archive_classes(timezone.now() - timedelta(days=350), batch_size=1),
+                    (1, clients),
+                )
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(
+            list(ClientBookingSummary.objects.values_list("client_email", "booking_count")),
+            [("client@example.com", 5)],
+        )
+
+    def test_archive_resumes_in_batches(self):
+        """Test a run stopped after some batches is carried on by the next run."""
+        output = self.archive(days=30, batch_size=1, max_batches=2)
+
+        self.assertIn("Batch 2: archived 1 classes", output)
+        self.assertEqual(ArchivedFitnessClass.objects.count(), 2)
+        self.assertTrue(FitnessClass.objects.filter(pk=self.old_classes[2].id).exists())
+
+        self.assertIn("Archived 1 classes", self.archive(days=30, batch_size=1))
+        self.assertEqual(ArchivedFitnessClass.objects.count(), 3)
+        self.assertEqual(FitnessClass.objects.count(), 2)
+
+    def test_booking_list_includes_archived_on_request(self):
+        """Test archived bookings are only listed with include_archived, in booking order."""
+        self.archive(days=30)
+        all_ids = [booking.id for booking in reversed(self.bookings)]
+
+        self.assertEqual(self.list_booking_ids(), all_ids[:2])
+        self.assertEqual(self.list_booking_ids(include_archived="1"), all_ids)
+        self.assertEqual(
+            self.list_booking_ids("api:async-booking-list", include_archived="1"), all_ids
+        )
+
+        ids, url = [], reverse("api:booking-list") + "?include_archived=1&page_size=2"
+        while url:
+            response = self.client.get(url)
+            ids.extend(row["id"] for row in response.json()["results"])
+            url = response.json()["next"]
+        self.assertEqual(ids, all_ids)
+
+
+class ClientBookingSummaryTests(APITestCase):
+    """
+    Test to check that client booking summaries follow bookings and are served by the summary API.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.past_class, cls.later_class, cls.sooner_class = [
+            FitnessClass.objects.create(
+                name=f"Yoga {days}",
+                class_type=ClassTypeChoices.YOGA,
+                class_time=timezone.now() + timedelta(days=days),
+                instructor_name="Jane Doe",
+                instructor_email="jane@example.com",
+                max_slots=5,
+                available_slots=5,
+            )
+            for days in (-1, 2, 1)
+        ]
+        FitnessClassBooking(
+            fitness_class=cls.past_class, client_name="Client", client_email="client@example.com"
+        ).save(claim_slot=False)
+
+    def setUp(self):
+        token_buckets.reset()
+
+    def book(self, fitness_class, email="client@example.com"):
+        response = self.client.post(
+            reverse("api:book-class"),
+            {"fitness_class": fitness_class.id, "client_name": "Client", "client_email": email},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        return response.data["id"]
+
+    def get_summary(self, email="client@example.com"):
+        response = self.client.get(reverse("api:booking-summary"), {"email": email})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return response.data
+
+    def summaries(self):
+        return list(
+            ClientBookingSummary.objects.order_by("client_email").values(
+                "client_email", "booking_count", "upcoming_count", "next_class", "next_class_time"
+            )
+        )
+
+    def test_summary_follows_bookings(self):
+        """Test bookings and cancellations update the counts and the next class."""
+        self.book(self.later_class)
+        booking_id = self.book(self.sooner_class)
+
+        with self.assertNumQueries(1):
+            summary = self.get_summary()
+        self.assertEqual(summary["booking_count"], 3)
+        self.assertEqual(summary["upcoming_count"], 2)
+        self.assertEqual(summary["next_class"]["id"], self.sooner_class.id)
+        self.assertEqual(summary["next_class"]["name"], "Yoga 1")
+
+        response = self.client.delete(
+            reverse("api:booking-cancel", args=[booking_id]) + "?email=client@example.com"
+        )
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        summary = self.get_summary()
+        self.assertEqual(summary["booking_count"], 2)
+        self.assertEqual(summary["upcoming_count"], 1)
+        self.assertEqual(summary["next_class"]["id"], self.later_class.id)
+
+    def test_batch_booking_updates_summaries(self):
+        response = self.client.post(
+            reverse("api:book-class-batch"),
+            {
+                "bookings": [
+                    {
+                        "fitness_class": fitness_class.id,
+                        "client_name": "Member",
+                        "client_email": "member@example.com",
+                    }
+                    for fitness_class in (self.later_class, self.sooner_class)
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        summary = self.get_summary("member@example.com")
+        self.assertEqual(summary["upcoming_count"], 2)
+        self.assertEqual(summary["next_class"]["id"], self.sooner_class.id)
+
+    def test_summary_rebuilt_once_next_class_started(self):
+        """Test a summary whose next class started is rebuilt when read."""
+        self.book(self.sooner_class)
+        self.book(self.later_class)
+        FitnessClass.objects.filter(pk=self.sooner_class.pk).update(
+            class_time=timezone.now() - timedelta(minutes=1)
+        )
+        ClientBookingSummary.objects.update(
+            next_class_time=timezone.now() - timedelta(minutes=1)
+        )
+
+        summary = self.get_summary()
+
+        self.assertEqual(summary["upcoming_count"], 1)
+        self.assertEqual(summary["next_class"]["id"], self.later_class.id)
+
+    def test_deleting_next_class_rebuilds_summary(self):
+        """Test deleting the next class of a client outside a cancellation moves it to the next."""
+        self.book(self.sooner_class)
+        self.book(self.later_class)
+
+        FitnessClass.objects.get(pk=self.sooner_class.pk).delete()
+
+        summary = self.get_summary()
+        self.assertEqual(summary["booking_count"], 2)
+        self.assertEqual(summary["upcoming_count"], 1)
+        self.assertEqual(summary["next_class"]["id"], self.later_class.id)
+        self.assertEqual(
+            ClientBookingSummary.objects.get().next_class_time, self.later_class.class_time
+        )
+
+    def test_rebuild_command_matches_incremental_summaries(self):
+        """Test the rebuild recomputes the incrementally kept summaries and drops stale ones."""
+        self.book(self.later_class)
+        self.book(self.sooner_class, email="other@example.com")
+        expected = self.summaries()
+        ClientBookingSummary.objects.update(booking_count=0, upcoming_count=0, next_class=None)
+        ClientBookingSummary.objects.create(client_email="gone@example.com", client_name="Gone")
+        stdout = io.StringIO()
+
+        with self.assertNumQueries(3):
+            call_command("rebuild_booking_summaries", stdout=stdout)
+
+        self.assertIn("Rebuilt 2 client booking summaries", stdout.getvalue())
+        self.assertEqual(self.summaries(), expected)
+
+    def test_summary_of_unknown_client_is_empty(self):
+        summary = self.get_summary("nobody@example.com")
+
+        self.assertEqual(summary["booking_count"], 0)
+        self.assertIsNone(summary["next_class"])
+        response = self.client.get(reverse("api:booking-summary"))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SeatInventoryTests(APITestCase):
+    """
+    Test to check working of bookings of classes with seat inventory.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.fitness_class = FitnessClass.objects.create(
+            name="Flash HIIT",
+            class_type=ClassTypeChoices.HIIT,
+            class_time=timezone.now() + timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=3,
+            available_slots=3,
+            seat_inventory=True,
+        )
+
+    def setUp(self):
+        token_buckets.reset()
+
+    def book(self, email, fitness_class=None, **data):
+        return self.client.post(
+            reverse("api:book-class"),
+            {
+                "fitness_class": (fitness_class or self.fitness_class).id,
+                "client_name": "Client",
+                "client_email": email,
+                **data,
+            },
+            format="json",
+        )
+
+    def free_seats(self):
+        return list(
+            self.fitness_class.seats.filter(is_taken=False).values_list("number", flat=True)
+        )
+
+    def test_bookings_claim_seats_without_updating_class(self):
+        """Test bookings claim free seats in order, and the class row only after commit."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.book("first@example.com")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["seat_number"], 1)
+        self.assertEqual(response.data["fitness_class_details"]["available_slots"], 2)
+        self.assertFalse(
+            [query for query in queries if query["sql"].startswith('UPDATE "api_fitnessclass"')]
+        )
+
+        for callback in callbacks:
+            callback()
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 2)
+        self.assertEqual(self.free_seats(), [2, 3])
+
+    def test_client_picks_seat(self):
+        response = self.book("first@example.com", seat_number=3)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["seat_number"], 3)
+
+        response = self.book("second@example.com", seat_number=3)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Seat 3 is already taken", str(response.data))
+
+        response = self.book("second@example.com", seat_number=9)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("no seat 9", str(response.data))
+        self.assertEqual(self.free_seats(), [1, 2])
+
+    def test_cancelled_seat_goes_to_waitlist(self):
+        """Test a full class waitlists, and the head of the waitlist takes the cancelled seat."""
+        bookings = [self.book(f"client{i}@example.com").data for i in range(3)]
+        response = self.book("waiting@example.com")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        response = self.client.delete(
+            reverse("api:booking-cancel", args=[bookings[1]["id"]]) + "?email=client1@example.com"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        promoted = FitnessClassBooking.objects.get(client_email="waiting@example.com")
+        self.assertEqual(promoted.seat_number, 2)
+        self.assertEqual(self.free_seats(), [])
+
+        FitnessClassBooking.objects.get(client_email="client0@example.com").cancel()
+        self.assertEqual(self.free_seats(), [1])
+
+    def test_batch_booking_claims_seats(self):
+        response = self.client.post(
+            reverse("api:book-class-batch"),
+            {
+                "mode": "partial",
+                "bookings": [
+                    {
+                        "fitness_class": self.fitness_class.id,
+                        "client_name": "Member",
+                        "client_email": f"member{i}@example.com",
+                    }
+                    for i in range(4)
+                ],
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["booked"], 3)
+        self.assertEqual(
+            [result["booking"]["seat_number"] for result in response.data["results"][:3]],
+            [1, 2, 3],
+        )
+        self.assertEqual(self.free_seats(), [])
+
+    def test_enabling_seat_inventory_seats_existing_bookings(self):
+        fitness_class = FitnessClass.objects.create(
+            name="Yoga",
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() + timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=4,
+        )
+        for i in range(2):
+            self.book(f"client{i}@example.com", fitness_class)
+
+        fitness_class.seat_inventory = True
+        fitness_class.save()
+
+        self.assertEqual(
+            list(fitness_class.bookings.order_by("id").values_list("seat_number", flat=True)),
+            [1, 2],
+        )
+        self.assertEqual(
+            list(fitness_class.seats.order_by("number").values_list("is_taken", flat=True)),
+            [True, True, False, False],
+        )
+
+    def test_seat_number_needs_seat_inventory(self):
+        fitness_class = FitnessClass.objects.create(
+            name="Yoga",
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() + timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=4,
+        )
+
+        response = self.book("client@example.com", fitness_class, seat_number=1)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WaitlistTests(APITestCase):
+    """
+    Test to check working of the waitlist of full classes.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.fitness_class = FitnessClass.objects.create(
+            name="Full Yoga Class",
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() + timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=1,
+            available_slots=1,
+        )
+        cls.booking = FitnessClassBooking.objects.create(
+            fitness_class=cls.fitness_class,
+            client_name="Booked Client",
+            client_email="booked@example.com",
+        )
+
+    def setUp(self):
+        token_buckets.reset()
+        cache.clear()
+
+    def book(self, email):
+        return self.client.post(
+            reverse("api:book-class"),
+            {"fitness_class": self.fitness_class.id, "client_name": "Client", "client_email": email},
+            format="json",
+        )
+
+    def test_full_class_enqueues_in_order(self):
+        """Test booking a full class waitlists the client, first come first served."""
+        for position, email in enumerate(["first@example.com", "second@example.com"], start=1):
+            response = self.book(email)
+
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(response.data["position"], position)
+            self.assertEqual(response.data["client_email"], email)
+
+        self.assertEqual(FitnessClassBooking.objects.count(), 1)
+
+    def test_invalid_waitlist_scenarios(self):
+        """Test booked, waitlisted and late clients cannot join the waitlist."""
+        self.book("first@example.com")
+        test_cases = [
+            ("already_booked", "booked@example.com", "You have already booked this class"),
+            ("already_waitlisted", "first@example.com", "already on the waitlist"),
+        ]
+
+        for name, email, expected_error in test_cases:
+            with self.subTest(name):
+                response = self.book(email)
+
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(expected_error, str(response.data))
+                self.assertEqual(WaitlistEntry.objects.count(), 1)
+
+        with self.subTest("full_and_started"):
+            FitnessClass.objects.filter(pk=self.fitness_class.pk).update(
+                class_time=timezone.now() - timedelta(minutes=5)
+            )
+            response = self.book("late@example.com")
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("Class already started", str(response.data))
+            self.assertEqual(WaitlistEntry.objects.count(), 1)
+
+            self.fitness_class.refresh_from_db()
+            serializer = WaitlistEntrySerializer(
+                data={
+                    "fitness_class": self.fitness_class.id,
+                    "client_name": "Client",
+                    "client_email": "late@example.com",
+                },
+                context={"timezone": "UTC"},
+            )
+            serializer.is_valid(raise_exception=True)
+            with self.assertRaises(ClassStartedError):
+                serializer.save()
+
+    def test_cancel_promotes_head_of_waitlist(self):
+        """Test a cancelled seat goes to the head of the waitlist, and the rest move up."""
+        self.book("first@example.com")
+        self.book("second@example.com")
+
+        response = self.client.delete(
+            reverse("api:booking-cancel", args=[self.booking.id]) + "?email=booked@example.com"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(
+            FitnessClassBooking.objects.filter(client_email="first@example.com").exists()
+        )
+        self.assertEqual(
+            list(WaitlistEntry.objects.with_position().values_list("client_email", "position")),
+            [("second@example.com", 1)],
+        )
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.available_slots, 0)
+
+    def test_waitlist_picks_up_free_seat(self):
+        """Test a client is booked right away if a seat was freed while it was being waitlisted."""
+        FitnessClass.objects.filter(pk=self.fitness_class.pk).update(available_slots=1)
+        book_slot = FitnessClass.book_slot
+        calls = []
+
+        def book_slot_full_once(fitness_class, seats=1, seat_number=None):
+            calls.append(seats)
+            if len(calls) == 1:
+                raise ClassFullError("No available slots")
+            return book_slot(fitness_class, seats, seat_number)
+
+        with mock.patch.object(FitnessClass, "book_slot", book_slot_full_once):
+            response = self.client.post(
+                reverse("api:book-class"),
+                {
+                    "fitness_class": self.fitness_class.id,
+                    "client_name": "Client",
+                    "client_email": "first@example.com",
+                },
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["client_email"], "first@example.com")
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_booking_list_shows_waitlist(self):
+        """Test the bookings of a client list its waitlist entries with their positions."""
+        self.book("first@example.com")
+        self.book("second@example.com")
+        url = reverse("api:booking-list") + "?email=second@example.com"
+
+        for view in ("api:booking-list", "api:async-booking-list"):
+            with self.subTest(view):
+                response = self.client.get(reverse(view) + "?email=second@example.com")
+
+                waitlist = response.json()["waitlist"]
+                self.assertEqual(len(waitlist), 1)
+                self.assertEqual(waitlist[0]["position"], 2)
+                self.assertEqual(waitlist[0]["fitness_class"], self.fitness_class.id)
+
+        etag = self.client.get(url)["ETag"]
+        self.client.delete(
+            reverse("api:booking-cancel", args=[self.booking.id]) + "?email=booked@example.com"
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["waitlist"][0]["position"], 1)
+        self.assertNotIn("waitlist", self.client.get(reverse("api:booking-list")).data)
+
+
+class MetricsTests(APITestCase):
+    """
+    Test to check working of the request metrics and the Prometheus metrics endpoint.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.fitness_class = FitnessClass.objects.create(
+            name="Morning Yoga",
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() + timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=1,
+            available_slots=1,
+        )
+        cls.past_class = FitnessClass.objects.create(
+            name="Past Yoga",
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() - timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=1,
+            available_slots=1,
+        )
+
+    def setUp(self):
+        token_buckets.reset()
+        cache.clear()
+        metrics.reset()
+
+    def book(self, fitness_class, email):
+        return self.client.post(
+            reverse("api:book-class"),
+            {"fitness_class": fitness_class.id, "client_name": "Client", "client_email": email},
+            format="json",
+        )
+
+    def scrape(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+
+        return response.content.decode().splitlines()
+
+    async def test_async_requests_are_recorded_without_thread(self):
+        """Test async views are measured by the middleware without running it in a thread."""
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(MetricsMiddleware(get_response)))
+
+        response = await self.async_client.get(reverse("api:async-class-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = metrics.render().splitlines()
+        self.assertIn(
+            'http_requests_total{route="api:async-class-list",method="GET",status="200"} 1',
+            lines,
+        )
+        # ETag aggregate and page.
+        self.assertIn(
+            'http_request_db_queries_sum{route="api:async-class-list",method="GET"} 2', lines
+        )
+
+    def test_requests_are_recorded_by_route(self):
+        """Test latency, query count and response size are recorded per route."""
+        self.client.get(reverse("api:class-list"))
+        self.client.get(reverse("api:class-list"))
+        self.client.get("/api/unknown/")
+
+        lines = self.scrape()
+
+        self.assertIn(
+            'http_requests_total{route="api:class-list",method="GET",status="200"} 2', lines
+        )
+        self.assertIn('http_requests_total{route="unmatched",method="GET",status="404"} 1', lines)
+        self.assertIn(
+            'http_request_duration_seconds_count{route="api:class-list",method="GET"} 2', lines
+        )
+        # ETag aggregate and page, then a cache hit.
+        self.assertIn('http_request_db_queries_sum{route="api:class-list",method="GET"} 2', lines)
+        self.assertIn(
+            'http_request_db_queries_bucket{route="api:class-list",method="GET",le="0"} 1', lines
+        )
+        self.assertIn(
+            'http_response_size_bytes_count{route="api:class-list",method="GET"} 2', lines
+        )
+        self.assertIn("# TYPE http_request_duration_seconds histogram", lines)
+        self.assertIn('class_list_cache_lookups_total{result="hit"} 1', lines)
+        self.assertIn('class_list_cache_lookups_total{result="miss"} 1', lines)
+
+    def test_booking_outcomes(self):
+        """Test every booking outcome is counted."""
+        self.book(self.fitness_class, "first@example.com")
+        self.book(self.fitness_class, "second@example.com")
+        self.book(self.fitness_class, "first@example.com")
+        self.book(self.past_class, "first@example.com")
+        self.book(self.fitness_class, "invalid-email")
+
+        lines = self.scrape()
+
+        # Throttled and replayed bookings are covered by their own tests.
+        outcomes = set(BookingOutcomeChoices.values) - {
+            BookingOutcomeChoices.THROTTLED,
+            BookingOutcomeChoices.REPLAYED,
+        }
+        for outcome in outcomes:
+            with self.subTest(outcome):
+                self.assertIn(f'booking_outcomes_total{{outcome="{outcome}"}} 1', lines)
+
+
+@override_settings(
+    BOOKING_THROTTLE_RATES={"email": "3/min", "ip": "4/min"},
+    BOOKING_THROTTLE_CLASS_TYPE_RATES={ClassTypeChoices.HIIT: {"email": "1/min"}},
+)
+class BookingThrottleTests(APITestCase):
+    """
+    Test to check working of the booking API throttle.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.classes = {
+            class_type: FitnessClass.objects.create(
+                name=f"{class_type} class",
+                class_type=class_type,
+                class_time=timezone.now() + timedelta(days=1),
+                instructor_name="Jane Doe",
+                instructor_email="jane@example.com",
+                max_slots=10,
+                available_slots=10,
+            )
+            for class_type in (ClassTypeChoices.YOGA, ClassTypeChoices.HIIT)
+        }
+
+    def setUp(self):
+        cache.clear()
+        token_buckets.reset()
+        class_type_cache.reset()
+        metrics.reset()
+
+    def book(self, email, class_type=ClassTypeChoices.YOGA, ip="10.0.0.1"):
+        return self.client.post(
+            reverse("api:book-class"),
+            {
+                "fitness_class": self.classes[class_type].id,
+                "client_name": "Client",
+                "client_email": email,
+            },
+            format="json",
+            REMOTE_ADDR=ip,
+        )
+
+    def test_client_email_is_throttled_without_queries(self):
+        """Test bookings over the email rate get a 429 before any query is run."""
+        self.book("client@example.com")
+        self.book("Client@example.com", ip="10.0.0.2")
+        self.book("client@example.com", ClassTypeChoices.HIIT, ip="10.0.0.3")
+
+        with self.assertNumQueries(0):
+            response = self.book("client@example.com", ip="10.0.0.4")
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+        self.assertIn('booking_outcomes_total{outcome="throttled"} 1', metrics.render())
+
+    def test_ip_is_throttled_across_emails(self):
+        """Test bookings over the IP rate are throttled, whatever their email."""
+        statuses = [self.book(f"client{i}@example.com").status_code for i in range(5)]
+
+        self.assertEqual(statuses[-1], status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertNotIn(status.HTTP_429_TOO_MANY_REQUESTS, statuses[:-1])
+        self.assertEqual(
+            self.book("client@example.com", ip="10.0.0.2").status_code, status.HTTP_201_CREATED
+        )
+
+    def test_ip_ignores_forwarded_for(self):
+        """Test made up X-Forwarded-For headers do not give a client fresh IP buckets."""
+        statuses = [
+            self.client.post(
+                reverse("api:book-class"),
+                {
+                    "fitness_class": self.classes[ClassTypeChoices.YOGA].id,
+                    "client_name": "Client",
+                    "client_email": f"client{i}@example.com",
+                },
+                format="json",
+                REMOTE_ADDR="10.0.0.1",
+                HTTP_X_FORWARDED_FOR=f"192.0.2.{i}",
+            ).status_code
+            for i in range(5)
+        ]
+
+        self.assertEqual(statuses[-1], status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_batch_bookings_count_against_limits(self):
+        """Test every booking of a batch counts against the email and IP rates."""
+        def book_batch(emails, ip="10.0.0.1"):
+            return self.client.post(
+                reverse("api:book-class-batch"),
+                {
+                    "mode": "partial",
+                    "bookings": [
+                        {
+                            "fitness_class": self.classes[ClassTypeChoices.YOGA].id,
+                            "client_name": "Client",
+                            "client_email": email,
+                        }
+                        for email in emails
+                    ],
+                },
+                format="json",
+                REMOTE_ADDR=ip,
+            )
+
+        response = book_batch([f"client{i}@example.com" for i in range(3)])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Two more bookings make five from one IP address.
+        response = book_batch(["client3@example.com", "client4@example.com"])
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # Four bookings of one email, over its rate of three.
+        response = book_batch(["other@example.com"] * 4, ip="10.0.0.2")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(FitnessClassBooking.objects.count(), 3)
+        self.assertIn('booking_outcomes_total{outcome="throttled"} 2', metrics.render())
+
+    def test_class_type_rates(self):
+        """Test classes of a type with its own rates are throttled with them too."""
+        self.book("client@example.com", ClassTypeChoices.HIIT)
+
+        hiit_again = self.book("client@example.com", ClassTypeChoices.HIIT, ip="10.0.0.2")
+        yoga = self.book("client@example.com", ClassTypeChoices.YOGA, ip="10.0.0.2")
+        hiit = self.book("other@example.com", ClassTypeChoices.HIIT, ip="10.0.0.2")
+
+        self.assertEqual(hiit.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(hiit_again.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(yoga.status_code, status.HTTP_201_CREATED)
+
+    def test_limits_hold_across_processes(self):
+        """Test the shared cache keeps throttling a client whose requests reach a fresh process."""
+        self.book("client@example.com")
+        self.book("client@example.com", ip="10.0.0.2")
+        self.book("client@example.com", ip="10.0.0.3")
+        token_buckets.reset()
+
+        response = self.book("client@example.com", ip="10.0.0.4")
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class IdempotencyKeyTests(APITestCase):
+    """
+    Test to check working of Idempotency-Key on the booking API.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.fitness_class = FitnessClass.objects.create(
+            name="Morning Yoga",
+            class_type=ClassTypeChoices.YOGA,
+            class_time=timezone.now() + timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=10,
+            available_slots=10,
+        )
+
+    def setUp(self):
+        caches["idempotency"].clear()
+        token_buckets.reset()
+        metrics.reset()
+
+    def book(self, key, email="client@example.com", fitness_class=None):
+        return self.client.post(
+            reverse("api:book-class"),
+            {
+                "fitness_class": (fitness_class or self.fitness_class).id,
+                "client_name": "Client",
+                "client_email": email,
+            },
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_first_response(self):
+        """Test a retry gets the stored response, without queries and without booking again."""
+        response = self.book("key-1")
+
+        with self.assertNumQueries(0):
+            retry = self.book("key-1")
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), response.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(FitnessClassBooking.objects.count(), 1)
+        self.assertIn('booking_outcomes_total{outcome="replayed"} 1', metrics.render())
+
+    def test_invalid_keys(self):
+        """Test keys reused for another request, or too long, are rejected."""
+        self.book("key-1")
+        test_cases = [
+            ("reused_key", "key-1", status.HTTP_422_UNPROCESSABLE_ENTITY),
+            ("long_key", "k" * 256, status.HTTP_400_BAD_REQUEST),
+        ]
+
+        for name, key, expected_status in test_cases:
+            with self.subTest(name):
+                response = self.book(key, email="other@example.com")
+
+                self.assertEqual(response.status_code, expected_status)
+                self.assertEqual(FitnessClassBooking.objects.count(), 1)
+
+    def test_failed_request_is_not_replayed(self):
+        """Test a failed request releases its key, so a retry runs again."""
+        FitnessClass.objects.filter(pk=self.fitness_class.pk).update(
+            class_time=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertEqual(self.book("key-1").status_code, status.HTTP_400_BAD_REQUEST)
+        FitnessClass.objects.filter(pk=self.fitness_class.pk).update(
+            class_time=timezone.now() + timedelta(days=1)
+        )
+
+        response = self.book("key-1")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn("Idempotent-Replayed", response)
+
+    def test_concurrent_requests_are_coalesced(self):
+        """Test concurrent requests with the same key run once and share the response."""
+        factory = APIRequestFactory()
+        calls = []
+        responses = []
+        barrier = threading.Barrier(5)
+
+        def get_response():
+            calls.append(1)
+            time.sleep(0.2)
+            return Response({"id": 1}, status=status.HTTP_201_CREATED)
+
+        def post():
+            request = Request(
+                factory.post("/api/book/", {"client_email": "client@example.com"}, format="json"),
+                parsers=[JSONParser()],
+            )
+            barrier.wait()
+            responses.append(idempotent_response(request, "key-1", get_response))
+
+        threads = [threading.Thread(target=post) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([response.data for response in responses], [{"id": 1}] * 5)
+        self.assertEqual(
+            sum("Idempotent-Replayed" in response for response in responses), 4
+        )
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTests(APITestCase):
+    """
+    Test to check that list APIs read from the replica, and that clients who booked read from
+    the primary for REPLICA_STICKY_SECONDS.
+    """
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        cache.clear()
+        token_buckets.reset()
+        # The replica lags behind, with a different number of slots to tell reads apart.
+        self.fitness_class, self.replica_class = [
+            FitnessClass.objects.using(alias).create(
+                id=1,
+                name="Morning Yoga",
+                class_type=ClassTypeChoices.YOGA,
+                class_time=timezone.now() + timedelta(days=1),
+                instructor_name="Jane Doe",
+                instructor_email="jane@example.com",
+                max_slots=10,
+                available_slots=slots,
+            )
+            for alias, slots in (("default", 10), ("replica", 8))
+        ]
+
+    def list_slots(self, client=None):
+        response = (client or self.client).get(reverse("api:class-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [row["available_slots"] for row in response.json()["results"]]
+
+    def book(self):
+        return self.client.post(
+            reverse("api:book-class"),
+            {
+                "fitness_class": self.fitness_class.id,
+                "client_name": "Client",
+                "client_email": "client@example.com",
+            },
+            format="json",
+        )
+
+    def test_list_apis_read_from_replica(self):
+        FitnessClassBooking(
+            fitness_class=self.replica_class,
+            client_name="Client",
+            client_email="client@example.com",
+        ).save(using="replica", claim_slot=False)
+
+        self.assertEqual(self.list_slots(), [8])
+        response = self.client.get(reverse("api:booking-list"), {"email": "client@example.com"})
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_booking_pins_client_to_primary(self):
+        response = self.book()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn(PRIMARY_PIN_COOKIE, response.cookies)
+
+        # Another client caches the class list from the lagging replica.
+        self.assertEqual(self.list_slots(self.client_class()), [8])
+        self.assertEqual(self.list_slots(), [9])
+        response = self.client.get(reverse("api:booking-list"), {"email": "client@example.com"})
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_pages_read_from_replica_expire_with_replica_lag(self):
+        """Test a page read from the lagging replica is cached for REPLICA_STICKY_SECONDS at most."""
+        self.assertEqual(self.book().status_code, status.HTTP_201_CREATED)
+
+        with mock.patch.object(cache, "set", wraps=cache.set) as cache_set:
+            self.assertEqual(self.list_slots(self.client_class()), [8])
+            self.assertEqual(self.list_slots(), [9])
+
+        timeouts = [
+            call.args[2]
+            for call in cache_set.call_args_list
+            if isinstance(call.args[1], dict) and "etag" in call.args[1]
+        ]
+        self.assertEqual(
+            timeouts, [settings.REPLICA_STICKY_SECONDS, settings.CLASS_LIST_CACHE_TIMEOUT]
+        )
+
+    async def test_async_list_reads_from_replica(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(ReplicaRoutingMiddleware(get_response)))
+        url = reverse("api:async-class-list")
+
+        response = await self.async_client.get(url)
+        self.assertEqual([row["available_slots"] for row in response.json()["results"]], [8])
+
+        self.async_client.cookies[PRIMARY_PIN_COOKIE] = str(time.time() + 5)
+        response = await self.async_client.get(url)
+        self.assertEqual([row["available_slots"] for row in response.json()["results"]], [10])
+
+    def test_expired_pin_reads_from_replica(self):
+        self.client.cookies[PRIMARY_PIN_COOKIE] = str(time.time() - 1)
+
+        self.assertEqual(self.list_slots(), [8])
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_pin_without_replicas(self):
+        response = self.book()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn(PRIMARY_PIN_COOKIE, response.cookies)
+        self.assertEqual(self.list_slots(), [9])
+
+
+class AdminTests(APITestCase):
+    """
+    Test to check working of the admin changelists and bulk class actions.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "password")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_classes(self, count, bookings=2, **kwargs):
+        classes = []
+        for i in range(count):
+            fitness_class = FitnessClass.objects.create(
+                name=f"Yoga {i}",
+                class_type=ClassTypeChoices.YOGA,
+                class_time=timezone.now() + timedelta(days=1, hours=i),
+                instructor_name="Jane Doe",
+                instructor_email="jane@example.com",
+                max_slots=kwargs.pop("max_slots", 5),
+                **kwargs,
+            )
+            for j in range(bookings):
+                FitnessClassBooking.objects.create(
+                    fitness_class=fitness_class,
+                    client_name="Client",
+                    client_email=f"client{j}@example.com",
+                )
+            classes.append(fitness_class)
+
+        return classes
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return len(queries), response
+
+    def act(self, action, classes, **data):
+        return self.client.post(
+            reverse("admin:api_fitnessclass_changelist"),
+            {
+                "action": action,
+                helpers.ACTION_CHECKBOX_NAME: [fitness_class.pk for fitness_class in classes],
+                **data,
+            },
+        )
+
+    def test_changelists_run_constant_queries(self):
+        for name in ("admin:api_fitnessclass_changelist", "admin:api_fitnessclassbooking_changelist"):
+            with self.subTest(name):
+                FitnessClass.objects.all().delete()
+                self.create_classes(1)
+                queries, _ = self.count_queries(reverse(name))
+                self.create_classes(4)
+                self.assertEqual(self.count_queries(reverse(name))[0], queries)
+
+    def test_class_changelist_shows_booking_count(self):
+        fitness_class = self.create_classes(1, bookings=3)[0]
+
+        _, response = self.count_queries(reverse("admin:api_fitnessclass_changelist"))
+
+        result = response.context["cl"].result_list.get(pk=fitness_class.pk)
+        self.assertEqual(result.booking_count, 3)
+        self.assertContains(response, '<td class="field-booked">3</td>', html=True)
+
+    def test_cancel_classes_deletes_bookings_and_rebuilds_summaries(self):
+        cancelled = self.create_classes(2)
+        kept = self.create_classes(1, bookings=1)[0]
+        WaitlistEntry.objects.create(
+            fitness_class=cancelled[0], client_name="Client", client_email="waiting@example.com"
+        )
+
+        response = self.act("cancel_classes", cancelled)
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.assertEqual(list(FitnessClass.objects.all()), [kept])
+        self.assertEqual(FitnessClassBooking.objects.count(), 1)
+        self.assertFalse(WaitlistEntry.objects.exists())
+        self.assertEqual(ClientBookingSummary.objects.get().client_email, "client0@example.com")
+        self.assertEqual(ClientBookingSummary.objects.get().booking_count, 1)
+
+    def test_cancel_classes_runs_constant_queries(self):
+        counts = []
+        for bookings in (1, 4):
+            classes = self.create_classes(2, bookings=bookings)
+            with CaptureQueriesContext(connection) as queries:
+                self.act("cancel_classes", classes)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_set_max_slots_keeps_booked_seats(self):
+        counter_class, full_class = self.create_classes(2, bookings=4)
+        FitnessClassBooking.objects.filter(fitness_class=counter_class).first().cancel()
+
+        response = self.act("set_max_slots", [counter_class, full_class], max_slots=3)
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        counter_class.refresh_from_db()
+        full_class.refresh_from_db()
+        self.assertEqual((counter_class.max_slots, counter_class.available_slots), (3, 0))
+        self.assertEqual((full_class.max_slots, full_class.available_slots), (5, 1))
+
+        self.act("set_max_slots", [counter_class], max_slots=8)
+        counter_class.refresh_from_db()
+        self.assertEqual((counter_class.max_slots, counter_class.available_slots), (8, 5))
+
+    def test_set_max_slots_of_seat_inventory_classes(self):
+        fitness_class = self.create_classes(1, bookings=2, seat_inventory=True)[0]
+
+        self.act("set_max_slots", [fitness_class], max_slots=7)
+
+        fitness_class.refresh_from_db()
+        self.assertEqual((fitness_class.max_slots, fitness_class.available_slots), (7, 5))
+        self.assertEqual(fitness_class.seats.count(), 7)
+
+        self.act("set_max_slots", [fitness_class], max_slots=1)
+
+        fitness_class.refresh_from_db()
+        self.assertEqual((fitness_class.max_slots, fitness_class.available_slots), (7, 5))
+
+        FitnessClassBooking.objects.get(seat_number=2).cancel()
+        self.act("set_max_slots", [fitness_class], max_slots=1)
+
+        fitness_class.refresh_from_db()
+        self.assertEqual((fitness_class.max_slots, fitness_class.available_slots), (1, 0))
+        self.assertEqual(list(fitness_class.seats.values_list("number", flat=True)), [1])
+
+    def test_set_max_slots_promotes_waitlist(self):
+        """Test raising the capacity of a full class books its waitlist into the new seats."""
+        full_class = self.create_classes(1, bookings=5)[0]
+        for i in range(3):
+            WaitlistEntry.objects.create(
+                fitness_class=full_class, client_name="Client", client_email=f"waiting{i}@example.com"
+            )
+
+        self.act("set_max_slots", [full_class], max_slots=7)
+
+        full_class.refresh_from_db()
+        self.assertEqual((full_class.max_slots, full_class.available_slots), (7, 0))
+        self.assertEqual(
+            list(full_class.waitlist.values_list("client_email", flat=True)),
+            ["waiting2@example.com"],
+        )
+        self.assertEqual(full_class.bookings.count(), 7)
+
+    def test_set_max_slots_needs_value(self):
+        fitness_class = self.create_classes(1)[0]
+
+        self.act("set_max_slots", [fitness_class])
+
+        fitness_class.refresh_from_db()
+        self.assertEqual(fitness_class.max_slots, 5)
+
+
+class DuplicateBookingMigrationTests(TransactionTestCase):
+    """
+    Test to check that the unique booking constraint migration removes existing duplicates.
+    """
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate([target])
+
+        return executor.loader.project_state([target]).apps
+
+    def test_duplicates_are_deleted_before_constraint(self):
+        latest = MigrationExecutor(connection).loader.graph.leaf_nodes("api")[0]
+        apps = self.migrate(("api", "0001_initial"))
+        try:
+            OldFitnessClass = apps.get_model("api", "FitnessClass")
+            OldFitnessClassBooking = apps.get_model("api", "FitnessClassBooking")
+            fitness_class = OldFitnessClass.objects.create(
+                name="Yoga",
+                class_time=timezone.now() + timedelta(days=1),
+                instructor_name="Jane Doe",
+                instructor_email="jane@example.com",
+                max_slots=5,
+                available_slots=1,
+            )
+            first, *_ = [
+                OldFitnessClassBooking.objects.create(
+                    fitness_class=fitness_class, client_name="Client", client_email=email
+                )
+                for email in ["client@example.com"] * 3 + ["other@example.com"]
+            ]
+
+            self.migrate(("api", "0002_booking_indexes_and_unique_constraint"))
+        finally:
+            self.migrate(latest)
+
+        self.assertEqual(
+            sorted(FitnessClassBooking.objects.values_list("client_email", flat=True)),
+            ["client@example.com", "other@example.com"],
+        )
+        self.assertTrue(FitnessClassBooking.objects.filter(pk=first.pk).exists())
+        self.assertEqual(FitnessClass.objects.get(pk=fitness_class.pk).available_slots, 3)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """
+    Test to check that concurrent bookings never oversell a class.
+    """
+    def test_connections_use_sqlite_concurrency_profile(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+    def create_class(self, **kwargs):
+        return FitnessClass.objects.create(
+            name="Hot Zumba",
+            class_type=ClassTypeChoices.ZUMBA,
+            class_time=timezone.now() + timedelta(days=1),
+            instructor_name="Jane Doe",
+            instructor_email="jane@example.com",
+            max_slots=10,
+            available_slots=10,
+            **kwargs,
+        )
+
+    def book_concurrently(self, fitness_class, attempts):
+        barrier = threading.Barrier(attempts)
+        results = []
+
+        def book(i):
+            try:
+                barrier.wait()
+                FitnessClassBooking.objects.create(
+                    fitness_class=FitnessClass.objects.get(pk=fitness_class.pk),
+                    client_name=f"Client {i}",
+                    client_email=f"client{i}@example.com",
+                )
+                results.append(True)
+            except ValidationError:
+                results.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(i,)) for i in range(attempts)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return results
+
+    def test_concurrent_bookings_fill_class_exactly(self):
+        """Fire hundreds of simultaneous bookings at a 10 seat class."""
+        fitness_class = self.create_class()
+        attempts = 200
+
+        results = self.book_concurrently(fitness_class, attempts)
+
+        fitness_class.refresh_from_db()
+        self.assertEqual(len(results), attempts)
+        self.assertEqual(results.count(True), 10)
+        self.assertEqual(fitness_class.available_slots, 0)
+        self.assertEqual(fitness_class.bookings.count(), 10)
+
+    def test_concurrent_seat_bookings_fill_seats_exactly(self):
+        """Fire hundreds of simultaneous bookings at a 10 seat class with seat inventory."""
+        fitness_class = self.create_class(seat_inventory=True)
+
+        results = self.book_concurrently(fitness_class, 200)
+
+        fitness_class.refresh_from_db()
+        self.assertEqual(results.count(True), 10)
+        self.assertEqual(fitness_class.available_slots, 0)
+        self.assertEqual(
+            sorted(fitness_class.bookings.values_list("seat_number", flat=True)),
+            list(range(1, 11)),
+        )
+        self.assertFalse(fitness_class.seats.filter(is_taken=False).exists())
@@ -0,0 +1,192 @@
+"""
+Token bucket throttling of the booking API, by client email and by IP address.
+
+Every process keeps its buckets in memory, so a request over its limit is rejected without any
+cache or database round trip. Requests a local bucket lets through also count against a fixed
+window counter in the shared cache, which holds the limit across several gunicorn workers once
+the cache is shared between them (see CACHES in settings.py).
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from api.constants import MAX_BATCH_BOOKINGS
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """
+    Returns the requests and seconds of a rate like `10/min`.
+    """
+    requests, period = rate.split("/")
+
+    return int(requests), PERIODS[period[0]]
+
+
+class TokenBuckets:
+    """
+    In memory token buckets holding up to `requests` tokens, refilled at `requests / seconds`
+    tokens per second. Buckets that have filled up again are pruned once there are too many.
+    """
+    max_buckets = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self._buckets = {}
+
+    def consume(self, key, requests, seconds):
+        """
+        Takes a token from the bucket of `key`. Returns 0 if it had one, else the seconds until it
+        has one again.
+        """
+        now = time.monotonic()
+        rate = requests / seconds
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (requests, now, now))
+            tokens = min(requests, tokens + (now - updated) * rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, now + (requests - tokens) / rate)
+                return (1 - tokens) / rate
+
+            if key not in self._buckets and len(self._buckets) >= self.max_buckets:
+                self._buckets = {
+                    name: bucket for name, bucket in self._buckets.items() if bucket[2] > now
+                }
+            tokens -= 1
+            self._buckets[key] = (tokens, now, now + (requests - tokens) / rate)
+
+        return 0
+
+
+def consume_shared(key, requests, seconds):
+    """
+    Counts a request against the fixed window counter of `key` in the shared cache. Returns 0 if
+    it is within `requests` per `seconds`, else the seconds until the window ends.
+    """
+    window = int(time.time() // seconds)
+    cache_key = f"booking-throttle:{hashlib.md5(key.encode()).hexdigest()}:{window}"
+    if cache.add(cache_key, 1, seconds):
+        return 0
+
+    try:
+        count = cache.incr(cache_key)
+    except ValueError:
+        # The counter expired between add and incr, so this request starts a new one.
+        cache.set(cache_key, 1, seconds)
+        return 0
+
+    return 0 if count <= requests else (window + 1) * seconds - time.time()
+
+
+class ClassTypeCache:
+    """
+    Process local map of class ids to their class types, for the class type throttle rates.
+    Every class type is read from the database once, and forgotten when its class changes.
+    """
+    max_classes = 10000
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._class_types = {}
+
+    def discard(self, class_id):
+        self._class_types.pop(class_id, None)
+
+    def get(self, class_id):
+        from api.models import FitnessClass
+
+        try:
+            class_id = int(class_id)
+        except (TypeError, ValueError):
+            return None
+
+        class_type = self._class_types.get(class_id)
+        if class_type is None:
+            class_type = (
+                FitnessClass.objects.filter(pk=class_id)
+                .values_list("class_type", flat=True)
+                .first()
+            )
+            if class_type is not None:
+                if len(self._class_types) >= self.max_classes:
+                    self._class_types = {}
+                self._class_types[class_id] = class_type
+
+        return class_type
+
+
+token_buckets = TokenBuckets()
+class_type_cache = ClassTypeCache()
+
+
+class BookingThrottle(BaseThrottle):
+    """
+    Throttles bookings by client email and IP address with BOOKING_THROTTLE_RATES, then with the
+    BOOKING_THROTTLE_CLASS_TYPE_RATES of the class type booked, if it has any. Every booking of a
+    batch counts against the buckets.
+
+    The default rates need neither the cache nor the database to reject a request, the class type
+    rates look up the class type of a class once per process.
+    """
+    def allow_request(self, request, view):
+        self.wait_seconds = 0
+        ip = self.get_ident(request)
+        class_type_rates = settings.BOOKING_THROTTLE_CLASS_TYPE_RATES
+        for booking in self.get_bookings(request):
+            idents = {"email": str(booking.get("client_email", "")).strip().lower(), "ip": ip}
+            if not self.consume(idents, settings.BOOKING_THROTTLE_RATES):
+                return False
+
+            if class_type_rates:
+                class_type = class_type_cache.get(booking.get("fitness_class"))
+                if class_type in class_type_rates and not self.consume(
+                    idents, class_type_rates[class_type], prefix=class_type
+                ):
+                    return False
+
+        return True
+
+    def get_bookings(self, request):
+        """
+        Returns the bookings requested, every booking of a batch counting as one request. Batches
+        over MAX_BATCH_BOOKINGS are rejected by the serializer, so only that many are counted.
+        """
+        data = request.data if isinstance(request.data, dict) else {}
+        bookings = data.get("bookings")
+        if not isinstance(bookings, list):
+            return [data]
+
+        return [
+            booking if isinstance(booking, dict) else {}
+            for booking in bookings[:MAX_BATCH_BOOKINGS]
+        ]
+
+    def consume(self, idents, rates, prefix=""):
+        for scope, rate in rates.items():
+            ident = idents.get(scope)
+            if not rate or not ident:
+                continue
+
+            requests, seconds = parse_rate(rate)
+            key = f"{prefix}:{scope}:{ident}"
+            wait = token_buckets.consume(key, requests, seconds) or consume_shared(
+                key, requests, seconds
+            )
+            if wait:
+                self.wait_seconds = wait
+                return False
+
+        return True
+
+    def wait(self):
+        return self.wait_seconds
@@ -1,10 +1,36 @@
 from django.urls import path
-from .views import FitnessClassListView, BookingCreateView, BookingListView
+from .views import (
+    FitnessClassListView,
+    ClassAvailabilityView,
+    BookingCreateView,
+    BatchBookingCreateView,
+    BookingListView,
+    BookingCancelView,
+    BookingExportView,
+    ClientBookingSummaryView,
+    AsyncFitnessClassListView,
+    AsyncBookingListView,
+)
 
 app_name = "api"
 
 urlpatterns = [
     path("classes/", FitnessClassListView.as_view(), name="class-list"),
+    path(
+        "classes/availability/",
+        ClassAvailabilityView.as_view(),
+        name="class-availability",
+    ),
     path("book/", BookingCreateView.as_view(), name="book-class"),
+    path("book/batch/", BatchBookingCreateView.as_view(), name="book-class-batch"),
     path("bookings/", BookingListView.as_view(), name="booking-list"),
+    path("bookings/<int:pk>/", BookingCancelView.as_view(), name="booking-cancel"),
+    path("bookings/export/", BookingExportView.as_view(), name="booking-export"),
+    path("bookings/summary/", ClientBookingSummaryView.as_view(), name="booking-summary"),
+    path(
+        "async/classes/", AsyncFitnessClassListView.as_view(), name="async-class-list"
+    ),
+    path(
+        "async/bookings/", AsyncBookingListView.as_view(), name="async-booking-list"
+    ),
 ]
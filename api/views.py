@@ -1,9 +1,64 @@
-from rest_framework import generics
+import hashlib
+
+from rest_framework import generics, status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.db.models import Count, Max
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
-from api.models import FitnessClass, FitnessClassBooking
-from api.serializers import FitnessClassSerializer, BookingSerializer
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from django.utils.http import quote_etag
+from django.views import View
+from api.availability import availability_snapshot
+from api.cache import (
+    get_canonical_query_string,
+    get_class_list_cache_key,
+    record_class_list_lookup,
+)
+from api.exports import (
+    BookingExportFilterSerializer,
+    CSVRenderer,
+    NDJSONRenderer,
+    export_bookings,
+)
+from api.constants import BookingOutcomeChoices
+from api.idempotency import (
+    IDEMPOTENCY_KEY_HEADER,
+    IDEMPOTENCY_REPLAYED_HEADER,
+    idempotent_response,
+)
+from api.metrics import metrics
+from api.models import (
+    ArchivedFitnessClassBooking,
+    ClassFullError,
+    ClassStartedError,
+    ClientBookingSummary,
+    DuplicateBookingError,
+    FitnessClass,
+    FitnessClassBooking,
+    WaitlistEntry,
+)
+from api.pagination import BookingPagination, FitnessClassPagination
+from api.routers import is_pinned_to_primary, reads_from_replica
+from api.serializers import (
+    FitnessClassFilterSerializer,
+    FitnessClassSerializer,
+    FitnessClassValuesSerializer,
+    BookingSerializer,
+    BookingValuesSerializer,
+    BatchBookingSerializer,
+    ClientBookingSummarySerializer,
+    WaitlistEntrySerializer,
+    WaitlistEntryValuesSerializer,
+)
+from api.throttling import BookingThrottle
 import logging
 from django.conf import settings
+from django.core.cache import cache
 
 logger = logging.getLogger(__name__)
 
@@ -23,38 +78,492 @@ class TimezoneContextMixin:
         return context
 
 
-class FitnessClassListView(TimezoneContextMixin, generics.ListAPIView):
+class ValuesListMixin:
+    """
+    Class to serve a list API through a read only values serializer.
+
+    Rows are fetched with `.values()` and serialized by `values_serializer_class`, which builds
+    the same output as `serializer_class` without creating model instances and serializer fields.
+    """
+    values_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.values_serializer_class(self.get_serializer_context())
+        page = self.paginator.paginate_querysets(
+            self.get_values_querysets(serializer.values), request, view=self
+        )
+        response = self.get_paginated_response(serializer.serialize(page))
+        response.data.update(self.get_extra_data())
+
+        return response
+
+    def get_values_querysets(self, values):
+        """
+        Returns the querysets of `values` rows listed, merged into one list by the paginator.
+        """
+        return [self.filter_queryset(self.get_queryset()).values(*values)]
+
+    def get_extra_data(self):
+        """
+        Returns extra top level keys of the response, next to the page.
+        """
+        return {}
+
+    async def aget_extra_data(self):
+        return {}
+
+
+class ConditionalListMixin:
+    """
+    Class to answer conditional GET requests of a list API with an ETag.
+
+    The ETag comes from a single aggregate of the row count and latest `updated_at` of the listed
+    queryset, so an unchanged list is answered with a 304 before any row is fetched or serialized.
+    No Last-Modified is sent: the latest `updated_at` of the rows left does not change when rows
+    leave the list, only the count in the ETag does.
+    """
+    # `updated_at` columns whose changes show up in the listed rows.
+    validator_timestamp_fields = ("updated_at",)
+
+    def get_validator_queryset(self):
+        return self.filter_queryset(self.get_queryset()).order_by()
+
+    def get_validator_aggregates(self, timestamp_fields=None, prefix=""):
+        return {
+            f"{prefix}count": Count("pk"),
+            **{
+                f"{prefix}last_modified_{i}": Max(field)
+                for i, field in enumerate(timestamp_fields or self.validator_timestamp_fields)
+            },
+        }
+
+    def get_validator_values(self):
+        return self.get_validator_queryset().aggregate(**self.get_validator_aggregates())
+
+    async def aget_validator_values(self):
+        return await self.get_validator_queryset().aaggregate(**self.get_validator_aggregates())
+
+    def get_list_etag(self, aggregates=None):
+        """
+        Returns the ETag of the list, from the given validator aggregates or from a fresh aggregate
+        query.
+        """
+        if aggregates is None:
+            aggregates = self.get_validator_values()
+
+        counts = [str(value) for key, value in aggregates.items() if key.endswith("count")]
+        timestamps = [
+            value
+            for key, value in aggregates.items()
+            if not key.endswith("count") and value is not None
+        ]
+        last_modified = max(timestamps) if timestamps else None
+
+        version = "|".join([
+            *counts,
+            last_modified.isoformat() if last_modified else "",
+            self.get_serializer_context()["timezone"],
+            get_canonical_query_string(self.request.query_params),
+        ])
+
+        return quote_etag(hashlib.md5(version.encode()).hexdigest())
+
+    def get_not_modified_response(self, etag):
+        return get_conditional_response(self.request, etag=etag)
+
+    def set_validator_headers(self, response, etag):
+        response["ETag"] = etag
+        patch_vary_headers(response, ["X-Timezone"])
+
+        return response
+
+    def list(self, request, *args, **kwargs):
+        self.etag = self.get_list_etag()
+        response = self.get_not_modified_response(self.etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+
+        return self.set_validator_headers(response, self.etag)
+
+
+class FitnessClassListView(
+    TimezoneContextMixin, ConditionalListMixin, ValuesListMixin, generics.ListAPIView
+):
     """
-    APIEndpoint to list all available fitness classes.
+    APIEndpoint to list all available fitness classes, a page at a time.
+    Classes can be filtered with the query parameters of FitnessClassFilterSerializer.
     """
     serializer_class = FitnessClassSerializer
+    values_serializer_class = FitnessClassValuesSerializer
+    pagination_class = FitnessClassPagination
+    replica_reads = True
 
     def get_queryset(self):
         return FitnessClass.objects.filter(class_time__gte=timezone.now()).order_by(
-            "class_time"
+            "class_time", "id"
+        )
+
+    def filter_queryset(self, queryset):
+        filters = FitnessClassFilterSerializer(
+            data=self.request.query_params, context=self.get_serializer_context()
+        )
+        filters.is_valid(raise_exception=True)
+
+        return filters.filter_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        key = get_class_list_cache_key(
+            self.get_serializer_context()["timezone"], request.query_params
         )
+        # A client that just booked skips pages cached from a replica that may not have its booking.
+        cached = None if is_pinned_to_primary() else cache.get(key)
+        record_class_list_lookup(hit=cached is not None)
+        if cached is not None:
+            etag = cached["etag"]
+            response = self.get_not_modified_response(etag)
+            response = response or Response(cached["data"])
+            response["X-Cache"] = "HIT"
+
+            return self.set_validator_headers(response, etag)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(
+                key,
+                {"data": response.data, "etag": self.etag},
+                self.get_cache_timeout(response.data["results"]),
+            )
+        response["X-Cache"] = "MISS"
+
+        return response
+
+    def get_cache_timeout(self, results):
+        """
+        Cached page must expire once its earliest class starts and drops out of the list.
+        Pages read from a replica may miss recent bookings, so they expire once the replica has
+        caught up, within REPLICA_STICKY_SECONDS.
+        """
+        timeout = settings.CLASS_LIST_CACHE_TIMEOUT
+        if reads_from_replica():
+            timeout = min(timeout, settings.REPLICA_STICKY_SECONDS)
+        if results:
+            starts_in = parse_datetime(results[0]["class_time"]) - timezone.now()
+            timeout = max(1, min(timeout, int(starts_in.total_seconds())))
+
+        return timeout
+
+
+class ClassAvailabilityView(APIView):
+    """
+    APIEndpoint to get the available slots of all upcoming fitness classes, as a flat map of
+    class id to available slots. Served from a process local snapshot, which may lag behind
+    bookings made through other processes by CLASS_AVAILABILITY_MAX_STALENESS seconds.
+    """
+    def get(self, request, *args, **kwargs):
+        return Response(availability_snapshot.get())
 
 
 class BookingCreateView(TimezoneContextMixin, generics.CreateAPIView):
     """
     APIEndpoint to create a new fitness class booking.
+    If the class is full, the client is put on its waitlist instead and a 202 is returned.
+    Retries sent with the same `Idempotency-Key` header get the response of the first request.
     """
     serializer_class = BookingSerializer
+    throttle_classes = [BookingThrottle]
+    # Booking outcome recorded for each error, the first matching error class wins.
+    error_outcomes = (
+        (ClassStartedError, BookingOutcomeChoices.CLASS_STARTED),
+        (DuplicateBookingError, BookingOutcomeChoices.DUPLICATE),
+        (ValidationError, BookingOutcomeChoices.INVALID),
+    )
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_KEY_HEADER)
+        if key is None:
+            return self.record_booking(request, *args, **kwargs)
+
+        response = idempotent_response(
+            request, key, lambda: self.record_booking(request, *args, **kwargs)
+        )
+        if IDEMPOTENCY_REPLAYED_HEADER in response:
+            metrics.record_booking_outcome(BookingOutcomeChoices.REPLAYED)
+
+        return response
+
+    def record_booking(self, request, *args, **kwargs):
+        try:
+            response = self.book(request, *args, **kwargs)
+        except ValidationError as exc:
+            metrics.record_booking_outcome(
+                next(outcome for error, outcome in self.error_outcomes if isinstance(exc, error))
+            )
+            raise
 
+        metrics.record_booking_outcome(
+            BookingOutcomeChoices.BOOKED
+            if response.status_code == status.HTTP_201_CREATED
+            else BookingOutcomeChoices.WAITLISTED
+        )
+
+        return response
+
+    def throttled(self, request, wait):
+        metrics.record_booking_outcome(BookingOutcomeChoices.THROTTLED)
+        super().throttled(request, wait)
+
+    def book(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except ClassFullError:
+            serializer = WaitlistEntrySerializer(
+                data=request.data, context=self.get_serializer_context()
+            )
+            serializer.is_valid(raise_exception=True)
+            instance = serializer.save()
 
-class BookingListView(TimezoneContextMixin, generics.ListAPIView):
+        if isinstance(instance, FitnessClassBooking):
+            serializer = self.get_serializer(instance)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class BatchBookingCreateView(TimezoneContextMixin, generics.GenericAPIView):
+    """
+    APIEndpoint to create several fitness class bookings in one request.
+    Responds with the outcome of every booking, in the order they were sent.
     """
-    APIEndpoint to list all bookings.
-    If email is provided in the query parameter, it will filter the bookings by that email
+    serializer_class = BatchBookingSerializer
+    throttle_classes = [BookingThrottle]
+
+    def throttled(self, request, wait):
+        metrics.record_booking_outcome(BookingOutcomeChoices.THROTTLED)
+        super().throttled(request, wait)
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save()
+
+        return Response(
+            result,
+            status=status.HTTP_201_CREATED if result["booked"] else status.HTTP_400_BAD_REQUEST,
+        )
+
+
+class BookingListView(
+    TimezoneContextMixin, ConditionalListMixin, ValuesListMixin, generics.ListAPIView
+):
+    """
+    APIEndpoint to list all bookings, latest first and a page at a time.
+    If email is provided in the query parameter, it will filter the bookings by that email and
+    also list the waitlist entries of that email with their positions, under `waitlist`.
     Else it will return all bookings.
+    Bookings of archived classes are only listed with `include_archived=1`.
     """
     serializer_class = BookingSerializer
+    values_serializer_class = BookingValuesSerializer
+    pagination_class = BookingPagination
+    replica_reads = True
+    validator_timestamp_fields = ("updated_at", "fitness_class__updated_at")
 
-    def get_queryset(self):
+    def get_queryset(self, model=FitnessClassBooking):
+        # Class details are nested in every booking, so join them instead of a query per row.
+        queryset = model.objects.select_related("fitness_class")
         email = self.request.query_params.get("email", None)
         if email:
-            return FitnessClassBooking.objects.filter(client_email=email).order_by(
-                "-created_at"
+            return queryset.filter(client_email=email).order_by("-created_at", "-id")
+
+        return queryset.order_by("-created_at", "-id")
+
+    def get_values_querysets(self, values):
+        querysets = super().get_values_querysets(values)
+        if self.request.query_params.get("include_archived") in ("1", "true"):
+            # Archived bookings never change, and archiving lowers the count of the hot bookings,
+            # so the list validators only look at the hot bookings.
+            querysets.append(self.get_queryset(ArchivedFitnessClassBooking).values(*values))
+
+        return querysets
+
+    def get_waitlist_queryset(self):
+        """
+        Returns the waitlist entries of the requested email, or None if no email is requested.
+        """
+        email = self.request.query_params.get("email", None)
+        if not email:
+            return None
+
+        return WaitlistEntry.objects.filter(client_email=email).order_by("id")
+
+    def get_waitlist_aggregates(self):
+        # Promotions touch the class, which covers the positions of the entries behind.
+        return self.get_validator_aggregates(
+            ("updated_at", "fitness_class__updated_at"), prefix="waitlist_"
+        )
+
+    def get_validator_values(self):
+        values = super().get_validator_values()
+        waitlist = self.get_waitlist_queryset()
+        if waitlist is not None:
+            values.update(waitlist.order_by().aggregate(**self.get_waitlist_aggregates()))
+
+        return values
+
+    async def aget_validator_values(self):
+        values = await super().aget_validator_values()
+        waitlist = self.get_waitlist_queryset()
+        if waitlist is not None:
+            values.update(
+                await waitlist.order_by().aaggregate(**self.get_waitlist_aggregates())
             )
 
-        return FitnessClassBooking.objects.all()
+        return values
+
+    def get_extra_data(self):
+        waitlist = self.get_waitlist_queryset()
+        if waitlist is None:
+            return {}
+
+        serializer = WaitlistEntryValuesSerializer(self.get_serializer_context())
+        rows = waitlist.with_position().values(*serializer.values)
+
+        return {"waitlist": serializer.serialize(rows)}
+
+    async def aget_extra_data(self):
+        waitlist = self.get_waitlist_queryset()
+        if waitlist is None:
+            return {}
+
+        serializer = WaitlistEntryValuesSerializer(self.get_serializer_context())
+        rows = waitlist.with_position().values(*serializer.values)
+
+        return {"waitlist": serializer.serialize([row async for row in rows.aiterator()])}
+
+
+class BookingCancelView(generics.DestroyAPIView):
+    """
+    APIEndpoint to cancel a booking and give its seat back to the class.
+    The email the booking was made with must be provided in the `email` query parameter.
+    """
+    def get_queryset(self):
+        email = self.request.query_params.get("email", None)
+        if not email:
+            return FitnessClassBooking.objects.none()
+
+        return FitnessClassBooking.objects.select_related("fitness_class").filter(
+            client_email=email
+        )
+
+    def perform_destroy(self, instance):
+        instance.cancel()
+
+
+class ClientBookingSummaryView(TimezoneContextMixin, generics.RetrieveAPIView):
+    """
+    APIEndpoint to get the booking summary of the client with the `email` query parameter: the
+    number of bookings and upcoming bookings, and the next class booked.
+    Served from a precomputed summary, without reading the bookings of the client.
+    """
+    serializer_class = ClientBookingSummarySerializer
+
+    def get_object(self):
+        email = self.request.query_params.get("email", None)
+        if not email:
+            raise ValidationError({"email": "This query parameter is required."})
+
+        return ClientBookingSummary.get_for_email(email)
+
+
+class BookingExportView(TimezoneContextMixin, generics.GenericAPIView):
+    """
+    APIEndpoint to export bookings as NDJSON or CSV, picked with `?format=ndjson|csv` or the
+    Accept header. Bookings can be filtered by `email`, `fitness_class` and a `start`/`end` booking
+    date range, and are streamed a row at a time instead of being loaded in memory.
+    """
+    serializer_class = BookingExportFilterSerializer
+    renderer_classes = [NDJSONRenderer, CSVRenderer]
+
+    def get(self, request, *args, **kwargs):
+        filters = self.get_serializer(data=request.query_params)
+        filters.is_valid(raise_exception=True)
+        export_format = request.accepted_renderer.format
+
+        response = StreamingHttpResponse(
+            export_bookings(
+                filters.get_queryset(), self.get_serializer_context(), export_format
+            ),
+            content_type=request.accepted_renderer.media_type,
+        )
+        response["Content-Disposition"] = f'attachment; filename="bookings.{export_format}"'
+
+        return response
+
+
+class MetricsView(View):
+    """
+    APIEndpoint to scrape the request and booking metrics of this process, in the Prometheus text
+    format. Served at METRICS_URL.
+    """
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(
+            metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
+
+
+class AsyncListView(View):
+    """
+    Async counterpart of a list API, for ASGI deployments.
+
+    It serves the same response as `list_view_class`, including pagination and conditional GET,
+    but runs its queries with the async ORM so the worker is free to serve other requests while it
+    waits on the database. The DRF view is only used for its queryset, pagination and serializer.
+    Responses are not cached like the sync class list.
+    """
+    list_view_class = None
+    replica_reads = True
+
+    async def get(self, request, *args, **kwargs):
+        view = self.list_view_class(
+            request=Request(request), args=args, kwargs=kwargs, format_kwarg=None
+        )
+        try:
+            response = await self.list(view)
+        except APIException as exc:
+            response = self.render(exc.detail, status=exc.status_code)
+
+        return response
+
+    async def list(self, view):
+        aggregates = await view.aget_validator_values()
+        etag = view.get_list_etag(aggregates)
+        response = view.get_not_modified_response(etag)
+        if response is None:
+            serializer = view.values_serializer_class(view.get_serializer_context())
+            page = await view.paginator.apaginate_querysets(
+                view.get_values_querysets(serializer.values), view.request
+            )
+            data = view.paginator.get_paginated_data(serializer.serialize(page))
+            data.update(await view.aget_extra_data())
+            response = self.render(data)
+
+        return view.set_validator_headers(response, etag)
+
+    def render(self, data, status=status.HTTP_200_OK):
+        return HttpResponse(
+            JSONRenderer().render(data), status=status, content_type="application/json"
+        )
+
+
+class AsyncFitnessClassListView(AsyncListView):
+    """
+    Async APIEndpoint to list all available fitness classes, see FitnessClassListView.
+    """
+    list_view_class = FitnessClassListView
+
+
+class AsyncBookingListView(AsyncListView):
+    """
+    Async APIEndpoint to list all bookings, see BookingListView.
+    """
+    list_view_class = BookingListView
@@ -0,0 +1,6 @@
+"""
+Benchmarks for the class booking APIs.
+
+Each benchmark is a module run from the project root, e.g. `python -m benchmarks.serialization`,
+and works against a throwaway test database so it never touches `db.sqlite3`.
+"""
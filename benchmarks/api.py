@@ -0,0 +1,171 @@
+"""
+Load and latency benchmark of the booking APIs, driven through the Django test client.
+
+Seeds N classes and M bookings, then measures p50/p95/p99 latency, requests per second and
+queries per request of the list and booking APIs, plus a contention scenario where many threads
+book a single hot class at once. Results are JSON, so runs before and after a change can be diffed:
+
+    python -m benchmarks.api --classes 1000 --bookings 5000 --output before.json
+"""
+import argparse
+import json
+import threading
+import time
+from itertools import count
+
+from benchmarks.utils import seed_bookings, seed_classes, setup_django, summarize, timed
+
+
+def count_queries(func, repeat):
+    """
+    Returns the average number of queries of `func` over `repeat` calls.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(repeat):
+            func()
+
+    return round(len(queries) / repeat, 2)
+
+
+def run_contention(fitness_class, threads, attempts):
+    """
+    Books `fitness_class` from `threads` threads at once, `attempts` bookings each, and returns the
+    latencies and outcomes. Every thread has its own client and database connection.
+    """
+    from django.db import connection
+    from django.test import Client
+    from django.urls import reverse
+
+    url = reverse("api:book-class")
+    emails = count()
+    latencies, statuses = [], []
+    barrier = threading.Barrier(threads)
+
+    def book():
+        client = Client(raise_request_exception=False)
+        barrier.wait()
+        try:
+            for _ in range(attempts):
+                data = {
+                    "fitness_class": fitness_class.id,
+                    "client_name": "Hot Client",
+                    "client_email": f"hot{next(emails)}@example.com",
+                }
+                started = time.perf_counter()
+                response = client.post(url, data, content_type="application/json")
+                latencies.append(time.perf_counter() - started)
+                statuses.append(response.status_code)
+        finally:
+            connection.close()
+
+    workers = [threading.Thread(target=book) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    return latencies, statuses, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--classes", type=int, default=1000)
+    parser.add_argument("--bookings", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--hot-seats", type=int, default=50)
+    parser.add_argument("--output", help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.core.cache import cache
+    from django.test import Client, override_settings
+    from django.urls import reverse
+
+    from api.models import FitnessClass, FitnessClassBooking
+
+    # Every request comes from the same IP address, which the booking throttle would stop.
+    override_settings(BOOKING_THROTTLE_RATES={}, BOOKING_THROTTLE_CLASS_TYPE_RATES={}).enable()
+
+    # Enough seats for the seeded bookings and the booking scenario.
+    max_slots = max(20, -(-(args.bookings + args.repeat * 2) // args.classes))
+    classes = seed_classes(args.classes, max_slots=max_slots)
+    bookings = seed_bookings(classes, args.bookings)
+    client = Client()
+    emails = count()
+
+    def class_list():
+        cache.clear()
+        client.get(reverse("api:class-list"))
+
+    def class_list_cached():
+        client.get(reverse("api:class-list"))
+
+    def booking_list():
+        client.get(reverse("api:booking-list"))
+
+    def client_booking_list():
+        client.get(reverse("api:booking-list"), {"email": bookings[0].client_email})
+
+    def book():
+        i = next(emails)
+        client.post(
+            reverse("api:book-class"),
+            {
+                "fitness_class": classes[i % len(classes)].id,
+                "client_name": "Bench Client",
+                "client_email": f"bench{i}@example.com",
+            },
+            content_type="application/json",
+        )
+
+    results = {}
+    scenarios = (
+        ("class_list", class_list),
+        ("class_list_cached", class_list_cached),
+        ("booking_list", booking_list),
+        ("client_booking_list", client_booking_list),
+        ("book", book),
+    )
+    for name, func in scenarios:
+        queries = count_queries(func, min(args.repeat, 10))
+        results[name] = {**summarize(timed(func, args.repeat)), "queries_per_request": queries}
+
+    hot_class = seed_classes(1, max_slots=args.hot_seats)[0]
+    attempts = max(1, args.hot_seats * 2 // args.threads)
+    latencies, statuses, elapsed = run_contention(hot_class, args.threads, attempts)
+    hot_class.refresh_from_db()
+    booked = FitnessClassBooking.objects.filter(fitness_class=hot_class).count()
+    results["hot_class_contention"] = {
+        **summarize(latencies),
+        "per_second": round(len(latencies) / elapsed, 1),
+        "threads": args.threads,
+        "booked": statuses.count(201),
+        "waitlisted": statuses.count(202),
+        "failed": len(statuses) - statuses.count(201) - statuses.count(202),
+        "oversold": booked > hot_class.max_slots
+        or booked != hot_class.max_slots - hot_class.available_slots,
+    }
+
+    output = json.dumps(
+        {
+            "classes": FitnessClass.objects.count(),
+            "bookings": args.bookings,
+            "repeat": args.repeat,
+            "results": results,
+        },
+        indent=2,
+    )
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Compares payload size and latency of the availability API against the class list API, for a
+client that needs the available slots of every upcoming class.
+
+    python -m benchmarks.availability --classes 5000
+"""
+import argparse
+import json
+
+from benchmarks.utils import seed_classes, setup_django, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--classes", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.conf import settings
+    from django.core.cache import cache
+    from django.test import Client
+    from django.urls import reverse
+
+    seed_classes(args.classes)
+    client = Client()
+
+    def fetch_class_list():
+        # Every page of the schedule, uncached, as a client without the availability API does.
+        cache.clear()
+        url = f"{reverse('api:class-list')}?page_size={settings.API_MAX_PAGE_SIZE}"
+        size = 0
+        while url:
+            response = client.get(url)
+            size += len(response.content)
+            url = response.json()["next"]
+        return size
+
+    def fetch_availability():
+        return len(client.get(reverse("api:class-availability")).content)
+
+    results = {}
+    for name, fetch in (("class_list", fetch_class_list), ("availability", fetch_availability)):
+        payload_bytes = fetch()
+        results[name] = {"payload_bytes": payload_bytes, **summarize(timed(fetch, args.repeat))}
+
+    print(json.dumps({"classes": args.classes, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
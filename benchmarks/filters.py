@@ -0,0 +1,69 @@
+"""
+Latency of the class list filters on a large schedule, uncached, against a target latency.
+
+    python -m benchmarks.filters --classes 100000 --target-ms 50
+"""
+import argparse
+import json
+from datetime import timedelta
+
+from benchmarks.utils import seed_classes, setup_django, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--classes", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--target-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.core.cache import cache
+    from django.test import Client
+    from django.urls import reverse
+
+    from api.models import FitnessClass
+
+    classes = seed_classes(args.classes)
+    # Every third class is full.
+    full = [fitness_class.pk for fitness_class in classes[::3]]
+    for i in range(0, len(full), 10000):
+        FitnessClass.objects.filter(pk__in=full[i : i + 10000]).update(available_slots=0)
+
+    week = classes[len(classes) // 2].class_time
+    scenarios = {
+        "no_filter": {},
+        "class_type": {"class_type": "hiit"},
+        "instructor": {"instructor": "instructor7@example.com"},
+        "date_range": {
+            "start": week.isoformat(),
+            "end": (week + timedelta(days=7)).isoformat(),
+        },
+        "available_only": {"available_only": "true"},
+        "class_type_available_only": {"class_type": "zumba", "available_only": "true"},
+        "search": {"search": f"Class {args.classes // 2}"},
+    }
+    client = Client()
+    url = reverse("api:class-list")
+
+    results = {}
+    for name, params in scenarios.items():
+
+        def fetch():
+            cache.clear()
+            return client.get(url, params)
+
+        rows = len(fetch().json()["results"])
+        results[name] = {"rows": rows, **summarize(timed(fetch, args.repeat))}
+        results[name]["within_target"] = results[name]["p95_ms"] <= args.target_ms
+
+    print(
+        json.dumps(
+            {"classes": args.classes, "target_ms": args.target_ms, "results": results}, indent=2
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
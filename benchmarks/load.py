@@ -0,0 +1,80 @@
+"""
+HTTP load test of a running server, reporting throughput and latency at several concurrency levels.
+
+Run one server worker per mode and point the load test at it, e.g. for WSGI and ASGI:
+
+    gunicorn class_booking_system.wsgi:application --workers 1 --bind 127.0.0.1:8000
+    gunicorn class_booking_system.asgi:application --workers 1 --bind 127.0.0.1:8001 \\
+        --worker-class uvicorn_worker.UvicornWorker
+
+    python -m benchmarks.load http://127.0.0.1:8000/api/classes/
+    python -m benchmarks.load http://127.0.0.1:8001/api/async/classes/
+
+The highest concurrency that keeps p99 latency within your budget is what one worker sustains.
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.utils import summarize
+
+
+def run_client(url, deadline, latencies, errors):
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                errors.append(response.status)
+                continue
+        except (OSError, http.client.HTTPException):
+            errors.append(None)
+            connection.close()
+            continue
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+
+
+def run_level(url, concurrency, duration):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [
+        threading.Thread(target=run_client, args=(url, deadline, latencies, errors))
+        for _ in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    result = {"concurrency": concurrency, "errors": len(errors)}
+    if len(latencies) > 1:
+        result.update(summarize(latencies))
+        result["per_second"] = round(len(latencies) / duration, 1)
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("url")
+    parser.add_argument("--concurrency", default="1,8,32,64")
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",")]
+    results = [run_level(args.url, level, args.duration) for level in levels]
+
+    print(json.dumps({"url": args.url, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Overhead of MetricsMiddleware, comparing request latency with and without it.
+
+    python -m benchmarks.metrics --repeat 2000
+"""
+import argparse
+import json
+
+from benchmarks.utils import seed_bookings, seed_classes, setup_django, summarize, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--classes", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.core.cache import cache
+    from django.test import Client, modify_settings
+    from django.urls import reverse
+
+    classes = seed_classes(args.classes)
+    bookings = seed_bookings(classes, args.classes)
+
+    # The test client loads the middleware on its first request, so each client keeps the
+    # middleware it was created with.
+    clients = {"with_metrics": Client()}
+    clients["with_metrics"].get(reverse("api:class-list"))
+    with modify_settings(MIDDLEWARE={"remove": "api.middleware.MetricsMiddleware"}):
+        clients["without_metrics"] = Client()
+        clients["without_metrics"].get(reverse("api:class-list"))
+
+    scenarios = {
+        "class_list_cached": (reverse("api:class-list"), {}),
+        "client_booking_list": (reverse("api:booking-list"), {"email": bookings[0].client_email}),
+    }
+    results = {}
+    for name, (url, params) in scenarios.items():
+        cache.clear()
+        latencies = {mode: [] for mode in clients}
+        # Requests alternate between both clients, so drift over the run hits both the same.
+        for i in range(args.repeat):
+            for mode in sorted(clients, reverse=i % 2 == 1):
+                latencies[mode].extend(timed(lambda: clients[mode].get(url, params), 1))
+        results[name] = {mode: summarize(latencies[mode]) for mode in clients}
+        with_metrics = results[name]["with_metrics"]["p50_ms"]
+        without_metrics = results[name]["without_metrics"]["p50_ms"]
+        results[name]["p50_overhead_ms"] = round(with_metrics - without_metrics, 3)
+        results[name]["p50_overhead_percent"] = round(
+            (with_metrics - without_metrics) / without_metrics * 100, 1
+        )
+
+    print(json.dumps({"repeat": args.repeat, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
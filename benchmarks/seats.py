@@ -0,0 +1,73 @@
+"""
+Contention benchmark of a hot class booked in counter mode and in seat inventory mode.
+
+Books one class from many threads at once, first with the `available_slots` counter and then with
+a row per seat, and reports latency, bookings per second and whether either mode oversold:
+
+    python -m benchmarks.seats --seats 50 --threads 16 --output seats.json
+
+SQLite takes one write lock per database, so both modes serialize their writes here and the
+numbers mostly show the cost of the extra seat queries. The SKIP LOCKED claims of seat mode only
+let bookings of one class proceed in parallel on a database server such as PostgreSQL.
+"""
+import argparse
+import json
+
+from benchmarks.api import run_contention
+from benchmarks.utils import seed_classes, setup_django, summarize
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seats", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--output", help="Also write the JSON results to this file.")
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.test import override_settings
+
+    from api.models import FitnessClassBooking
+
+    # Every request comes from the same IP address, which the booking throttle would stop.
+    override_settings(BOOKING_THROTTLE_RATES={}, BOOKING_THROTTLE_CLASS_TYPE_RATES={}).enable()
+
+    attempts = max(1, args.seats * 2 // args.threads)
+    results = {}
+    for mode, seat_inventory in (("counter", False), ("seats", True)):
+        hot_class = seed_classes(1, max_slots=args.seats)[0]
+        if seat_inventory:
+            hot_class.seat_inventory = True
+            hot_class.save()
+
+        latencies, statuses, elapsed = run_contention(hot_class, args.threads, attempts)
+        hot_class.refresh_from_db()
+        seat_numbers = list(
+            FitnessClassBooking.objects.filter(fitness_class=hot_class).values_list(
+                "seat_number", flat=True
+            )
+        )
+        results[mode] = {
+            **summarize(latencies),
+            "per_second": round(len(latencies) / elapsed, 1),
+            "booked": statuses.count(201),
+            "waitlisted": statuses.count(202),
+            "failed": len(statuses) - statuses.count(201) - statuses.count(202),
+            "oversold": len(seat_numbers) > hot_class.max_slots
+            or len(seat_numbers) != hot_class.max_slots - hot_class.available_slots,
+        }
+        if seat_inventory:
+            results[mode]["duplicate_seats"] = len(seat_numbers) != len(set(seat_numbers))
+
+    output = json.dumps(
+        {"seats": args.seats, "threads": args.threads, "results": results}, indent=2
+    )
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Microbenchmark of list API serialization, in rows per second.
+
+Compares the per-row field rebuilding serializers the list APIs used to run, the model serializers
+and the `.values()` fast path the list APIs use now.
+
+    python -m benchmarks.serialization --rows 5000
+"""
+import argparse
+import json
+import time
+
+from benchmarks.utils import seed_bookings, seed_classes, setup_django
+
+
+def legacy_serializers():
+    """
+    The list serializers as they were, rebuilding a DateTimeField and time zone for every row.
+    """
+    from zoneinfo import ZoneInfo
+
+    from rest_framework import serializers
+
+    from api.constants import ClassTypeChoices
+    from api.serializers import BookingSerializer, FitnessClassSerializer
+
+    class LegacyFitnessClassSerializer(FitnessClassSerializer):
+        def get_fields(self):
+            return serializers.ModelSerializer.get_fields(self)
+
+        def to_representation(self, instance):
+            self.fields["class_time"] = serializers.DateTimeField(
+                default_timezone=ZoneInfo(self.context["timezone"])
+            )
+            return super().to_representation(instance)
+
+        def get_class_type_display(self, obj):
+            return dict(ClassTypeChoices.choices)[obj.class_type]
+
+    class LegacyBookingSerializer(BookingSerializer):
+        fitness_class_details = LegacyFitnessClassSerializer(source="fitness_class", read_only=True)
+
+        def get_fields(self):
+            return serializers.ModelSerializer.get_fields(self)
+
+        def to_representation(self, instance):
+            self.fields["booked_at"] = serializers.DateTimeField(
+                source="created_at",
+                default_timezone=ZoneInfo(self.context["timezone"]),
+                read_only=True,
+            )
+            return super().to_representation(instance)
+
+    return LegacyFitnessClassSerializer, LegacyBookingSerializer
+
+
+def rows_per_second(serialize, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        serialize()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    return round(rows / best)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--timezone", default="America/New_York")
+    args = parser.parse_args()
+
+    setup_django()
+
+    from api.models import FitnessClass, FitnessClassBooking
+    from api.serializers import (
+        BookingSerializer,
+        BookingValuesSerializer,
+        FitnessClassSerializer,
+        FitnessClassValuesSerializer,
+    )
+
+    classes = seed_classes(args.rows, max_slots=1)
+    seed_bookings(classes, args.rows)
+    context = {"timezone": args.timezone}
+
+    results = {}
+    try:
+        legacy = legacy_serializers()
+    except ImportError:
+        legacy = None
+
+    paths = [
+        (
+            "classes",
+            list(FitnessClass.objects.order_by("class_time", "id")),
+            FitnessClass.objects.order_by("class_time", "id"),
+            FitnessClassSerializer,
+            FitnessClassValuesSerializer,
+            legacy and legacy[0],
+        ),
+        (
+            "bookings",
+            list(FitnessClassBooking.objects.select_related("fitness_class").order_by("-id")),
+            FitnessClassBooking.objects.order_by("-id"),
+            BookingSerializer,
+            BookingValuesSerializer,
+            legacy and legacy[1],
+        ),
+    ]
+    for name, instances, queryset, serializer_class, values_serializer_class, legacy_class in paths:
+        values_serializer = values_serializer_class(context)
+        rows = list(queryset.values(*values_serializer.values))
+        results[name] = {
+            "model_serializer": rows_per_second(
+                lambda: serializer_class(instances, many=True, context=context).data,
+                args.rows,
+                args.repeat,
+            ),
+            "values_serializer": rows_per_second(
+                lambda: values_serializer.serialize(rows), args.rows, args.repeat
+            ),
+        }
+        if legacy_class:
+            results[name]["legacy_serializer"] = rows_per_second(
+                lambda: legacy_class(instances, many=True, context=context).data,
+                args.rows,
+                args.repeat,
+            )
+
+    print(json.dumps({"rows": args.rows, "rows_per_second": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Write throughput and "database is locked" error rate of bookings from several processes at once,
+with the SQLite profile of settings.py against the default SQLite setup.
+
+    python -m benchmarks.sqlite --processes 4 --duration 10
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+
+from benchmarks.utils import seed_classes, setup_django, summarize
+
+# Django's defaults: rollback journal, deferred transactions, the 5 second busy timeout of the
+# sqlite3 module and a new connection per request.
+DEFAULT_PROFILE = {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False, "OPTIONS": {}}
+
+
+def run_worker(label, name, profile, class_ids, duration, worker, results):
+    """
+    Books classes through the booking API until `duration` is over, in its own process.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "class_booking_system.settings")
+
+    from django.conf import settings
+
+    settings.DATABASES["default"].update(NAME=name, **(profile or {}))
+
+    import django
+
+    django.setup()
+
+    from django.db import OperationalError, close_old_connections
+    from django.test import Client, override_settings
+    from django.test.utils import setup_test_environment
+    from django.urls import reverse
+
+    setup_test_environment()
+    override_settings(BOOKING_THROTTLE_RATES={}, BOOKING_THROTTLE_CLASS_TYPE_RATES={}).enable()
+    client = Client()
+    url = reverse("api:book-class")
+    latencies, locked, failed = [], 0, 0
+    deadline = time.perf_counter() + duration
+    i = 0
+    while time.perf_counter() < deadline:
+        data = {
+            "fitness_class": class_ids[i % len(class_ids)],
+            "client_name": "Bench Client",
+            "client_email": f"{label}.worker{worker}.{i}@example.com",
+        }
+        i += 1
+        started = time.perf_counter()
+        try:
+            response = client.post(url, data, content_type="application/json")
+            if response.status_code == 201:
+                latencies.append(time.perf_counter() - started)
+            else:
+                failed += 1
+        except OperationalError as exc:
+            if "locked" not in str(exc):
+                raise
+            locked += 1
+        # The test client keeps connections open, a server closes them at the end of a request.
+        close_old_connections()
+
+    results.put({"latencies": latencies, "locked": locked, "failed": failed})
+
+
+def run_profile(label, name, profile, class_ids, processes, duration):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    workers = [
+        context.Process(
+            target=run_worker,
+            args=(label, name, profile, class_ids, duration, worker, results),
+        )
+        for worker in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    latencies = [latency for outcome in outcomes for latency in outcome["latencies"]]
+    locked = sum(outcome["locked"] for outcome in outcomes)
+    attempts = len(latencies) + locked + sum(outcome["failed"] for outcome in outcomes)
+
+    return {
+        **(summarize(latencies) if len(latencies) > 1 else {"count": len(latencies)}),
+        "per_second": round(len(latencies) / duration, 1),
+        "attempts": attempts,
+        "lock_errors": locked,
+        "lock_error_rate": round(locked / attempts, 4) if attempts else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--classes", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.db import connection
+
+    name = str(connection.settings_dict["NAME"])
+    class_ids = [
+        fitness_class.pk for fitness_class in seed_classes(args.classes, max_slots=1000000)
+    ]
+    connection.close()
+
+    results = {}
+    for label, profile in (("default", DEFAULT_PROFILE), ("settings", None)):
+        if profile is DEFAULT_PROFILE:
+            # WAL is stored in the database file, switch it back for the default setup.
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode=DELETE")
+            connection.close()
+        results[label] = run_profile(
+            label, name, profile, class_ids, args.processes, args.duration
+        )
+
+    print(
+        json.dumps(
+            {"processes": args.processes, "duration": args.duration, "results": results},
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
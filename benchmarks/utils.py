@@ -0,0 +1,110 @@
+import atexit
+import os
+import statistics
+import time
+from datetime import timedelta
+
+
+def setup_django():
+    """
+    Configures Django and creates a throwaway test database, destroyed when the process exits.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "class_booking_system.settings")
+
+    import django
+
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    atexit.register(connection.creation.destroy_test_db, old_name, verbosity=0)
+
+
+def seed_classes(count, max_slots=20, start=None):
+    """
+    Bulk creates `count` upcoming fitness classes, one every 30 minutes.
+    """
+    from django.utils import timezone
+
+    from api.constants import ClassTypeChoices
+    from api.models import FitnessClass
+
+    start = start or timezone.now() + timedelta(days=1)
+    class_types = ClassTypeChoices.values
+
+    return FitnessClass.objects.bulk_create(
+        (
+            FitnessClass(
+                name=f"Class {i}",
+                description="A fitness class used for benchmarking the booking APIs.",
+                class_type=class_types[i % len(class_types)],
+                class_time=start + timedelta(minutes=30 * i),
+                instructor_name=f"Instructor {i % 50}",
+                instructor_email=f"instructor{i % 50}@example.com",
+                max_slots=max_slots,
+                available_slots=max_slots,
+            )
+            for i in range(count)
+        ),
+        batch_size=1000,
+    )
+
+
+def seed_bookings(classes, count, emails=100):
+    """
+    Bulk creates `count` bookings round robin over `classes` and `emails` clients, and takes
+    their seats. `count` must fit in the seats of `classes`.
+    """
+    from collections import Counter
+
+    from api.models import FitnessClass, FitnessClassBooking
+
+    bookings = FitnessClassBooking.objects.bulk_create(
+        (
+            FitnessClassBooking(
+                fitness_class=classes[i % len(classes)],
+                client_name=f"Client {i}",
+                client_email=f"client{i % emails}.{i}@example.com",
+            )
+            for i in range(count)
+        ),
+        batch_size=1000,
+    )
+    booked = Counter(booking.fitness_class_id for booking in bookings)
+    for fitness_class in classes:
+        fitness_class.available_slots = fitness_class.max_slots - booked[fitness_class.pk]
+    FitnessClass.objects.bulk_update(classes, ["available_slots"], batch_size=1000)
+
+    return bookings
+
+
+def timed(func, repeat):
+    """
+    Calls `func` `repeat` times and returns the latency of each call in seconds.
+    """
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - started)
+
+    return latencies
+
+
+def summarize(latencies):
+    """
+    Returns p50/p95/p99 latency in milliseconds and calls per second of a list of latencies.
+    """
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+
+    return {
+        "count": len(latencies),
+        "p50_ms": round(quantiles[49] * 1000, 3),
+        "p95_ms": round(quantiles[94] * 1000, 3),
+        "p99_ms": round(quantiles[98] * 1000, 3),
+        "per_second": round(len(latencies) / sum(latencies), 1),
+    }
@@ -42,6 +42,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so it measures the whole request including the other middleware.
+    "api.middleware.MetricsMiddleware",
+    "api.routers.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -78,9 +81,81 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # Connections are kept open between requests instead of reconnecting for every request.
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            # Busy timeout, seconds a connection waits for a write lock before giving up.
+            "timeout": 20,
+            # Transactions take the write lock when they begin, so concurrent bookings queue up on
+            # the busy timeout instead of failing to upgrade a read lock with "database is locked".
+            "transaction_mode": "IMMEDIATE",
+            # Run on every new connection. WAL lets reads run alongside the writer, and with WAL
+            # synchronous=NORMAL only syncs at checkpoints. Reads are served through a 256MB mmap.
+            "init_command": (
+                "PRAGMA journal_mode=WAL;"
+                "PRAGMA synchronous=NORMAL;"
+                "PRAGMA mmap_size=268435456;"
+            ),
+        },
+        "TEST": {
+            # File backed test database, so threaded tests get real concurrent connections.
+            "NAME": BASE_DIR / "test_db.sqlite3",
+        },
     }
 }
 
+# Read replica of the default database for the list APIs, see api.routers. It is only read from
+# once listed in DATABASE_REPLICAS, point its NAME at a replica of db.sqlite3 (kept up to date by
+# e.g. Litestream or LiteFS) first. Tests use a separate file standing in for the replica.
+DATABASES["replica"] = {
+    **DATABASES["default"],
+    "TEST": {"NAME": BASE_DIR / "test_replica_db.sqlite3"},
+}
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ["api.routers.PrimaryReplicaRouter"]
+
+# Seconds a client reads from the primary after it wrote, must be above the replica lag.
+REPLICA_STICKY_SECONDS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The local memory cache is per process, use the file based cache
+# (django.core.cache.backends.filebased.FileBasedCache) to share cached responses and their
+# invalidation between several gunicorn workers.
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "class-booking-system",
+    },
+    # Stored responses of Idempotency-Key requests, apart so they never evict cached pages.
+    "idempotency": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "class-booking-system-idempotency",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
+# Seconds the response of a booking is replayed for retries with its Idempotency-Key, and seconds
+# a retry waits for a request with the same key still in progress before getting a 409.
+IDEMPOTENCY_KEY_TIMEOUT = 24 * 60 * 60
+IDEMPOTENCY_WAIT = 10
+
+# Seconds a class list response stays cached, unless a listed class starts earlier or a class
+# or booking write invalidates it first.
+CLASS_LIST_CACHE_TIMEOUT = 60
+
+# Seconds the per process class availability snapshot may lag behind writes of other processes,
+# and seconds between its full reloads.
+CLASS_AVAILABILITY_MAX_STALENESS = 2
+CLASS_AVAILABILITY_FULL_RELOAD = 300
+
+# Days past classes and their bookings stay in the hot tables before `archive_past_classes` moves
+# them to the archive tables.
+CLASS_ARCHIVE_AFTER_DAYS = 90
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -124,8 +199,26 @@ REST_FRAMEWORK = {
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [],
     "DEFAULT_PERMISSION_CLASSES": [],
+    # Number of trusted proxies in front of the app, whose X-Forwarded-For entries identify the
+    # client IP of the booking throttle. Clients are served directly, so REMOTE_ADDR is used and
+    # X-Forwarded-For, which clients can make up, is ignored. Raise it behind a load balancer.
+    "NUM_PROXIES": 0,
 }
 
+# Default number of rows per page of list APIs, clients can ask for up to
+# API_MAX_PAGE_SIZE rows with the `page_size` query parameter.
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# Booking throttle rates, as "<requests>/<second|minute|hour|day>" per client email and per IP
+# address, see api.throttling. Classes of the types in BOOKING_THROTTLE_CLASS_TYPE_RATES are also
+# throttled with their own rates, e.g. {"hiit": {"email": "3/min"}}.
+BOOKING_THROTTLE_RATES = {"email": "10/min", "ip": "100/min"}
+BOOKING_THROTTLE_CLASS_TYPE_RATES = {}
+
+# Path of the Prometheus metrics endpoint, see api.metrics.
+METRICS_URL = "metrics/"
+
 # Logging configuration
 LOGGING = {
     "version": 1,